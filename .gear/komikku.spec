@@ -42,7 +42,6 @@ Requires:       python3-module-emoji
 Requires:       python3-module-pygobject
 Requires:       python3-module-keyring
 Requires:       python3-module-lxml
-Requires:       python3-module-natsort
 # The conflict between python-magic and python-file-magic should be brought to
 # FESCO.
 Requires:       python3-module-magic
@@ -6,8 +6,8 @@ from gettext import gettext as _
 import gi
 import logging
 import sys
+from threading import Thread
 from threading import Timer
-import time
 
 gi.require_version('Gtk', '4.0')
 gi.require_version('Adw', '1')
@@ -24,22 +24,28 @@ from komikku.activity_indicator import ActivityIndicator
 from komikku.card import CardPage
 from komikku.categories_editor import CategoriesEditorPage
 from komikku.debug_info import DebugInfo
+from komikku.download_manager import DownloadManagerPage
 from komikku.downloader import Downloader
-from komikku.downloader import DownloadManagerPage
 from komikku.explorer import Explorer
 from komikku.history import HistoryPage
 from komikku.library import LibraryPage
 from komikku.models import backup_db
+from komikku.models import checkpoint_db
+from komikku.models import close_db_connections
 from komikku.models import init_db
 from komikku.models import Settings
+from komikku.models import storage_usage
 from komikku.models.database import clear_cached_data
 from komikku.preferences import PreferencesPage
 from komikku.reader import ReaderPage
 from komikku.servers.utils import get_allowed_servers_list
 from komikku.support import SupportPage
 from komikku.updater import Updater
+from komikku.utils import lock_data_dir
 from komikku.webview import WebviewPage
 
+DB_CHECKPOINT_INTERVAL = 300  # in seconds
+
 CREDITS = dict(
     artists=(
         'Tobias Bernard (bertob)',
@@ -110,6 +116,7 @@ class Application(Adw.Application):
     def __init__(self):
         super().__init__(application_id=self.application_id, flags=Gio.ApplicationFlags.HANDLES_COMMAND_LINE)
 
+        self.data_dir_locked = False
         self.window = None
 
         self.set_resource_base_path('/info/febvre/Komikku')
@@ -122,6 +129,10 @@ class Application(Adw.Application):
         self.logger = logging.getLogger('komikku')
 
     def do_activate(self):
+        if self.data_dir_locked:
+            self.show_data_dir_locked_error()
+            return
+
         # We only allow a single window and raise any existing ones
         if not self.window:
             self.window = ApplicationWindow(application=self, title='Komikku', icon_name=self.application_id)
@@ -130,6 +141,8 @@ class Application(Adw.Application):
 
     def do_command_line(self, command_line):
         self.do_activate()
+        if self.data_dir_locked:
+            return 1
 
         args = command_line.get_arguments()
         urls = args[1:]
@@ -164,9 +177,29 @@ class Application(Adw.Application):
     def do_startup(self):
         Adw.Application.do_startup(self)
 
+        # Database, downloads queue and chapters files must not be shared with a running headless instance
+        if not lock_data_dir():
+            self.logger.error('Data folder is locked: headless mode is running')
+            self.data_dir_locked = True
+            return
+
         init_db()
+        if Settings.get_default().storage_quota:
+            storage_usage.preload()
         Notify.init('Komikku')
 
+    def show_data_dir_locked_error(self):
+        dialog = Adw.MessageDialog.new(None, _('Komikku is Already Running'))
+        dialog.set_body(_('Library is being updated or chapters downloaded in headless mode. Please try again later.'))
+        dialog.set_application(self)
+
+        dialog.add_response('close', _('Quit'))
+        dialog.set_close_response('close')
+        dialog.set_default_response('close')
+
+        dialog.connect('response', lambda _dialog, _response_id: self.quit())
+        dialog.present()
+
 
 @Gtk.Template.from_resource('/info/febvre/Komikku/ui/application_window.ui')
 class ApplicationWindow(Adw.ApplicationWindow):
@@ -214,6 +247,8 @@ class ApplicationWindow(Adw.ApplicationWindow):
         # unless the network state actually changes
         Gio.NetworkMonitor.get_default().emit('network-changed', None)
 
+        GLib.timeout_add_seconds(DB_CHECKPOINT_INTERVAL, self.checkpoint_db_when_idle)
+
     @property
     def page(self):
         return self.navigationview.get_visible_page().props.tag
@@ -324,6 +359,13 @@ class ApplicationWindow(Adw.ApplicationWindow):
 
         GLib.idle_add(self.library.populate)
 
+    def checkpoint_db_when_idle(self):
+        # Keep WAL file small: checkpoint periodically, but only when no downloads or updates are in progress
+        if not self.downloader.running and not self.updater.running:
+            checkpoint_db()
+
+        return GLib.SOURCE_CONTINUE
+
     def confirm(self, title, message, confirm_label, confirm_callback, confirm_appearance=None, cancel_callback=None):
         def on_response(dialog, response_id):
             if response_id == 'yes':
@@ -493,18 +535,26 @@ class ApplicationWindow(Adw.ApplicationWindow):
             self.save_window_size()
             if Settings.get_default().clear_cached_data_on_app_close:
                 clear_cached_data()
-            backup_db()
 
-            self.application.quit()
+            def run():
+                backup_db()
+                GLib.idle_add(complete)
+
+            def complete():
+                close_db_connections(checkpoint=True)
+                self.application.quit()
+
+            # DB backup is saved in a thread, window is hidden in the meantime
+            self.set_visible(False)
+            Thread(target=run).start()
 
         if self.downloader.running or self.updater.running:
             def confirm_callback():
                 self.downloader.stop()
                 self.updater.stop()
 
-                while self.downloader.running or self.updater.running:
-                    time.sleep(0.1)
-                    continue
+                self.downloader.wait_stopped()
+                self.updater.wait_stopped()
 
                 do_quit()
 
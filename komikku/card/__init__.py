@@ -13,8 +13,8 @@ from gi.repository import Gtk
 from komikku.card.categories_list import CategoriesList
 from komikku.card.chapters_list import ChaptersList
 from komikku.models import Settings
+from komikku.models import storage_usage
 from komikku.utils import COVER_WIDTH
-from komikku.utils import folder_size
 from komikku.utils import html_escape
 from komikku.utils import PaintableCover
 
@@ -367,7 +367,7 @@ class CardPage(Adw.NavigationPage):
             return
 
         def pulse(manga_id):
-            if self.window.updater.current_id == manga_id:
+            if manga_id in self.window.updater.current_ids:
                 self.progressbar.pulse()
                 return GLib.SOURCE_CONTINUE
 
@@ -487,4 +487,5 @@ class InfoBox:
         self.set_disk_usage()
 
     def set_disk_usage(self):
-        self.size_on_disk_label.set_text(folder_size(self.card.manga.path) or '-')
+        size = storage_usage.get(self.card.manga.path)['size']
+        self.size_on_disk_label.set_text(GLib.format_size(size) if size else '-')
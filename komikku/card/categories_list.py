@@ -6,7 +6,7 @@ from gi.repository import Adw
 from gi.repository import GLib
 from gi.repository import Gtk
 
-from komikku.models import create_db_connection
+from komikku.models import get_db_connection
 from komikku.models import Category
 from komikku.models import Settings
 
@@ -29,9 +29,7 @@ class CategoriesList:
     def populate(self):
         self.clear()
 
-        db_conn = create_db_connection()
-        records = db_conn.execute('SELECT * FROM categories ORDER BY label ASC').fetchall()
-        db_conn.close()
+        records = get_db_connection().execute('SELECT * FROM categories ORDER BY label ASC').fetchall()
 
         if records:
             self.stack.set_visible_child_name('list')
@@ -4,7 +4,6 @@
 
 from gettext import gettext as _
 from gettext import ngettext
-import natsort
 
 from gi.repository import Gdk
 from gi.repository import Gio
@@ -13,7 +12,8 @@ from gi.repository import GObject
 from gi.repository import Gtk
 
 from komikku.models import Chapter
-from komikku.models import create_db_connection
+from komikku.models import chapters_counters
+from komikku.models import db_transaction
 from komikku.models import Download
 from komikku.models import update_rows
 from komikku.utils import html_escape
@@ -354,12 +354,10 @@ class ChaptersList:
                 recent=False,
             ))
 
-        db_conn = create_db_connection()
-
-        with db_conn:
+        with db_transaction() as db_conn:
             res = update_rows(db_conn, 'chapters', chapters_ids, chapters_data)
 
-        db_conn.close()
+        chapters_counters.invalidate(self.card.manga.id)
 
         if res:
             # Then, if DB update succeeded, update chapters rows
@@ -407,11 +405,12 @@ class ChaptersList:
                 return 1 if self.sort_order == 'date-desc' else -1
 
         elif self.sort_order in ('natural-asc', 'natural-desc'):
-            lst = natsort.natsorted([item1.chapter.title, item2.chapter.title], alg=natsort.ns.INT | natsort.ns.IC)
-            if lst[0] == item1.chapter.title:
-                return 1 if self.sort_order == 'natural-desc' else -1
+            # Natural sort keys are precomputed (see `get_natsort_key()`)
+            if item1.chapter.natsort_key > item2.chapter.natsort_key:
+                return -1 if self.sort_order == 'natural-desc' else 1
 
-            return -1 if self.sort_order == 'natural-desc' else 1
+            if item1.chapter.natsort_key < item2.chapter.natsort_key:
+                return 1 if self.sort_order == 'natural-desc' else -1
 
         return 0
 
@@ -446,12 +445,10 @@ class ChaptersList:
                 recent=False,
             ))
 
-        db_conn = create_db_connection()
-
-        with db_conn:
+        with db_transaction() as db_conn:
             res = update_rows(db_conn, 'chapters', chapters_ids, chapters_data)
 
-        db_conn.close()
+        chapters_counters.invalidate(self.card.manga.id)
 
         if res:
             # Then, if DB update succeeded, update chapters rows
@@ -632,7 +629,7 @@ class ChaptersListRow(Gtk.Box):
                     show_secondary_hbox = True
 
                     # Nb read / nb pages
-                    nb_pages = len(self.chapter.pages) if self.chapter.pages else '?'
+                    nb_pages = self.chapter.nb_pages or '?'
                     self.read_progress_label.set_text(f'{self.chapter.last_page_read_index + 1}/{nb_pages}')
                     self.read_progress_label.set_visible(True)
                 elif text:
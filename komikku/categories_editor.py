@@ -10,7 +10,7 @@ from gi.repository import Gtk
 
 from komikku.models import Category
 from komikku.models import CategoryVirtual
-from komikku.models import create_db_connection
+from komikku.models import get_db_connection
 from komikku.models import Settings
 
 
@@ -100,9 +100,7 @@ class CategoriesEditorPage(Adw.NavigationPage):
             self.listbox.remove(row)
             row = next_row
 
-        db_conn = create_db_connection()
-        records = db_conn.execute('SELECT * FROM categories ORDER BY label ASC').fetchall()
-        db_conn.close()
+        records = get_db_connection().execute('SELECT * FROM categories ORDER BY label ASC').fetchall()
 
         if records:
             for record in records:
@@ -20,6 +20,10 @@ from gi.repository import Soup
 from gi.repository import WebKit
 
 from komikku.models.database import VERSION as DB_VERSION
+from komikku.servers.cache import http_cache
+from komikku.servers.pool import connection_pools
+from komikku.servers.ratelimit import rate_limiters
+from komikku.servers.resilience import circuit_breakers
 from komikku.utils import check_cmdline_tool
 
 
@@ -182,4 +186,41 @@ class DebugInfo:
         info += f'- unrar: {tools_info["unrar"]}\n'
         info += f'- unar: {tools_info["unar"]}'
 
+        if rate_limiters_stats := rate_limiters.stats:
+            info += '\n\n'
+            info += 'Rate limiters:\n'
+            for host, stats in rate_limiters_stats.items():
+                info += (
+                    f'- {host}: {stats["requests"]} requests, {stats["throttled"]} throttled ({stats["wait_time"]}s), '
+                    f'{stats["retry_after"]} Retry-After ({stats["rate"]}/s, burst {stats["burst"]})\n'
+                )
+            info = info.rstrip('\n')
+
+        if circuit_breakers_stats := circuit_breakers.stats:
+            info += '\n\n'
+            info += 'Circuit breakers:\n'
+            for server_id, stats in circuit_breakers_stats.items():
+                info += (
+                    f'- {server_id}: {stats["state"]}, {stats["failures"]} consecutive failures (last: {stats["last_failure"]}), '
+                    f'{stats["trips"]} trips, {stats["rejected"]} rejected requests\n'
+                )
+            info = info.rstrip('\n')
+
+        if connection_pools_stats := connection_pools.stats:
+            info += '\n\n'
+            info += f'Connection pools ({connection_pools.maxsize} connections per host):\n'
+            for host, stats in connection_pools_stats.items():
+                info += f'- {host}: {stats["hits"]} hits (kept alive connections reused), {stats["misses"]} misses (new connections)\n'
+            info = info.rstrip('\n')
+
+        http_cache_stats = http_cache.stats
+        if http_cache_stats['hits'] or http_cache_stats['misses']:
+            info += '\n\n'
+            info += 'HTTP cache:\n'
+            info += (
+                f'- {http_cache_stats["hits"]} hits ({http_cache_stats["revalidations"]} revalidated), {http_cache_stats["misses"]} misses, '
+                f'{http_cache_stats["entries"] or 0} entries ({GLib.format_size(http_cache_stats["size"])}), '
+                f'{http_cache_stats["evictions"]} evictions'
+            )
+
         return info
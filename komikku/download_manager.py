@@ -0,0 +1,425 @@
+# Copyright (C) 2019-2024 Valéry Febvre
+# SPDX-License-Identifier: GPL-3.0-only or GPL-3.0-or-later
+# Author: Valéry Febvre <vfebvre@easter-eggs.com>
+
+from gettext import gettext as _
+from gettext import ngettext
+import math
+
+from gi.repository import Adw
+from gi.repository import Gdk
+from gi.repository import Gio
+from gi.repository import GLib
+from gi.repository import Gtk
+
+from komikku.models import Download
+from komikku.models import get_db_connection
+from komikku.servers.resilience import circuit_breakers
+from komikku.utils import if_network_available
+
+
+@Gtk.Template.from_resource('/info/febvre/Komikku/ui/download_manager.ui')
+class DownloadManagerPage(Adw.NavigationPage):
+    __gtype_name__ = 'DownloadManagerPage'
+    __gsignals_handlers_ids__ = None
+
+    selection_mode = False
+    selection_mode_range = False
+    selection_mode_last_row_index = None
+    servers_banner_timeout_id = None
+
+    left_button = Gtk.Template.Child('left_button')
+    title = Gtk.Template.Child('title')
+    start_stop_button = Gtk.Template.Child('start_stop_button')
+    menu_button = Gtk.Template.Child('menu_button')
+
+    servers_banner = Gtk.Template.Child('servers_banner')
+    stack = Gtk.Template.Child('stack')
+    listbox = Gtk.Template.Child('listbox')
+    selection_mode_actionbar = Gtk.Template.Child('selection_mode_actionbar')
+
+    def __init__(self, window):
+        Adw.NavigationPage.__init__(self)
+
+        self.window = window
+        self.downloader = self.window.downloader
+
+        self.builder = window.builder
+        self.builder.add_from_resource('/info/febvre/Komikku/ui/menu/download_manager.xml')
+
+        # Header bar
+        self.left_button.connect('clicked', self.leave_selection_mode)
+        self.start_stop_button.connect('clicked', self.on_start_stop_button_clicked)
+        self.menu_button.set_menu_model(self.builder.get_object('menu-download-manager'))
+        # Focus is lost after showing popover submenu (bug?)
+        self.menu_button.get_popover().connect('closed', lambda _popover: self.menu_button.grab_focus())
+
+        self.listbox.connect('row-activated', self.on_download_row_activated)
+        self.listbox.connect('selected-rows-changed', self.on_selection_changed)
+        self.window.controller_key.connect('key-pressed', self.on_key_pressed)
+
+        # Gestures for multi-selection mode
+        self.gesture_click = Gtk.GestureClick.new()
+        self.gesture_click.set_propagation_phase(Gtk.PropagationPhase.CAPTURE)
+        self.gesture_click.set_button(3)
+        self.gesture_click.connect('pressed', self.on_download_row_right_click)
+        self.listbox.add_controller(self.gesture_click)
+
+        self.gesture_long_press = Gtk.GestureLongPress.new()
+        self.gesture_long_press.set_propagation_phase(Gtk.PropagationPhase.CAPTURE)
+        self.gesture_long_press.set_touch_only(False)
+        self.gesture_long_press.connect('pressed', self.on_gesture_long_press_activated)
+        self.listbox.add_controller(self.gesture_long_press)
+
+        self.__gsignals_handlers_ids__ = [
+            self.downloader.connect('download-changed', self.update_row),
+            self.downloader.connect('ended', self.update_headerbar),
+            self.downloader.connect('started', self.update_headerbar),
+        ]
+
+        self.window.navigationview.add(self)
+
+    def add_actions(self):
+        # Delete All action
+        delete_all_action = Gio.SimpleAction.new('download-manager.delete-all', None)
+        delete_all_action.connect('activate', self.on_menu_delete_all_clicked)
+        self.window.application.add_action(delete_all_action)
+
+        # Delete Selected action
+        delete_selected_action = Gio.SimpleAction.new('download-manager.delete-selected', None)
+        delete_selected_action.connect('activate', self.on_menu_delete_selected_clicked)
+        self.window.application.add_action(delete_selected_action)
+
+    def enter_selection_mode(self):
+        self.props.can_pop = False
+        self.left_button.set_label(_('Cancel'))
+        self.left_button.set_tooltip_text(_('Cancel'))
+        self.left_button.set_visible(True)
+        self.start_stop_button.set_visible(False)
+        self.menu_button.set_visible(False)
+
+        self.selection_mode = True
+
+        self.listbox.set_selection_mode(Gtk.SelectionMode.MULTIPLE)
+        self.selection_mode_actionbar.set_revealed(True)
+
+    def leave_selection_mode(self, *args):
+        self.props.can_pop = True
+        self.left_button.set_visible(False)
+        self.start_stop_button.set_visible(True)
+        self.menu_button.set_visible(True)
+
+        self.selection_mode = False
+
+        self.listbox.set_selection_mode(Gtk.SelectionMode.NONE)
+        for row in self.listbox:
+            row._selected = False
+        self.selection_mode_actionbar.set_revealed(False)
+
+    def on_download_row_activated(self, _listbox, row):
+        row.grab_focus()
+
+        if not self.selection_mode:
+            return
+
+        if self.selection_mode_range and self.selection_mode_last_row_index is not None:
+            # Range selection mode: select all rows between last selected row and clicked row
+            walk_index = self.selection_mode_last_row_index
+            last_index = row.get_index()
+
+            while walk_index != last_index:
+                walk_row = self.listbox.get_row_at_index(walk_index)
+                if walk_row and not walk_row._selected:
+                    self.listbox.select_row(walk_row)
+                    walk_row._selected = True
+
+                if walk_index < last_index:
+                    walk_index += 1
+                else:
+                    walk_index -= 1
+
+        self.selection_mode_range = False
+
+        if row._selected:
+            self.listbox.unselect_row(row)
+            self.selection_mode_last_row_index = None
+            row._selected = False
+        else:
+            self.listbox.select_row(row)
+            self.selection_mode_last_row_index = row.get_index()
+            row._selected = True
+
+        if len(self.listbox.get_selected_rows()) == 0:
+            self.leave_selection_mode()
+
+    def on_download_row_right_click(self, _gesture, _n_press, _x, y):
+        """Allow to enter in selection mode with a right click on a row"""
+        if self.selection_mode:
+            return Gdk.EVENT_PROPAGATE
+
+        row = self.listbox.get_row_at_y(y)
+        if not self.selection_mode and row is not None:
+            self.enter_selection_mode()
+            self.on_download_row_activated(None, row)
+            return Gdk.EVENT_STOP
+
+        return Gdk.EVENT_PROPAGATE
+
+    def on_gesture_long_press_activated(self, _gesture, _x, y):
+        """Allow to enter in selection mode with a long press on a row"""
+        if not self.selection_mode:
+            self.enter_selection_mode()
+        else:
+            # Enter in 'Range' selection mode
+            # Long press on a download row then long press on another to select everything in between
+            self.selection_mode_range = True
+
+        selected_row = self.listbox.get_row_at_y(y)
+        self.on_download_row_activated(None, selected_row)
+
+    def on_key_pressed(self, _controller, keyval, _keycode, state):
+        if self.window.page != self.props.tag:
+            return Gdk.EVENT_PROPAGATE
+
+        modifiers = state & Gtk.accelerator_get_default_mod_mask()
+
+        if self.selection_mode:
+            if keyval == Gdk.KEY_Escape or (modifiers == Gdk.ModifierType.ALT_MASK and keyval in (Gdk.KEY_Left, Gdk.KEY_KP_Left)):
+                self.leave_selection_mode()
+                # Stop event to prevent back navigation
+                return Gdk.EVENT_STOP
+        else:
+            # Allow to enter in selection mode with <SHIFT>+Arrow key
+            if modifiers != Gdk.ModifierType.SHIFT_MASK or keyval not in (Gdk.KEY_Up, Gdk.KEY_KP_Up, Gdk.KEY_Down, Gdk.KEY_KP_Down):
+                return Gdk.EVENT_PROPAGATE
+
+            if row := self.listbox.get_focus_child():
+                self.enter_selection_mode()
+                self.on_download_row_activated(None, row)
+
+        return Gdk.EVENT_PROPAGATE
+
+    def on_menu_delete_all_clicked(self, _action, _param):
+        chapters = []
+
+        row = self.listbox.get_first_child()
+        while row:
+            next_row = row.get_next_sibling()
+            chapters.append(row.download.chapter)
+            self.listbox.remove(row)
+            row = next_row
+
+        self.downloader.remove(chapters)
+
+        self.leave_selection_mode()
+        self.update_headerbar()
+        GLib.idle_add(self.stack.set_visible_child_name, 'empty')
+
+    def on_menu_delete_selected_clicked(self, _action, _param):
+        chapters = []
+
+        row = self.listbox.get_first_child()
+        while row:
+            next_row = row.get_next_sibling()
+            if row._selected:
+                chapters.append(row.download.chapter)
+                self.listbox.remove(row)
+            row = next_row
+
+        self.downloader.remove(chapters)
+
+        self.leave_selection_mode()
+        self.update_headerbar()
+        if self.listbox.get_first_child() is None:
+            # No more downloads
+            GLib.idle_add(self.stack.set_visible_child_name, 'empty')
+
+    def on_selection_changed(self, _flowbox):
+        number = len(self.listbox.get_selected_rows())
+        if number:
+            self.title.set_subtitle(ngettext('{0} selected', '{0} selected', number).format(number))
+        else:
+            self.title.set_subtitle('')
+
+    @if_network_available
+    def on_start_stop_button_clicked(self, _button):
+        self.start_stop_button.set_sensitive(False)
+
+        if self.downloader.running:
+            self.downloader.stop(save_state=True)
+        else:
+            self.downloader.start()
+
+    def populate(self):
+        # Clear
+        row = self.listbox.get_first_child()
+        while row:
+            next_row = row.get_next_sibling()
+            self.listbox.remove(row)
+            row = next_row
+
+        records = get_db_connection().execute(Download.get_select_sql() + ' ORDER BY date ASC').fetchall()
+
+        if records:
+            for record in records:
+                download = Download(record)
+
+                row = DownloadRow(download)
+                self.listbox.append(row)
+
+            self.stack.set_visible_child_name('list')
+        else:
+            # No downloads
+            self.stack.set_visible_child_name('empty')
+
+    def select_all(self):
+        if not self.selection_mode:
+            self.enter_selection_mode()
+
+        for row in self.listbox:
+            if row._selected:
+                continue
+            self.listbox.select_row(row)
+            row._selected = True
+
+    def show(self):
+        self.populate()
+
+        self.update_headerbar(forced=True)
+        self.update_servers_banner(forced=True)
+        self.window.navigationview.push(self)
+
+        if self.servers_banner_timeout_id is None:
+            self.servers_banner_timeout_id = GLib.timeout_add_seconds(1, self.update_servers_banner)
+
+    def update_headerbar(self, *args, forced=False):
+        if self.window.page != self.props.tag and not forced:
+            return
+
+        if self.listbox.get_first_child() is not None:
+            if self.downloader.running:
+                self.start_stop_button.get_first_child().set_from_icon_name('media-playback-stop-symbolic')
+                self.menu_button.set_visible(False)
+            else:
+                self.start_stop_button.get_first_child().set_from_icon_name('media-playback-start-symbolic')
+                self.menu_button.set_visible(True)
+
+            self.start_stop_button.set_sensitive(True)
+            self.start_stop_button.set_visible(True)
+        else:
+            # No downloads
+            self.start_stop_button.set_visible(False)
+            self.menu_button.set_visible(False)
+
+    def update_servers_banner(self, forced=False):
+        """Reveals servers considered down (open circuit breaker), refreshed every second while page is shown"""
+        if self.window.page != self.props.tag and not forced:
+            self.servers_banner.set_revealed(False)
+            self.servers_banner_timeout_id = None
+            return GLib.SOURCE_REMOVE
+
+        if breakers := circuit_breakers.get_open():
+            servers = ', '.join(
+                '{0} ({1})'.format(breaker.name, _('retry in {0}s').format(math.ceil(breaker.retry_in))) for breaker in breakers
+            )
+            self.servers_banner.set_title(_('Unavailable servers: {0}').format(servers))
+            self.servers_banner.set_revealed(True)
+        else:
+            self.servers_banner.set_revealed(False)
+
+        return GLib.SOURCE_CONTINUE
+
+    def update_row(self, _downloader, download, chapter):
+        chapter_id = chapter.id if chapter is not None else download.chapter.id
+
+        for row in self.listbox:
+            if row.download.chapter.id == chapter_id:
+                row.download = download
+                if row.download:
+                    row.update()
+                else:
+                    self.listbox.remove(row)
+                break
+
+        if self.listbox.get_first_child() is None:
+            # No more downloads
+            self.stack.set_visible_child_name('empty')
+
+
+class DownloadRow(Gtk.ListBoxRow):
+    _selected = False
+
+    def __init__(self, download):
+        Gtk.ListBoxRow.__init__(self)
+
+        self.add_css_class('download-manager-download-listboxrow')
+
+        self.download = download
+
+        if self.download.percent:
+            nb_pages = len(download.chapter.pages)
+            counter = int((nb_pages / 100) * self.download.percent)
+            fraction = self.download.percent / 100
+        else:
+            counter = None
+            fraction = None
+
+        vbox = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=6)
+
+        hbox = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=6)
+        # Manga
+        label = Gtk.Label(xalign=0)
+        label.add_css_class('body')
+        label.set_valign(Gtk.Align.CENTER)
+        label.set_wrap(True)
+        label.set_text(download.chapter.manga.name)
+        hbox.append(label)
+
+        # Progress label
+        self.progress_label = Gtk.Label(xalign=0)
+        self.progress_label.add_css_class('caption')
+        self.progress_label.set_valign(Gtk.Align.CENTER)
+        self.progress_label.set_wrap(True)
+        text = _(Download.STATUSES[self.download.status]).upper() if self.download.status in ('error', 'paused') else ''
+        if counter:
+            text = f'{text} {counter}/{nb_pages}'
+        if text:
+            self.progress_label.set_text(text)
+        hbox.append(self.progress_label)
+
+        vbox.append(hbox)
+
+        # Chapter
+        label = Gtk.Label(xalign=0)
+        label.add_css_class('caption')
+        label.set_valign(Gtk.Align.CENTER)
+        label.set_wrap(True)
+        label.set_text(download.chapter.title)
+        vbox.append(label)
+
+        # Progress bar
+        self.progressbar = Gtk.ProgressBar()
+        self.progressbar.set_show_text(False)
+        if fraction:
+            self.progressbar.set_fraction(fraction)
+        vbox.append(self.progressbar)
+
+        self.set_child(vbox)
+
+    def update(self):
+        """
+        Updates chapter download progress
+        """
+        if not self.download.chapter.pages:
+            if self.download.status == 'paused':
+                self.progress_label.set_text(_(Download.STATUSES[self.download.status]).upper())
+            return
+
+        nb_pages = len(self.download.chapter.pages)
+        counter = int((nb_pages / 100) * self.download.percent)
+        fraction = self.download.percent / 100
+
+        self.progressbar.set_fraction(fraction)
+        text = _(Download.STATUSES[self.download.status]).upper() if self.download.status in ('error', 'paused') else ''
+        text = f'{text} {counter}/{nb_pages}'
+        self.progress_label.set_text(text)
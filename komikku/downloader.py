@@ -2,31 +2,39 @@
 # SPDX-License-Identifier: GPL-3.0-only or GPL-3.0-or-later
 # Author: Valéry Febvre <vfebvre@easter-eggs.com>
 
-from concurrent.futures import as_completed
+from concurrent.futures import FIRST_COMPLETED
 from concurrent.futures import ThreadPoolExecutor
-import datetime
+from concurrent.futures import wait
+from contextlib import contextmanager
 from gettext import gettext as _
-from gettext import ngettext
+import shutil
 import threading
 import time
 
-from gi.repository import Adw
-from gi.repository import Gdk
-from gi.repository import Gio
 from gi.repository import GLib
 from gi.repository import GObject
-from gi.repository import Gtk
 from gi.repository import Notify
 
 from komikku.models import Chapter
-from komikku.models import create_db_connection
+from komikku.models import db_transaction
 from komikku.models import Download
-from komikku.models import insert_rows
+from komikku.models import DownloadPriority
+from komikku.models import get_db_connection
 from komikku.models import Settings
+from komikku.models import storage_usage
+from komikku.servers.pool import connection_pools
+from komikku.servers.resilience import circuit_breakers
+from komikku.servers.resilience import set_retries_stop_event
+from komikku.servers.utils import get_server_main_id_by_id
+from komikku.utils import get_data_dir
 from komikku.utils import if_network_available
 from komikku.utils import log_error_traceback
 
-DOWNLOAD_MAX_DELAY = 1  # in seconds
+DOWNLOAD_MAX_CONCURRENCY = 8  # max number of pages of a chapter fetched concurrently
+DOWNLOAD_PREEMPTION_DELAY = 2  # in seconds, downloads of a server are resumed once reader stopped fetching pages for that long
+DOWNLOAD_PROGRESS_FLUSH_INTERVAL = 2  # in seconds, max delay before progress of a download is persisted
+DOWNLOAD_PROGRESS_NOTIFY_RATE = 10  # max number of progress notifications per second (per download)
+DOWNLOAD_MIN_FREE_SPACE = 512 * 1024 ** 2  # in bytes, free disk space downloads never consume
 
 
 class Downloader(GObject.GObject):
@@ -41,49 +49,56 @@ class Downloader(GObject.GObject):
 
     running = False
     stop_flag = False
+    storage_shortage_reason = None
 
     def __init__(self, window):
         GObject.GObject.__init__(self)
 
         self.window = window
 
-    def add(self, chapters, emit_signal=False):
+        self.notification = None
+        self.stopped = threading.Event()
+        self.stopped.set()
+        # Interrupts requests of workers being retried (see `set_retries_stop_event`)
+        self.stop_event = threading.Event()
+        # Running worker (thread) per server
+        self.workers = {}
+        self.workers_lock = threading.Lock()
+
+        # Reader fetches in progress (and end time of last one) per server
+        self.preemptions = {}
+        self.preemptions_cond = threading.Condition()
+        # Chapter prioritized by reader and its previous download priority
+        self.prioritized = None
+
+        # Pages of a chapter are fetched concurrently: keep as many connections alive per host
+        connection_pools.reserve('downloader', DOWNLOAD_MAX_CONCURRENCY)
+
+    def add(self, chapters, emit_signal=False, priority=DownloadPriority.USER):
+        """
+        Adds chapters to downloads queue
+
+        :param chapters: list of chapters or chapters IDs
+        :param priority: a `DownloadPriority`, new chapters found by updates are automatically downloaded with a low priority
+        """
         chapters_ids = []
-        rows_data = []
 
         for chapter in chapters:
             if isinstance(chapter, Chapter):
                 if chapter.downloaded:
                     continue
-                chapter_id = chapter.id
+                chapters_ids.append(chapter.id)
             else:
-                chapter_id = chapter
-
-            if Download.get_by_chapter_id(chapter_id) is not None:
-                # Chapter download is already scheduled
-                continue
-
-            rows_data.append(dict(
-                chapter_id=chapter_id,
-                status='pending',
-                percent=0,
-                date=datetime.datetime.utcnow(),
-            ))
-            chapters_ids.append(chapter_id)
+                chapters_ids.append(chapter)
 
+        # Chapters whose download is already scheduled are skipped
+        chapters_ids = Download.new_many(chapters_ids, priority)
         if not chapters_ids:
             return
 
-        db_conn = create_db_connection()
-        with db_conn:
-            insert_rows(db_conn, 'downloads', rows_data)
-        db_conn.close()
-
         if emit_signal:
-            for chapter_id in chapters_ids:
-                download = Download.get_by_chapter_id(chapter_id)
-                if download:
-                    self.emit('download-changed', download, None)
+            for download in Download.get_by_chapters_ids(chapters_ids):
+                self.emit('download-changed', download, None)
 
     def remove(self, chapters):
         if not isinstance(chapters, list):
@@ -92,10 +107,7 @@ class Downloader(GObject.GObject):
         was_running = self.running
 
         self.stop()
-
-        while self.running:
-            time.sleep(0.1)
-            continue
+        self.wait_stopped()
 
         for chapter in chapters:
             download = Download.get_by_chapter_id(chapter.id)
@@ -107,578 +119,482 @@ class Downloader(GObject.GObject):
         if was_running:
             self.start()
 
-    @if_network_available
-    def start(self):
-        def run(exclude_errors=False):
-            db_conn = create_db_connection()
-
-            # Get pending downloads sorted by server
-            sql = """
-                SELECT d.id, m.server_id FROM downloads d
-                JOIN chapters c ON d.chapter_id = c.id
-                JOIN mangas m ON c.manga_id = m.id
-            """
-            if exclude_errors:
-                sql += ' WHERE d.status != "error"'
+    def get_server_concurrency(self, server):
+        """
+        Returns the number of pages of a chapter that can be fetched concurrently from a server
 
-            sql += ' ORDER BY m.server_id ASC, d.id ASC'
-            rows = db_conn.execute(sql).fetchall()
+        User setting (if any) takes precedence over the default value declared by server.
+        """
+        server_settings = Settings.get_default().servers_settings.get(get_server_main_id_by_id(server.id)) or {}
+        concurrency = server_settings.get('download_concurrency') or server.download_concurrency
 
-            db_conn.close()
+        return max(1, min(concurrency, DOWNLOAD_MAX_CONCURRENCY))
 
-            if not rows or self.stop_flag:
-                self.running = False
-                GLib.idle_add(self.emit, 'ended')
-                return
+    def get_storage_shortage(self, chapter):
+        """
+        Checks that storage allows to download a chapter: free disk space, storage quota and storage quota per manga
 
-            # Build dict with list of downloads per server
-            servers_downloads = {}
-            for row in rows:
-                if row['server_id'] not in servers_downloads:
-                    servers_downloads[row['server_id']] = []
-                servers_downloads[row['server_id']].append(row['id'])
-
-            with ThreadPoolExecutor(max_workers=len(servers_downloads)) as executor:
-                tasks = {}
-                for _server_id, downloads in servers_downloads.items():
-                    future = executor.submit(process_server_downloads, downloads)
-                    tasks[future] = None
-
-                for _future in as_completed(tasks):
-                    if self.stop_flag:
-                        executor.shutdown(False, cancel_futures=True)
-                        break
+        Needed space is estimated from pages already downloaded (see `StorageUsage.estimate_chapter_size`).
 
-            # Continue, new downloads may have been added in the meantime
-            run(exclude_errors=True)
+        :return: reason why chapter can't be downloaded or None
+        :rtype: str
+        """
+        settings = Settings.get_default()
+        size = storage_usage.estimate_chapter_size(chapter)
 
-        def process_server_downloads(downloads):
-            for download_id in downloads:
-                if self.stop_flag:
-                    break
+        if shutil.disk_usage(get_data_dir()).free - size < DOWNLOAD_MIN_FREE_SPACE:
+            return _('Not enough free disk space')
 
-                download = Download.get(download_id)
-                if download is None:
-                    # Download has been removed in the meantime
-                    continue
+        if settings.storage_quota and storage_usage.get_total() + size > settings.storage_quota * 1024 ** 3:
+            return _('Storage quota reached')
 
-                chapter = download.chapter
-
-                download.update(dict(status='downloading'))
-                GLib.idle_add(notify_download_started, download)
-
-                try:
-                    if chapter.update_full() and len(chapter.pages) > 0:
-                        error_counter = 0
-                        success_counter = 0
-                        for index, _page in enumerate(chapter.pages):
-                            if self.stop_flag:
-                                break
-
-                            if chapter.get_page_path(index) is None:
-                                # Depending on the amount of bandwidth the server has, we must be mindful not to overload it
-                                # with our requests.
-                                #
-                                # Furthermore, multiple and fast-paced requests from the same IP address can alert the system
-                                # administrator that potentially unwanted actions are taking place. This may result in an IP ban.
-                                #
-                                # The easiest way to avoid overloading the server is to set a time-out between requests
-                                # equal to 2x the time it took to load the page (responsive delay).
-                                start = time.time()
-                                path = chapter.get_page(index)
-                                delay = min(2 * (time.time() - start), DOWNLOAD_MAX_DELAY)
-
-                                if path is not None:
-                                    success_counter += 1
-                                    download.update(dict(percent=(index + 1) * 100 / len(chapter.pages)))
-                                else:
-                                    error_counter += 1
-                                    download.update(dict(errors=error_counter))
-
-                                GLib.idle_add(notify_download_progress, download, success_counter, error_counter)
-
-                                if index < len(chapter.pages) - 1 and not self.stop_flag:
-                                    time.sleep(delay)
-                            else:
-                                success_counter += 1
-
-                        if self.stop_flag:
-                            download.update(dict(status='pending'))
-                        else:
-                            if error_counter == 0:
-                                # All pages were successfully downloaded
-                                chapter.update(dict(downloaded=1))
-                                download.delete()
-                                GLib.idle_add(notify_download_success, chapter)
-                            else:
-                                # At least one page failed to be downloaded
-                                download.update(dict(status='error'))
-                                GLib.idle_add(notify_download_error, download)
-                    else:
-                        # Possible causes:
-                        # - Empty chapter
-                        # - Outdated chapter info
-                        # - Server has undergone changes (API, HTML) and plugin code is outdated
-                        download.update(dict(status='error'))
-                        GLib.idle_add(notify_download_error, download)
-                except Exception as e:
-                    # Possible causes:
-                    # - No Internet connection
-                    # - Connexion timeout, read timeout
-                    # - Server down
-                    # - Bad/currupt local archive
-                    download.update(dict(status='error'))
-                    user_error_message = log_error_traceback(e)
-                    GLib.idle_add(notify_download_error, download, user_error_message)
-
-        def notify_download_error(download, message=None):
-            lines = [_('Download failure: {0}').format(download.chapter.manga.server.name)]
-            if message:
-                lines.append(message)
-            self.window.show_notification('\n'.join(lines))
-
-            self.emit('download-changed', download, None)
-
-            return False
-
-        def notify_download_progress(download, success_counter, error_counter):
-            if notification is not None:
-                summary = _('{0}/{1} pages downloaded').format(success_counter, len(download.chapter.pages))
-                if error_counter > 0:
-                    summary = '{0} ({1})'.format(summary, _('error'))
-
-                notification.update(
-                    summary,
-                    _('[{0}] Chapter {1}').format(download.chapter.manga.name, download.chapter.title)
-                )
-                notification.show()
-
-            self.emit('download-changed', download, None)
-
-            return False
-
-        def notify_download_started(download):
-            self.emit('download-changed', download, None)
-
-            return False
-
-        def notify_download_success(chapter):
-            if notification is not None:
-                notification.update(
-                    _('Download completed'),
-                    _('[{0}] Chapter {1}').format(chapter.manga.name, chapter.title)
-                )
-                notification.show()
+        manga_quota = settings.storage_quota_per_manga
+        if manga_quota and storage_usage.get(chapter.manga.path)['size'] + size > manga_quota * 1024 ** 3:
+            return _('Storage quota per manga reached')
 
-            self.emit('download-changed', None, chapter)
+        return None
 
-            return False
+    @contextmanager
+    def preempt(self, server_id):
+        """
+        Pauses downloads of a server while reader fetches pages from it (and for a short delay afterwards)
 
-        if self.running:
+        Reader on-demand fetches must not compete with background downloads.
+        """
+        with self.preemptions_cond:
+            nb_fetches, _end = self.preemptions.get(server_id, (0, 0))
+            self.preemptions[server_id] = (nb_fetches + 1, 0)
+
+        try:
+            yield
+        finally:
+            with self.preemptions_cond:
+                nb_fetches, _end = self.preemptions[server_id]
+                self.preemptions[server_id] = (nb_fetches - 1, time.monotonic())
+                self.preemptions_cond.notify_all()
+
+    def deprioritize(self):
+        """Restores previous priority of the chapter prioritized by reader (reader is closed or shows another chapter)"""
+        if self.prioritized is None:
             return
 
-        Settings.get_default().downloader_state = True
-        self.running = True
-        self.stop_flag = False
+        chapter_id, priority = self.prioritized
+        self.prioritized = None
 
-        if Settings.get_default().desktop_notifications:
-            # Create notification
-            notification = Notify.Notification.new('')
-            notification.set_timeout(Notify.EXPIRES_DEFAULT)
-        else:
-            notification = None
+        # Download may have ended in the meantime
+        download = Download.get_by_chapter_id(chapter_id)
+        if download is not None and download.priority == DownloadPriority.READER:
+            download.update(dict(priority=priority))
 
-        GLib.idle_add(self.emit, 'started')
+    def prioritize(self, chapter):
+        """
+        Moves chapter ahead in downloads queue of its server if its download is pending (chapter is being read)
 
-        thread = threading.Thread(target=run)
-        thread.daemon = True
-        thread.start()
+        Only one chapter is prioritized at a time: the previous one gets back its priority.
+        """
+        if self.prioritized is not None and self.prioritized[0] == chapter.id:
+            return
 
-    def stop(self, save_state=False):
-        if self.running:
-            self.stop_flag = True
-            if save_state:
-                Settings.get_default().downloader_state = False
+        self.deprioritize()
 
+        download = Download.get_by_chapter_id(chapter.id)
+        if download is None:
+            return
 
-@Gtk.Template.from_resource('/info/febvre/Komikku/ui/download_manager.ui')
-class DownloadManagerPage(Adw.NavigationPage):
-    __gtype_name__ = 'DownloadManagerPage'
-    __gsignals_handlers_ids__ = None
+        # A READER priority left by a previous session is lowered to USER
+        priority = download.priority if download.priority != DownloadPriority.READER else DownloadPriority.USER
+        self.prioritized = (chapter.id, priority)
+        if download.priority != DownloadPriority.READER:
+            download.update(dict(priority=DownloadPriority.READER))
+
+    def wait_preemption(self, server_id):
+        """Blocks while downloads of a server are preempted by reader"""
+        with self.preemptions_cond:
+            while not self.stop_flag:
+                nb_fetches, end = self.preemptions.get(server_id, (0, 0))
+                if nb_fetches > 0:
+                    self.preemptions_cond.wait(DOWNLOAD_PREEMPTION_DELAY)
+                    continue
 
-    selection_mode = False
-    selection_mode_range = False
-    selection_mode_last_row_index = None
+                remaining = end + DOWNLOAD_PREEMPTION_DELAY - time.monotonic()
+                if remaining <= 0:
+                    break
 
-    left_button = Gtk.Template.Child('left_button')
-    title = Gtk.Template.Child('title')
-    start_stop_button = Gtk.Template.Child('start_stop_button')
-    menu_button = Gtk.Template.Child('menu_button')
+                self.preemptions_cond.wait(remaining)
 
-    stack = Gtk.Template.Child('stack')
-    listbox = Gtk.Template.Child('listbox')
-    selection_mode_actionbar = Gtk.Template.Child('selection_mode_actionbar')
+    def dispatch(self):
+        """
+        Starts a worker for each server with downloads and no running worker
 
-    def __init__(self, window):
-        Adw.NavigationPage.__init__(self)
+        A worker stops once its server has no more downloads, without waiting for other servers.
+        """
+        rows = get_db_connection().execute(
+            """
+            SELECT DISTINCT m.server_id FROM downloads d
+            JOIN chapters c ON d.chapter_id = c.id
+            JOIN mangas m ON c.manga_id = m.id
+            WHERE d.status = 'pending'
+            """
+        ).fetchall()
 
-        self.window = window
-        self.downloader = self.window.downloader
-
-        self.builder = window.builder
-        self.builder.add_from_resource('/info/febvre/Komikku/ui/menu/download_manager.xml')
-
-        # Header bar
-        self.left_button.connect('clicked', self.leave_selection_mode)
-        self.start_stop_button.connect('clicked', self.on_start_stop_button_clicked)
-        self.menu_button.set_menu_model(self.builder.get_object('menu-download-manager'))
-        # Focus is lost after showing popover submenu (bug?)
-        self.menu_button.get_popover().connect('closed', lambda _popover: self.menu_button.grab_focus())
-
-        self.listbox.connect('row-activated', self.on_download_row_activated)
-        self.listbox.connect('selected-rows-changed', self.on_selection_changed)
-        self.window.controller_key.connect('key-pressed', self.on_key_pressed)
-
-        # Gestures for multi-selection mode
-        self.gesture_click = Gtk.GestureClick.new()
-        self.gesture_click.set_propagation_phase(Gtk.PropagationPhase.CAPTURE)
-        self.gesture_click.set_button(3)
-        self.gesture_click.connect('pressed', self.on_download_row_right_click)
-        self.listbox.add_controller(self.gesture_click)
-
-        self.gesture_long_press = Gtk.GestureLongPress.new()
-        self.gesture_long_press.set_propagation_phase(Gtk.PropagationPhase.CAPTURE)
-        self.gesture_long_press.set_touch_only(False)
-        self.gesture_long_press.connect('pressed', self.on_gesture_long_press_activated)
-        self.listbox.add_controller(self.gesture_long_press)
-
-        self.__gsignals_handlers_ids__ = [
-            self.downloader.connect('download-changed', self.update_row),
-            self.downloader.connect('ended', self.update_headerbar),
-            self.downloader.connect('started', self.update_headerbar),
-        ]
-
-        self.window.navigationview.add(self)
-
-    def add_actions(self):
-        # Delete All action
-        delete_all_action = Gio.SimpleAction.new('download-manager.delete-all', None)
-        delete_all_action.connect('activate', self.on_menu_delete_all_clicked)
-        self.window.application.add_action(delete_all_action)
-
-        # Delete Selected action
-        delete_selected_action = Gio.SimpleAction.new('download-manager.delete-selected', None)
-        delete_selected_action.connect('activate', self.on_menu_delete_selected_clicked)
-        self.window.application.add_action(delete_selected_action)
-
-    def enter_selection_mode(self):
-        self.props.can_pop = False
-        self.left_button.set_label(_('Cancel'))
-        self.left_button.set_tooltip_text(_('Cancel'))
-        self.left_button.set_visible(True)
-        self.start_stop_button.set_visible(False)
-        self.menu_button.set_visible(False)
-
-        self.selection_mode = True
-
-        self.listbox.set_selection_mode(Gtk.SelectionMode.MULTIPLE)
-        self.selection_mode_actionbar.set_revealed(True)
-
-    def leave_selection_mode(self, *args):
-        self.props.can_pop = True
-        self.left_button.set_visible(False)
-        self.start_stop_button.set_visible(True)
-        self.menu_button.set_visible(True)
-
-        self.selection_mode = False
-
-        self.listbox.set_selection_mode(Gtk.SelectionMode.NONE)
-        for row in self.listbox:
-            row._selected = False
-        self.selection_mode_actionbar.set_revealed(False)
-
-    def on_download_row_activated(self, _listbox, row):
-        row.grab_focus()
-
-        if not self.selection_mode:
-            return
+        with self.workers_lock:
+            for row in rows:
+                if row['server_id'] in self.workers:
+                    continue
 
-        if self.selection_mode_range and self.selection_mode_last_row_index is not None:
-            # Range selection mode: select all rows between last selected row and clicked row
-            walk_index = self.selection_mode_last_row_index
-            last_index = row.get_index()
+                if not self.running:
+                    # Last worker has ended since `start()` checked `running`: downloader is running again
+                    self.running = True
+                    self.stopped.clear()
+                    GLib.idle_add(self.emit, 'started')
 
-            while walk_index != last_index:
-                walk_row = self.listbox.get_row_at_index(walk_index)
-                if walk_row and not walk_row._selected:
-                    self.listbox.select_row(walk_row)
-                    walk_row._selected = True
+                thread = threading.Thread(target=self.run_worker, args=(row['server_id'],))
+                thread.daemon = True
+                self.workers[row['server_id']] = thread
+                thread.start()
 
-                if walk_index < last_index:
-                    walk_index += 1
-                else:
-                    walk_index -= 1
+            if not self.workers:
+                self.on_workers_ended()
 
-        self.selection_mode_range = False
+    def get_next_download(self, server_id):
+        """Returns next pending download of a server, highest priority first"""
+        row = get_db_connection().execute(
+            """
+            SELECT d.id FROM downloads d
+            JOIN chapters c ON d.chapter_id = c.id
+            JOIN mangas m ON c.manga_id = m.id
+            WHERE m.server_id = ? AND d.status = 'pending'
+            ORDER BY d.priority DESC, d.id ASC LIMIT 1
+            """,
+            (server_id,)
+        ).fetchone()
+
+        return Download.get(row['id']) if row else None
+
+    def download_page(self, chapter, index):
+        self.wait_preemption(chapter.manga.server_id)
+        if self.stop_flag:
+            return None
+
+        return chapter.get_page(index)
+
+    def notify_download_error(self, download, message=None):
+        lines = [_('Download failure: {0}').format(download.chapter.manga.server.name)]
+        if message:
+            lines.append(message)
+        self.window.show_notification('\n'.join(lines))
+
+        self.emit('download-changed', download, None)
+
+        return False
+
+    def notify_download_paused(self, download, reason):
+        # Notify reason once per run
+        if reason != self.storage_shortage_reason:
+            self.storage_shortage_reason = reason
+            self.window.show_notification(_('Downloads paused: {0}').format(reason))
+
+        self.emit('download-changed', download, None)
+
+    def notify_download_progress(self, download, success_counter, error_counter):
+        if self.notification is not None:
+            summary = _('{0}/{1} pages downloaded').format(success_counter, len(download.chapter.pages))
+            if error_counter > 0:
+                summary = '{0} ({1})'.format(summary, _('error'))
+
+            self.notification.update(
+                summary,
+                _('[{0}] Chapter {1}').format(download.chapter.manga.name, download.chapter.title)
+            )
+            self.notification.show()
+
+        self.emit('download-changed', download, None)
+
+    def notify_download_started(self, download):
+        self.emit('download-changed', download, None)
+
+        return False
+
+    def notify_download_success(self, chapter):
+        if self.notification is not None:
+            self.notification.update(
+                _('Download completed'),
+                _('[{0}] Chapter {1}').format(chapter.manga.name, chapter.title)
+            )
+            self.notification.show()
+
+        self.emit('download-changed', None, chapter)
+
+        return False
+
+    def on_workers_ended(self):
+        # Must be called with workers lock acquired
+        self.running = False
+        self.stopped.set()
+        GLib.idle_add(self.emit, 'ended')
+
+    def process_download(self, download, pages_executor):
+        chapter = download.chapter
+
+        # Downloads are paused before storage runs out (disk full or quotas reached)
+        reason = self.get_storage_shortage(chapter)
+        if reason is not None:
+            download.update(dict(status='paused'))
+            GLib.idle_add(self.notify_download_paused, download, reason)
+            return
 
-        if row._selected:
-            self.listbox.unselect_row(row)
-            self.selection_mode_last_row_index = None
-            row._selected = False
-        else:
-            self.listbox.select_row(row)
-            self.selection_mode_last_row_index = row.get_index()
-            row._selected = True
-
-        if len(self.listbox.get_selected_rows()) == 0:
-            self.leave_selection_mode()
-
-    def on_download_row_right_click(self, _gesture, _n_press, _x, y):
-        """Allow to enter in selection mode with a right click on a row"""
-        if self.selection_mode:
-            return Gdk.EVENT_PROPAGATE
-
-        row = self.listbox.get_row_at_y(y)
-        if not self.selection_mode and row is not None:
-            self.enter_selection_mode()
-            self.on_download_row_activated(None, row)
-            return Gdk.EVENT_STOP
-
-        return Gdk.EVENT_PROPAGATE
-
-    def on_gesture_long_press_activated(self, _gesture, _x, y):
-        """Allow to enter in selection mode with a long press on a row"""
-        if not self.selection_mode:
-            self.enter_selection_mode()
-        else:
-            # Enter in 'Range' selection mode
-            # Long press on a download row then long press on another to select everything in between
-            self.selection_mode_range = True
+        download.update(dict(status='downloading'))
+        GLib.idle_add(self.notify_download_started, download)
+
+        try:
+            if chapter.update_full() and len(chapter.pages) > 0:
+                progress = DownloadProgress(download, len(chapter.pages), self.notify_download_progress)
+                indexes = []
+                # Download may be resumed: already downloaded pages are verified against manifest
+                manifest = chapter.get_manifest()
+                for index in range(len(chapter.pages)):
+                    if chapter.get_page_path(index, manifest=manifest, verify=True) is None:
+                        indexes.append(index)
+                    else:
+                        progress.success_counter += 1
+
+                # Pages are fetched by the pool of threads of server's worker, at most `concurrency` at a time
+                # Requests are rate limited per host by server (see `komikku.servers.ratelimit`)
+                # Each page is saved in its own file: pages can complete out of order
+                concurrency = self.get_server_concurrency(chapter.manga.server)
+                indexes = iter(indexes)
+                futures = set()
+                error = None
+                while True:
+                    # Once stopped or a page has failed, no more pages are submitted: pages in progress are awaited
+                    while not self.stop_flag and error is None and len(futures) < concurrency:
+                        index = next(indexes, None)
+                        if index is None:
+                            break
+                        futures.add(pages_executor.submit(self.download_page, chapter, index))
+
+                    if not futures:
+                        break
 
-        selected_row = self.listbox.get_row_at_y(y)
-        self.on_download_row_activated(None, selected_row)
+                    done, futures = wait(futures, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        try:
+                            path = future.result()
+                        except Exception as e:
+                            error = error or e
+                            continue
 
-    def on_key_pressed(self, _controller, keyval, _keycode, state):
-        if self.window.page != self.props.tag:
-            return Gdk.EVENT_PROPAGATE
+                        if path is None and self.stop_flag:
+                            # Page skipped, download is stopped
+                            continue
 
-        modifiers = state & Gtk.accelerator_get_default_mod_mask()
+                        progress.add(path is not None)
 
-        if self.selection_mode:
-            if keyval == Gdk.KEY_Escape or (modifiers == Gdk.ModifierType.ALT_MASK and keyval in (Gdk.KEY_Left, Gdk.KEY_KP_Left)):
-                self.leave_selection_mode()
-                # Stop event to prevent back navigation
-                return Gdk.EVENT_STOP
-        else:
-            # Allow to enter in selection mode with <SHIFT>+Arrow key
-            if modifiers != Gdk.ModifierType.SHIFT_MASK or keyval not in (Gdk.KEY_Up, Gdk.KEY_KP_Up, Gdk.KEY_Down, Gdk.KEY_KP_Down):
-                return Gdk.EVENT_PROPAGATE
-
-            if row := self.listbox.get_focus_child():
-                self.enter_selection_mode()
-                self.on_download_row_activated(None, row)
-
-        return Gdk.EVENT_PROPAGATE
-
-    def on_menu_delete_all_clicked(self, _action, _param):
-        chapters = []
-
-        row = self.listbox.get_first_child()
-        while row:
-            next_row = row.get_next_sibling()
-            chapters.append(row.download.chapter)
-            self.listbox.remove(row)
-            row = next_row
-
-        self.downloader.remove(chapters)
-
-        self.leave_selection_mode()
-        self.update_headerbar()
-        GLib.idle_add(self.stack.set_visible_child_name, 'empty')
-
-    def on_menu_delete_selected_clicked(self, _action, _param):
-        chapters = []
-
-        row = self.listbox.get_first_child()
-        while row:
-            next_row = row.get_next_sibling()
-            if row._selected:
-                chapters.append(row.download.chapter)
-                self.listbox.remove(row)
-            row = next_row
-
-        self.downloader.remove(chapters)
-
-        self.leave_selection_mode()
-        self.update_headerbar()
-        if self.listbox.get_first_child() is None:
-            # No more downloads
-            GLib.idle_add(self.stack.set_visible_child_name, 'empty')
-
-    def on_selection_changed(self, _flowbox):
-        number = len(self.listbox.get_selected_rows())
-        if number:
-            self.title.set_subtitle(ngettext('{0} selected', '{0} selected', number).format(number))
-        else:
-            self.title.set_subtitle('')
+                if error is not None:
+                    # Chapter download fails
+                    progress.cancel_notification()
+                    progress.flush()
+                    raise error
 
-    @if_network_available
-    def on_start_stop_button_clicked(self, _button):
-        self.start_stop_button.set_sensitive(False)
+                progress.cancel_notification()
 
-        if self.downloader.running:
-            self.downloader.stop(save_state=True)
-        else:
-            self.downloader.start()
+                if self.stop_flag:
+                    progress.flush(status='pending')
+                else:
+                    if progress.error_counter == 0:
+                        # All pages were successfully downloaded
+                        chapter.update(dict(downloaded=1))
+                        download.delete()
+                        GLib.idle_add(self.notify_download_success, chapter)
+                    else:
+                        # At least one page failed to be downloaded
+                        progress.flush(status='error')
+                        GLib.idle_add(self.notify_download_error, download)
+            else:
+                # Possible causes:
+                # - Empty chapter
+                # - Outdated chapter info
+                # - Server has undergone changes (API, HTML) and plugin code is outdated
+                download.update(dict(status='error'))
+                GLib.idle_add(self.notify_download_error, download)
+        except Exception as e:
+            # Possible causes:
+            # - No Internet connection
+            # - Connexion timeout, read timeout
+            # - Server down
+            # - Bad/currupt local archive
+            download.update(dict(status='error'))
+            user_error_message = log_error_traceback(e)
+            GLib.idle_add(self.notify_download_error, download, user_error_message)
+
+    def run_worker(self, server_id):
+        """Processes downloads of a server until there are no more or downloader is stopped"""
+        set_retries_stop_event(self.stop_event)
+
+        # Threads fetching pages are kept from a chapter to the next: so are their DB connections (see `get_db_connection`)
+        # Waits before retries of pages requests are interrupted too
+        with ThreadPoolExecutor(DOWNLOAD_MAX_CONCURRENCY, initializer=set_retries_stop_event, initargs=(self.stop_event,)) as pages_executor:
+            while True:
+                download = None
+                if not self.stop_flag:
+                    self.wait_preemption(server_id)
+                    self.wait_server_available(server_id)
+                    download = self.get_next_download(server_id) if not self.stop_flag else None
 
-    def populate(self):
-        # Clear
-        row = self.listbox.get_first_child()
-        while row:
-            next_row = row.get_next_sibling()
-            self.listbox.remove(row)
-            row = next_row
+                if download is None:
+                    with self.workers_lock:
+                        # Checked again with lock acquired: downloads may have been added in the meantime (see `dispatch`)
+                        if not self.stop_flag:
+                            download = self.get_next_download(server_id)
+
+                        if download is None:
+                            del self.workers[server_id]
+                            if not self.workers:
+                                self.on_workers_ended()
+                            return
+
+                self.process_download(download, pages_executor)
+
+    def wait_server_available(self, server_id):
+        """Blocks while circuit breaker of a server is open: no time is wasted on a server considered down"""
+        breaker = circuit_breakers.get(server_id)
+        with self.preemptions_cond:
+            while not self.stop_flag and (retry_in := breaker.retry_in) > 0:
+                self.preemptions_cond.wait(retry_in)
 
-        db_conn = create_db_connection()
-        records = db_conn.execute('SELECT * FROM downloads ORDER BY date ASC').fetchall()
-        db_conn.close()
+    @if_network_available
+    def start(self):
+        if self.running:
+            # New downloads are picked up immediately
+            self.dispatch()
+            return
 
-        if records:
-            for record in records:
-                download = Download.get(record['id'])
+        Settings.get_default().downloader_state = True
+        self.running = True
+        self.stop_flag = False
+        self.stop_event.clear()
+        self.stopped.clear()
+        self.storage_shortage_reason = None
 
-                row = DownloadRow(download)
-                self.listbox.append(row)
+        # Downloads in error or paused (for lack of storage) are retried once per run
+        # Downloads interrupted by an application crash are resumed
+        with db_transaction() as db_conn:
+            db_conn.execute("UPDATE downloads SET status = 'pending' WHERE status != 'pending'")
 
-            self.stack.set_visible_child_name('list')
+        if Settings.get_default().desktop_notifications:
+            # Create notification
+            self.notification = Notify.Notification.new('')
+            self.notification.set_timeout(Notify.EXPIRES_DEFAULT)
         else:
-            # No downloads
-            self.stack.set_visible_child_name('empty')
+            self.notification = None
 
-    def select_all(self):
-        if not self.selection_mode:
-            self.enter_selection_mode()
+        GLib.idle_add(self.emit, 'started')
 
-        for row in self.listbox:
-            if row._selected:
-                continue
-            self.listbox.select_row(row)
-            row._selected = True
+        self.dispatch()
 
-    def show(self):
-        self.populate()
+    def stop(self, save_state=False):
+        if self.running:
+            self.stop_flag = True
+            self.stop_event.set()
+            if save_state:
+                Settings.get_default().downloader_state = False
 
-        self.update_headerbar(forced=True)
-        self.window.navigationview.push(self)
+            # Wake up workers waiting for reader
+            with self.preemptions_cond:
+                self.preemptions_cond.notify_all()
 
-    def update_headerbar(self, *args, forced=False):
-        if self.window.page != self.props.tag and not forced:
-            return
+    def wait_stopped(self, timeout=None):
+        """
+        Blocks until all workers are stopped
 
-        if self.listbox.get_first_child() is not None:
-            if self.downloader.running:
-                self.start_stop_button.get_first_child().set_from_icon_name('media-playback-stop-symbolic')
-                self.menu_button.set_visible(False)
-            else:
-                self.start_stop_button.get_first_child().set_from_icon_name('media-playback-start-symbolic')
-                self.menu_button.set_visible(True)
+        :return: False if timeout expired, True otherwise
+        """
+        return self.stopped.wait(timeout)
 
-            self.start_stop_button.set_sensitive(True)
-            self.start_stop_button.set_visible(True)
-        else:
-            # No downloads
-            self.start_stop_button.set_visible(False)
-            self.menu_button.set_visible(False)
-
-    def update_row(self, _downloader, download, chapter):
-        chapter_id = chapter.id if chapter is not None else download.chapter.id
-
-        for row in self.listbox:
-            if row.download.chapter.id == chapter_id:
-                row.download = download
-                if row.download:
-                    row.update()
-                else:
-                    self.listbox.remove(row)
-                break
 
-        if self.listbox.get_first_child() is None:
-            # No more downloads
-            self.stack.set_visible_child_name('empty')
+class DownloadProgress:
+    """
+    Progress of a chapter download
 
+    Progress is kept in memory and persisted by batches: at most every `DOWNLOAD_PROGRESS_FLUSH_INTERVAL` seconds
+    and on status change. Notifications are coalesced: at most `DOWNLOAD_PROGRESS_NOTIFY_RATE` per second,
+    a notification scheduled while another one is pending is dropped, the pending one reports the latest counters.
+    """
 
-class DownloadRow(Gtk.ListBoxRow):
-    _selected = False
+    def __init__(self, download, nb_pages, notify_func):
+        self.download = download
+        self.nb_pages = nb_pages
+        self.notify_func = notify_func
 
-    def __init__(self, download):
-        Gtk.ListBoxRow.__init__(self)
+        self.error_counter = 0
+        self.success_counter = 0
 
-        self.add_css_class('download-manager-download-listboxrow')
+        self.dirty = False
+        self.flush_time = time.monotonic()
 
-        self.download = download
+        self.lock = threading.Lock()
+        self.notification_cancelled = False
+        self.notification_source_id = None
+        self.notification_time = 0
 
-        if self.download.percent:
-            nb_pages = len(download.chapter.pages)
-            counter = int((nb_pages / 100) * self.download.percent)
-            fraction = self.download.percent / 100
+    def add(self, success):
+        """Records result of a page fetch"""
+        if success:
+            self.success_counter += 1
+            self.download.percent = self.success_counter * 100 / self.nb_pages
         else:
-            counter = None
-            fraction = None
-
-        vbox = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=6)
-
-        hbox = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=6)
-        # Manga
-        label = Gtk.Label(xalign=0)
-        label.add_css_class('body')
-        label.set_valign(Gtk.Align.CENTER)
-        label.set_wrap(True)
-        label.set_text(download.chapter.manga.name)
-        hbox.append(label)
-
-        # Progress label
-        self.progress_label = Gtk.Label(xalign=0)
-        self.progress_label.add_css_class('caption')
-        self.progress_label.set_valign(Gtk.Align.CENTER)
-        self.progress_label.set_wrap(True)
-        text = _(Download.STATUSES[self.download.status]).upper() if self.download.status == 'error' else ''
-        if counter:
-            text = f'{text} {counter}/{nb_pages}'
-        if text:
-            self.progress_label.set_text(text)
-        hbox.append(self.progress_label)
-
-        vbox.append(hbox)
-
-        # Chapter
-        label = Gtk.Label(xalign=0)
-        label.add_css_class('caption')
-        label.set_valign(Gtk.Align.CENTER)
-        label.set_wrap(True)
-        label.set_text(download.chapter.title)
-        vbox.append(label)
-
-        # Progress bar
-        self.progressbar = Gtk.ProgressBar()
-        self.progressbar.set_show_text(False)
-        if fraction:
-            self.progressbar.set_fraction(fraction)
-        vbox.append(self.progressbar)
-
-        self.set_child(vbox)
-
-    def update(self):
-        """
-        Updates chapter download progress
-        """
-        if not self.download.chapter.pages:
-            return
-
-        nb_pages = len(self.download.chapter.pages)
-        counter = int((nb_pages / 100) * self.download.percent)
-        fraction = self.download.percent / 100
+            self.error_counter += 1
+            self.download.errors = self.error_counter
+        self.dirty = True
+
+        if time.monotonic() - self.flush_time >= DOWNLOAD_PROGRESS_FLUSH_INTERVAL:
+            self.flush()
+
+        self.schedule_notification()
+
+    def cancel_notification(self):
+        with self.lock:
+            self.notification_cancelled = True
+            if self.notification_source_id is not None:
+                GLib.source_remove(self.notification_source_id)
+                self.notification_source_id = None
+
+    def flush(self, status=None):
+        """Persists progress, along with a new status if any"""
+        data = {}
+        if self.dirty:
+            data['percent'] = self.download.percent
+            data['errors'] = self.download.errors
+        if status is not None:
+            data['status'] = status
+
+        if data:
+            self.download.update(data)
+
+        self.dirty = False
+        self.flush_time = time.monotonic()
+
+    def notify(self):
+        with self.lock:
+            self.notification_source_id = None
+            if self.notification_cancelled:
+                return GLib.SOURCE_REMOVE
+
+            self.notification_time = time.monotonic()
+            success_counter = self.success_counter
+            error_counter = self.error_counter
+
+        self.notify_func(self.download, success_counter, error_counter)
+
+        return GLib.SOURCE_REMOVE
+
+    def schedule_notification(self):
+        with self.lock:
+            if self.notification_source_id is not None or self.notification_cancelled:
+                return
 
-        self.progressbar.set_fraction(fraction)
-        text = _(Download.STATUSES[self.download.status]).upper() if self.download.status == 'error' else ''
-        text = f'{text} {counter}/{nb_pages}'
-        self.progress_label.set_text(text)
+            delay = self.notification_time + 1 / DOWNLOAD_PROGRESS_NOTIFY_RATE - time.monotonic()
+            if delay > 0:
+                self.notification_source_id = GLib.timeout_add(int(delay * 1000) + 1, self.notify)
+            else:
+                self.notification_source_id = GLib.idle_add(self.notify)
@@ -15,7 +15,6 @@ from komikku.utils import COVER_WIDTH
 from komikku.utils import html_escape
 from komikku.utils import PaintableCover
 
-DOWNLOAD_MAX_DELAY = 1  # in seconds
 LOGO_SIZE = 28
 THUMB_WIDTH = 45
 THUMB_HEIGHT = 62
@@ -15,7 +15,8 @@ from komikku.explorer.search.latest_updates import ExplorerSearchStackPageLatest
 from komikku.explorer.search.most_popular import ExplorerSearchStackPageMostPopular
 from komikku.explorer.search.search import ExplorerSearchStackPageSearch
 from komikku.explorer.search.search_global import ExplorerSearchStackPageSearchGlobal
-from komikku.models import create_db_connection
+from komikku.models import DownloadPriority
+from komikku.models import get_db_connection
 from komikku.models import Manga
 from komikku.models import Settings
 from komikku.utils import log_error_traceback
@@ -360,7 +361,7 @@ class ExplorerSearchPage(Adw.NavigationPage):
         def run_update(server, manga_id):
             manga = Manga.get(manga_id, server)
             try:
-                status, recent_chapters_ids, nb_deleted_chapters, synced = manga.update_full()
+                status, recent_chapters_ids, nb_deleted_chapters, synced, _unchanged = manga.update_full()
                 if status is True:
                     GLib.idle_add(complete_update, manga, server, recent_chapters_ids, nb_deleted_chapters, synced)
                 else:
@@ -385,7 +386,7 @@ class ExplorerSearchPage(Adw.NavigationPage):
             if nb_recent_chapters > 0:
                 # Auto download new chapters
                 if Settings.get_default().new_chapters_auto_download:
-                    self.window.downloader.add(recent_chapters_ids, emit_signal=True)
+                    self.window.downloader.add(recent_chapters_ids, emit_signal=True, priority=DownloadPriority.AUTO)
                     self.window.downloader.start()
 
                 self.window.library.refresh_on_manga_state_changed(manga)
@@ -413,12 +414,10 @@ class ExplorerSearchPage(Adw.NavigationPage):
             self.server = server
 
         # Check if selected manga is already in database
-        db_conn = create_db_connection()
-        record = db_conn.execute(
-            'SELECT * FROM mangas WHERE slug = ? AND server_id = ?',
+        record = get_db_connection().execute(
+            'SELECT id FROM mangas WHERE slug = ? AND server_id = ?',
             (manga_data['slug'], self.server.id)
         ).fetchone()
-        db_conn.close()
 
         if record:
             thread = threading.Thread(target=run_update, args=(self.server, record['id'], ))
@@ -6,11 +6,9 @@ import gc
 from gettext import gettext as _
 from queue import Empty, Queue
 import threading
-import time
 
 from gi.repository import GLib
 
-from komikku.explorer.common import DOWNLOAD_MAX_DELAY
 from komikku.explorer.common import ExplorerSearchResultRow
 from komikku.explorer.common import ExplorerSearchStackPage
 from komikku.utils import log_error_traceback
@@ -70,7 +68,6 @@ class ExplorerSearchStackPageSearch(ExplorerSearchStackPage):
                     # And if search page is `search`
                     proceed = proceed and self.parent.page == 'search'
                     if proceed:
-                        start = time.time()
                         try:
                             data, _etag = server.get_manga_cover_image(row.manga_data['cover'])
                         except Exception:
@@ -78,10 +75,6 @@ class ExplorerSearchStackPageSearch(ExplorerSearchStackPage):
                         else:
                             GLib.idle_add(row.set_cover, data)
 
-                            delay = min(2 * (time.time() - start), DOWNLOAD_MAX_DELAY)
-                            if delay:
-                                time.sleep(delay)
-
                     queue.task_done()
 
         def complete(results, server, queue):
@@ -8,7 +8,6 @@ import gc
 from gettext import gettext as _
 from queue import Empty, Queue
 import threading
-import time
 
 from gi.repository import GLib
 from gi.repository import Gio
@@ -19,7 +18,6 @@ from komikku.models import Settings
 from komikku.servers import LANGUAGES
 from komikku.utils import log_error_traceback
 
-from komikku.explorer.common import DOWNLOAD_MAX_DELAY
 from komikku.explorer.common import ExplorerServerRow
 from komikku.explorer.common import ExplorerSearchResultRow
 from komikku.explorer.common import ExplorerSearchStackPage
@@ -105,7 +103,6 @@ class ExplorerSearchStackPageSearchGlobal(ExplorerSearchStackPage):
                     continue
                 else:
                     if self.window.page == self.parent.props.tag or self.window.previous_page == self.parent.props.tag:
-                        start = time.time()
                         try:
                             data, _etag = server.get_manga_cover_image(row.manga_data['cover'])
                         except Exception:
@@ -113,10 +110,6 @@ class ExplorerSearchStackPageSearchGlobal(ExplorerSearchStackPage):
                         else:
                             GLib.idle_add(row.set_cover, data)
 
-                            delay = min(2 * (time.time() - start), DOWNLOAD_MAX_DELAY)
-                            if delay:
-                                time.sleep(delay)
-
                     queue.task_done()
 
         def complete():
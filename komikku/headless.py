@@ -0,0 +1,264 @@
+# Copyright (C) 2019-2024 Valéry Febvre
+# SPDX-License-Identifier: GPL-3.0-only or GPL-3.0-or-later
+# Author: Valéry Febvre <vfebvre@easter-eggs.com>
+
+"""
+Headless mode: library update and downloads without a display (from cron for ex.)
+
+Updater and Downloader are driven by a GLib main loop, with a window-like object in place of application window.
+Progress is written on stdout as JSON lines (one object per event), logs are written on stderr.
+
+Can't run while graphical application is running: both use same database, downloads queue and chapters files.
+
+Exit code: 0 on success, 1 if some updates or downloads failed, 2 if nothing could be done (already running, offline, stopped)
+"""
+
+import argparse
+import datetime
+import json
+import logging
+import signal
+import sys
+
+from gi.repository import Gio
+from gi.repository import GLib
+
+from komikku.downloader import Downloader
+from komikku.models import close_db_connections
+from komikku.models import DownloadPriority
+from komikku.models import init_db
+from komikku.models import Settings
+from komikku.models import storage_usage
+from komikku.updater import Updater
+from komikku.utils import lock_data_dir
+
+EXIT_SUCCESS = 0
+EXIT_FAILURES = 1
+EXIT_ERROR = 2
+
+logger = logging.getLogger('komikku')
+
+
+class HeadlessApplication(Gio.Application):
+    """
+    Application without windows
+
+    Shares database and data folder with graphical application (same application ID and profile).
+    """
+    application_id = None
+    profile = None
+    version = None
+
+    def __init__(self):
+        # Non unique: graphical application must not be activated (see `is_application_running()` in `run_headless()`)
+        super().__init__(application_id=self.application_id, flags=Gio.ApplicationFlags.NON_UNIQUE)
+
+        self.exit_code = EXIT_SUCCESS
+        self.failures = 0
+        self.loop = GLib.MainLoop()
+        self.window = None
+
+    def is_application_running(self):
+        """Returns True if graphical application is registered on session bus"""
+        try:
+            bus = Gio.bus_get_sync(Gio.BusType.SESSION, None)
+            result = bus.call_sync(
+                'org.freedesktop.DBus', '/org/freedesktop/DBus', 'org.freedesktop.DBus', 'NameHasOwner',
+                GLib.Variant('(s)', (self.application_id,)), GLib.VariantType('(b)'), Gio.DBusCallFlags.NONE, -1, None
+            )
+        except GLib.Error as error:
+            logger.debug(f'Failed to query session bus: {error.message}')
+            return False
+
+        return result.unpack()[0]
+
+    def output(self, event, **data):
+        """Writes an event on stdout as a JSON line"""
+        print(json.dumps(dict(event=event, date=datetime.datetime.utcnow().isoformat(), **data), default=str), flush=True)
+
+    def run_headless(self, args):
+        self.set_default()
+
+        logging.basicConfig(
+            format='%(asctime)s | %(levelname)s | %(name)s | %(message)s', datefmt='%d-%m-%y %H:%M:%S',
+            level=logging.DEBUG if args.verbose else logging.WARNING, stream=sys.stderr
+        )
+
+        # Graphical application (or another headless run) processes same library and downloads queue
+        if self.is_application_running() or not lock_data_dir():
+            self.output('error', message='Komikku is already running')
+            return EXIT_ERROR
+
+        init_db()
+        if Settings.get_default().storage_quota:
+            storage_usage.preload()
+
+        self.window = HeadlessWindow(self)
+        if not self.window.network_available:
+            self.output('error', message='No network connection')
+            return EXIT_ERROR
+
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            GLib.unix_signal_add(GLib.PRIORITY_DEFAULT, signum, self.stop)
+
+        downloads = args.download or not args.update
+        if args.update or not args.download:
+            self.window.updater.download_new_chapters = downloads
+            GLib.idle_add(self.start_update, args.forced, downloads)
+        else:
+            GLib.idle_add(self.start_downloads)
+
+        self.loop.run()
+
+        close_db_connections(checkpoint=True)
+
+        if self.exit_code == EXIT_SUCCESS and self.failures:
+            self.exit_code = EXIT_FAILURES
+        self.output('ended', failures=self.failures, exit_code=self.exit_code)
+
+        return self.exit_code
+
+    def start_downloads(self):
+        downloader = self.window.downloader
+        downloader.connect('ended', lambda _downloader: self.loop.quit())
+        downloader.start()
+        if not downloader.running:
+            # No pending downloads or offline
+            self.loop.quit()
+
+        return GLib.SOURCE_REMOVE
+
+    def start_update(self, forced, downloads):
+        updater = self.window.updater
+        updater.on_ended = self.start_downloads if downloads else self.loop.quit
+
+        self.output('update-started', forced=forced)
+        if not updater.update_library(forced=forced):
+            # No mangas due for update: `notify_updates_ended()` won't be called
+            updater.on_ended()
+
+        return GLib.SOURCE_REMOVE
+
+    def stop(self):
+        self.output('stopping')
+        self.exit_code = EXIT_ERROR
+
+        if self.window.updater.running:
+            # Downloads are not started once update is ended
+            self.window.updater.on_ended = self.loop.quit
+            self.window.updater.stop()
+        elif self.window.downloader.running:
+            self.window.downloader.stop()
+        else:
+            self.loop.quit()
+
+        return GLib.SOURCE_CONTINUE
+
+
+class HeadlessDownloader(Downloader):
+    """Downloader whose notifications are written on stdout"""
+
+    def notify_download_error(self, download, message=None):
+        self.window.application.failures += 1
+        self.window.application.output(
+            'download-failed',
+            chapter_id=download.chapter.id, manga=download.chapter.manga.name, chapter=download.chapter.title, message=message
+        )
+
+        return False
+
+    def notify_download_paused(self, download, reason):
+        if reason != self.storage_shortage_reason:
+            self.storage_shortage_reason = reason
+            self.window.application.output('downloads-paused', reason=reason)
+
+        return False
+
+    def notify_download_progress(self, download, success_counter, error_counter):
+        self.window.application.output(
+            'download-progress',
+            chapter_id=download.chapter.id, pages=len(download.chapter.pages), downloaded=success_counter, errors=error_counter
+        )
+
+        return False
+
+    def notify_download_started(self, download):
+        self.window.application.output(
+            'download-started', chapter_id=download.chapter.id, manga=download.chapter.manga.name, chapter=download.chapter.title
+        )
+
+        return False
+
+    def notify_download_success(self, chapter):
+        self.window.application.output('download-completed', chapter_id=chapter.id, manga=chapter.manga.name, chapter=chapter.title)
+
+        return False
+
+
+class HeadlessUpdater(Updater):
+    """Updater whose notifications are written on stdout"""
+
+    download_new_chapters = False
+    on_ended = None
+
+    def notify_update_error(self, manga, message=None):
+        self.window.application.failures += 1
+        self.window.application.output('manga-update-failed', manga_id=manga.id, manga=manga.name, server_id=manga.server_id, message=message)
+
+        return False
+
+    def notify_update_success(self, manga, recent_chapters_ids, nb_deleted_chapters, synced):
+        self.window.application.output(
+            'manga-updated',
+            manga_id=manga.id, manga=manga.name, server_id=manga.server_id,
+            new_chapters=len(recent_chapters_ids), deleted_chapters=nb_deleted_chapters,
+        )
+
+        # New chapters are downloaded once library update is ended
+        if recent_chapters_ids and self.download_new_chapters and Settings.get_default().new_chapters_auto_download:
+            self.window.downloader.add(recent_chapters_ids, priority=DownloadPriority.AUTO)
+
+        return False
+
+    def notify_updates_ended(self, totals, update_library):
+        self.window.application.output('update-ended', **totals)
+        if self.on_ended is not None:
+            self.on_ended()
+
+        return False
+
+    def show_notification(self, id, title, body=None):
+        self.window.application.output('notification', title=title, body=body)
+
+        return False
+
+
+class HeadlessWindow:
+    """Stands in for application window: provides Updater and Downloader with what they expect from it"""
+
+    def __init__(self, application):
+        self.application = application
+
+        self.downloader = HeadlessDownloader(self)
+        self.updater = HeadlessUpdater(self)
+
+    @property
+    def network_available(self):
+        return Gio.NetworkMonitor.get_default().get_connectivity() == Gio.NetworkConnectivity.FULL
+
+    def show_notification(self, message, timeout=5):
+        self.application.output('notification', title=message)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(
+        prog='komikku-headless',
+        description='Updates library and downloads chapters without a display. Progress is written on stdout as JSON lines.',
+    )
+    parser.add_argument('--update', action='store_true', help='update library (mangas due for update only, unless --forced)')
+    parser.add_argument('--forced', action='store_true', help='update all mangas of library regardless of their schedule')
+    parser.add_argument('--download', action='store_true', help='process downloads queue (after library update if --update)')
+    parser.add_argument('--verbose', action='store_true', help='write debug logs on stderr')
+    args = parser.parse_args(argv[1:])
+
+    return HeadlessApplication().run_headless(args)
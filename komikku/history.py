@@ -12,7 +12,7 @@ from gi.repository import GObject
 from gi.repository import Gtk
 
 from komikku.models import Chapter
-from komikku.models import create_db_connection
+from komikku.models import get_db_connection
 from komikku.utils import html_escape
 from komikku.utils import PaintableCover
 
@@ -95,10 +95,12 @@ class HistoryPage(Adw.NavigationPage):
             self.dates_box.remove(box)
             box = next_box
 
-        db_conn = create_db_connection()
         start = (datetime.date.today() - datetime.timedelta(days=DAYS_LIMIT)).strftime('%Y-%m-%d')
-        records = db_conn.execute('SELECT * FROM chapters WHERE last_read >= ? ORDER BY last_read DESC', (start,)).fetchall()
-        db_conn.close()
+        cursor = get_db_connection().execute(
+            Chapter.get_select_sql(Chapter.LIST_COLUMNS) + ' WHERE last_read >= ? ORDER BY last_read DESC', (start,)
+        )
+        keys = Chapter.get_row_keys(cursor)
+        records = cursor.fetchall()
 
         if records:
             local_timezone = datetime.datetime.utcnow().astimezone().tzinfo
@@ -108,7 +110,7 @@ class HistoryPage(Adw.NavigationPage):
             current_date = None
             current_manga_id = None
             for record in records:
-                chapter = Chapter.get(record['id'])
+                chapter = Chapter(record, keys=keys)
                 # Convert chapter's last read date in local timezone
                 last_read = chapter.last_read.replace(tzinfo=pytz.UTC).astimezone(local_timezone)
                 date_changed = current_date is None or current_date != last_read.date()
@@ -5,7 +5,6 @@
 from gettext import gettext as _
 from gettext import ngettext
 import threading
-import time
 
 from gi.repository import Adw
 from gi.repository import Gdk
@@ -18,7 +17,9 @@ from komikku.library.categories_list import CategoriesList
 from komikku.library.thumbnail import Thumbnail
 from komikku.models import Category
 from komikku.models import CategoryVirtual
-from komikku.models import create_db_connection
+from komikku.models import chapters_counters
+from komikku.models import db_transaction
+from komikku.models import get_db_connection
 from komikku.models import Manga
 from komikku.models import Settings
 from komikku.models import update_rows
@@ -240,6 +241,10 @@ class LibraryPage(Adw.NavigationPage):
         update_action.connect('activate', self.update_all)
         self.window.application.add_action(update_action)
 
+        update_forced_action = Gio.SimpleAction.new('library.update-forced', None)
+        update_forced_action.connect('activate', self.update_all, True)
+        self.window.application.add_action(update_forced_action)
+
         variant = GLib.Variant.new_string(Settings.get_default().library_sort_order)
         self.sort_order_action = Gio.SimpleAction.new_stateful('library.sort-order', variant.get_type(), variant)
         self.sort_order_action.connect('activate', self.on_sort_order_changed)
@@ -328,9 +333,8 @@ class LibraryPage(Adw.NavigationPage):
             self.window.downloader.stop()
             self.window.updater.stop()
 
-            while self.window.downloader.running or self.window.updater.running:
-                time.sleep(0.1)
-                continue
+            self.window.downloader.wait_stopped()
+            self.window.updater.wait_stopped()
 
             # Safely delete mangas in DB
             for manga in mangas:
@@ -458,9 +462,7 @@ class LibraryPage(Adw.NavigationPage):
 
     def on_manga_added(self, manga):
         """Called from 'Card' when user clicks on `+ Add to Library` button"""
-        db_conn = create_db_connection()
-        nb_mangas = db_conn.execute('SELECT count(*) FROM mangas WHERE in_library = 1').fetchone()[0]
-        db_conn.close()
+        nb_mangas = get_db_connection().execute('SELECT count(*) FROM mangas WHERE in_library = 1').fetchone()[0]
 
         if nb_mangas == 1:
             # Library was previously empty
@@ -591,12 +593,14 @@ class LibraryPage(Adw.NavigationPage):
 
         self.show_page('start_page')
 
-        db_conn = create_db_connection()
+        db_conn = get_db_connection()
 
         self.update_title(db_conn=db_conn)
 
-        mangas_rows = db_conn.execute('SELECT id FROM mangas WHERE in_library = 1 ORDER BY last_read DESC').fetchall()
-        db_conn.close()
+        # Only columns used by library are selected, others are loaded on demand
+        cursor = db_conn.execute(Manga.get_select_sql(Manga.LIST_COLUMNS) + ' WHERE in_library = 1 ORDER BY last_read DESC')
+        keys = Manga.get_row_keys(cursor)
+        mangas_rows = cursor.fetchall()
 
         paintable = Gdk.Texture.new_from_resource('/info/febvre/Komikku/images/logo.png')
         self.start_page_logo_image.set_from_paintable(paintable)
@@ -623,15 +627,15 @@ class LibraryPage(Adw.NavigationPage):
             thumbnail = next_thumbnail
 
         def run():
-            db_conn = create_db_connection()
+            # Compute badges/filters counters of all mangas at once
+            chapters_counters.load()
 
             for index, row in enumerate(mangas_rows):
-                thumbnail = Thumbnail(self, Manga.get(row['id'], db_conn=db_conn), *self.thumbnails_cover_size)
+                thumbnail = Thumbnail(self, Manga(row=row, keys=keys), *self.thumbnails_cover_size)
                 thumbnails.append(thumbnail)
 
                 GLib.idle_add(self.start_page_progressbar.set_fraction, (index + 1) / len(mangas_rows))
 
-            db_conn.close()
             GLib.idle_add(complete)
 
         def complete():
@@ -716,10 +720,11 @@ class LibraryPage(Adw.NavigationPage):
                     recent=False,
                 ))
 
-        db_conn = create_db_connection()
-        with db_conn:
+        with db_transaction() as db_conn:
             res = update_rows(db_conn, 'chapters', chapters_ids, chapters_data)
-        db_conn.close()
+
+        for thumbnail in self.flowbox.get_selected_children():
+            chapters_counters.invalidate(thumbnail.manga.id)
 
         self.window.activity_indicator.stop()
 
@@ -728,15 +733,15 @@ class LibraryPage(Adw.NavigationPage):
         else:
             if Settings.get_default().library_badges:
                 for thumbnail in self.flowbox.get_selected_children():
-                    thumbnail.update()
+                    thumbnail.update(thumbnail.manga)
 
             self.leave_selection_mode()
 
             if self.selected_filters:
                 self.flowbox.invalidate_filter()
 
-    def update_all(self, _action, _param):
-        self.window.updater.update_library()
+    def update_all(self, _action, _param, forced=False):
+        self.window.updater.update_library(forced=forced)
 
     def update_headerbar_buttons(self):
         if self.page == 'flowbox':
@@ -11,7 +11,8 @@ from gi.repository import Gtk
 
 from komikku.models import Category
 from komikku.models import CategoryVirtual
-from komikku.models import create_db_connection
+from komikku.models import db_transaction
+from komikku.models import get_db_connection
 from komikku.models import delete_rows
 from komikku.models import insert_rows
 from komikku.models import Settings
@@ -85,15 +86,12 @@ class CategoriesList:
                             category_id=row.category.id,
                         ))
 
-            db_conn = create_db_connection()
-            with db_conn:
+            with db_transaction() as db_conn:
                 if insert_data:
                     insert_rows(db_conn, 'categories_mangas_association', insert_data)
                 if delete_data:
                     delete_rows(db_conn, 'categories_mangas_association', delete_data)
 
-            db_conn.close()
-
             GLib.idle_add(complete)
 
         def complete():
@@ -110,12 +108,11 @@ class CategoriesList:
         thread.start()
 
     def populate(self):
-        db_conn = create_db_connection()
+        db_conn = get_db_connection()
         categories = db_conn.execute('SELECT * FROM categories ORDER BY label ASC').fetchall()
         nb_categorized = db_conn.execute('SELECT count(*) FROM categories_mangas_association').fetchone()[0]
 
         if not categories and self.edit_mode:
-            db_conn.close()
             return
 
         self.clear()
@@ -177,7 +174,5 @@ class CategoriesList:
             Settings.get_default().selected_category = CategoryVirtual.ALL
             self.stack.set_visible_child_name('empty')
 
-        db_conn.close()
-
     def set_edit_mode(self, edit_mode):
         self.edit_mode = edit_mode
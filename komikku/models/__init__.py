@@ -8,12 +8,20 @@ from .database import backup_db
 from .database import Category
 from .database import CategoryVirtual
 from .database import Chapter
+from .database import chapters_counters
+from .database import checkpoint_db
+from .database import close_db_connections
 from .database import create_db_connection
+from .database import db_transaction
 from .database import delete_rows
 from .database import Download
+from .database import DownloadPriority
+from .database import get_db_connection
 from .database import init_db
 from .database import insert_rows
 from .database import Manga
+from .database import ReadProgress
+from .database import storage_usage
 from .database import update_rows
 
 from .settings import Settings
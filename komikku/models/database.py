@@ -3,22 +3,28 @@
 # Author: Valéry Febvre <vfebvre@easter-eggs.com>
 
 from colorthief import ColorThief
+from contextlib import contextmanager
 import datetime
 from enum import IntEnum
 from functools import cache
 import gc
 from gettext import gettext as _
+import hashlib
 import importlib
 import json
 import logging
-import natsort
 import os
-from PIL import Image
+import re
 import sqlite3
 import shutil
+import statistics
+import threading
+import time
 
 from gi.repository import Gio
 
+from komikku.servers.cache import forced_revalidation
+from komikku.servers.exceptions import NotModifiedError
 from komikku.servers.utils import convert_image
 from komikku.servers.utils import get_server_class_name_by_id
 from komikku.servers.utils import get_server_dir_name_by_id
@@ -30,36 +36,187 @@ from komikku.utils import trunc_filename
 
 logger = logging.getLogger(__name__)
 
-VERSION = 12
+VERSION = 18
+
+DB_BUSY_TIMEOUT = 10000  # in milliseconds
+DB_CACHE_SIZE = -16000  # in KiB when negative
+DB_CACHED_STATEMENTS = 256  # number of prepared statements cached per connection
+DB_BACKUP_PAGES_PER_STEP = 1024  # DB lock is released between steps
+DB_FULL_CHECK_INTERVAL = 7 * 24 * 3600  # in seconds, quick checks are done in between
+NATSORT_DIGITS_RE = re.compile(r'\d+')
+CHAPTER_MANIFEST_NAME = '.manifest.json'  # size and checksum of downloaded pages
+STORAGE_DEFAULT_NB_PAGES = 30  # number of pages of a chapter used for estimates when its pages are unknown
+STORAGE_DEFAULT_PAGE_SIZE = 500 * 1024  # in bytes, size of a page used for estimates when no page has been downloaded yet
+UPDATE_CADENCE_NB_RELEASES = 10  # number of latest releases used to learn release cadence of a manga
+UPDATE_INTERVAL_DEFAULT = datetime.timedelta(days=1)  # no known releases
+UPDATE_INTERVAL_MIN = datetime.timedelta(hours=6)
+UPDATE_INTERVAL_MAX = datetime.timedelta(days=14)
+UPDATE_INTERVAL_INACTIVE_MIN = datetime.timedelta(days=30)  # complete and suspended mangas
+UPDATE_INTERVAL_INACTIVE_MAX = datetime.timedelta(days=180)
+
+# Indexes of hot queries (DB version 15)
+SQL_CREATE_INDEXES_V15 = [
+    # Chapters list and get_next_chapter() (default and date sort orders)
+    'CREATE INDEX IF NOT EXISTS idx_chapters_rank on chapters(manga_id, rank);',
+    'CREATE INDEX IF NOT EXISTS idx_chapters_date on chapters(manga_id, date);',
+    # History
+    'CREATE INDEX IF NOT EXISTS idx_chapters_last_read on chapters(last_read);',
+    # Library
+    'CREATE INDEX IF NOT EXISTS idx_mangas_in_library_last_read on mangas(in_library, last_read);',
+]
 
 
 def adapt_json(data):
     return (json.dumps(data, sort_keys=True)).encode()
 
 
-def convert_json(blob):
-    return json.loads(blob.decode())
+def convert_json(data):
+    # JSON is usually stored as BLOB (see `adapt_json`) but may have been stored as TEXT
+    return json.loads(data)
+
+
+class ReadProgress:
+    """
+    Reading status of the pages of a chapter, stored as a bitset (one bit per page)
+
+    Serialized form: number of pages (4 bytes, big-endian) followed by the bits.
+    """
+
+    __slots__ = ('bits', 'nb_read', 'size')
+
+    def __init__(self, size, bits=None):
+        self.size = size
+        self.bits = bytearray(bits) if bits is not None else bytearray((size + 7) // 8)
+        self.nb_read = int.from_bytes(self.bits, 'big').bit_count() if bits is not None else 0
+
+    def __len__(self):
+        return self.size
+
+    @classmethod
+    def from_bytes(cls, blob):
+        return cls(int.from_bytes(blob[:4], 'big'), blob[4:])
+
+    @classmethod
+    def from_string(cls, text):
+        """Creates from legacy format: a string of '0' and '1' characters"""
+        read_progress = cls(len(text))
+        for index, char in enumerate(text):
+            if char == '1':
+                read_progress.set(index)
+
+        return read_progress
+
+    @property
+    def all_read(self):
+        return self.nb_read == self.size
+
+    def count(self):
+        """Returns the number of read pages"""
+        return self.nb_read
+
+    def set(self, index):
+        """Marks a page as read"""
+        if not 0 <= index < self.size:
+            raise IndexError('Page index out of range')
+
+        mask = 1 << (index % 8)
+        if not self.bits[index // 8] & mask:
+            self.bits[index // 8] |= mask
+            self.nb_read += 1
+
+    def test(self, index):
+        """Returns True if a page is read"""
+        if not 0 <= index < self.size:
+            raise IndexError('Page index out of range')
+
+        return bool(self.bits[index // 8] & (1 << (index % 8)))
+
+    def to_bytes(self):
+        return self.size.to_bytes(4, 'big') + bytes(self.bits)
 
 
 sqlite3.register_adapter(dict, adapt_json)
 sqlite3.register_adapter(list, adapt_json)
 sqlite3.register_adapter(tuple, adapt_json)
-sqlite3.register_converter('json', convert_json)
+sqlite3.register_adapter(ReadProgress, ReadProgress.to_bytes)
+sqlite3.register_converter('bitset', ReadProgress.from_bytes)
+# JSON columns are not converted at fetch time but lazily decoded by models (see `JsonColumn`)
 
 
 def backup_db():
+    """
+    Saves a backup of DB if it's sane
+
+    SQLite online backup API is used: DB is copied by steps of `DB_BACKUP_PAGES_PER_STEP` pages, other connections are
+    not blocked in between. It doesn't depend on WAL checkpoints and can be called from any thread.
+
+    :return: timings in seconds (check, backup) or None if no backup has been saved
+    :rtype: dict or None
+    """
     db_path = get_db_path()
-    if os.path.exists(db_path) and check_db():
-        logger.info('Save a DB backup')
-        shutil.copyfile(db_path, get_db_backup_path())
+    if not os.path.exists(db_path):
+        return None
+
+    start = time.perf_counter()
+    if not check_db():
+        logger.warning('DB check failed, backup skipped')
+        return None
 
+    timings = dict(check=time.perf_counter() - start)
 
-def check_db():
+    start = time.perf_counter()
+    db_backup_path = get_db_backup_path()
+    db_backup_tmp_path = db_backup_path + '.tmp'
+    db_conn = create_db_connection()
+    db_backup_conn = None
+    try:
+        db_backup_conn = sqlite3.connect(db_backup_tmp_path)
+        db_conn.backup(db_backup_conn, pages=DB_BACKUP_PAGES_PER_STEP)
+    except sqlite3.Error:
+        logger.exception('Failed to save a DB backup')
+        ret = False
+    else:
+        ret = True
+    finally:
+        db_conn.close()
+        if db_backup_conn is not None:
+            db_backup_conn.close()
+
+    if not ret:
+        if os.path.exists(db_backup_tmp_path):
+            os.remove(db_backup_tmp_path)
+        return None
+
+    # Previous backup is only replaced by a complete one
+    os.replace(db_backup_tmp_path, db_backup_path)
+    timings['backup'] = time.perf_counter() - start
+
+    logger.info('DB backup saved (check: {0:.3f}s, backup: {1:.3f}s)'.format(timings['check'], timings['backup']))
+
+    return timings
+
+
+def check_db(full=None):
+    """
+    Checks DB integrity and foreign keys
+
+    :param full: full integrity check if True, quick check (no indexes content verification) if False.
+                 By default, full check is done every `DB_FULL_CHECK_INTERVAL` seconds.
+    :return: True if DB is sane, False otherwise
+    :rtype: bool
+    """
+    # Modification time of stamp file is the time of last full check
+    stamp_path = get_db_path() + '.fullcheck'
+    if full is None:
+        full = not os.path.exists(stamp_path) or time.time() - os.path.getmtime(stamp_path) > DB_FULL_CHECK_INTERVAL
+
+    ret = False
     db_conn = create_db_connection()
 
     if db_conn:
+        start = time.perf_counter()
         try:
-            res = db_conn.execute('PRAGMA integrity_check').fetchone()  # PRAGMA quick_check
+            res = db_conn.execute('PRAGMA integrity_check' if full else 'PRAGMA quick_check').fetchone()
 
             fk_violations = len(db_conn.execute('PRAGMA foreign_key_check').fetchall())
 
@@ -70,9 +227,32 @@ def check_db():
 
         db_conn.close()
 
+        logger.info('DB {0} check: {1} ({2:.3f}s)'.format('full' if full else 'quick', 'ok' if ret else 'failed', time.perf_counter() - start))
+
+        if ret and full:
+            with open(stamp_path, 'w'):
+                pass
+
     return ret
 
 
+def checkpoint_db(mode='PASSIVE'):
+    """
+    Transfers WAL file content into database file
+
+    :param str mode: PASSIVE (don't wait for readers or writers) or TRUNCATE (wait, then truncate WAL file)
+    :return: True if all WAL frames have been checkpointed, False otherwise
+    :rtype: bool
+    """
+    try:
+        busy, nb_frames, nb_checkpointed_frames = get_db_connection().execute(f'PRAGMA wal_checkpoint({mode})').fetchone()
+    except sqlite3.DatabaseError:
+        logger.exception('Failed to checkpoint DB')
+        return False
+
+    return busy == 0 and nb_frames == nb_checkpointed_frames
+
+
 def clear_cached_data(manga_in_use=None):
     # Clear chapters cache
     cache_dir_path = get_cached_data_dir()
@@ -87,23 +267,38 @@ def clear_cached_data(manga_in_use=None):
             shutil.rmtree(server_dir_path)
 
     # Clear database
-    db_conn = create_db_connection()
-    with db_conn:
+    with db_transaction() as db_conn:
         if manga_in_use:
             db_conn.execute('DELETE FROM mangas WHERE in_library != 1 AND id != ?', (manga_in_use.id, ))
         else:
             db_conn.execute('DELETE FROM mangas WHERE in_library != 1')
 
-    db_conn.close()
 
+def close_db_connections(checkpoint=False):
+    """
+    Closes connections of all threads
 
-def collate_natsort(value1, value2):
-    lst = natsort.natsorted([value1, value2], alg=natsort.ns.INT | natsort.ns.IC)
-    return -1 if lst[0] == value1 else 1
+    :param bool checkpoint: whether WAL file must be checkpointed and truncated before (at shutdown)
+    """
+    if checkpoint and not checkpoint_db('TRUNCATE'):
+        logger.warning('Failed to checkpoint DB at shutdown')
 
+    db_pool.close_all()
 
-def create_db_connection():
-    con = sqlite3.connect(get_db_path(), detect_types=sqlite3.PARSE_DECLTYPES)
+
+def create_db_connection(path=None, check_same_thread=True):
+    """
+    Opens a new dedicated connection
+
+    Prefer `get_db_connection()` or `db_transaction()`: dedicated connections are only useful
+    for maintenance tasks (migrations, checks, backups) and must be closed by the caller.
+    """
+    con = sqlite3.connect(
+        path or get_db_path(),
+        detect_types=sqlite3.PARSE_DECLTYPES,
+        check_same_thread=check_same_thread,
+        cached_statements=DB_CACHED_STATEMENTS
+    )
     if con is None:
         logger.error('Can not create the database connection')
         return None
@@ -113,12 +308,25 @@ def create_db_connection():
     # Enable integrity constraint
     con.execute('PRAGMA foreign_keys = ON')
 
-    # Add natural sort collation
-    con.create_collation('natsort', collate_natsort)
+    # Tuning for concurrent access (WAL journal mode is enabled in `init_db`):
+    # - wait for locks instead of failing immediately
+    # - in WAL mode, NORMAL synchronous is safe (a power loss can only rollback last commits)
+    con.execute(f'PRAGMA busy_timeout = {DB_BUSY_TIMEOUT}')
+    con.execute('PRAGMA synchronous = NORMAL')
+    con.execute(f'PRAGMA cache_size = {DB_CACHE_SIZE}')
 
     return con
 
 
+def db_transaction():
+    """
+    Unit of work on the connection of the calling thread
+
+    Commits on success, rollbacks on error. Nested units of work join the outermost one.
+    """
+    return db_pool.transaction()
+
+
 def execute_sql(conn, sql):
     try:
         c = conn.cursor()
@@ -132,6 +340,64 @@ def execute_sql(conn, sql):
         return True
 
 
+def get_data_hash(data):
+    """Returns hash of data returned by a server (`get_manga_data()`), used to detect unchanged data"""
+    return hashlib.sha1(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def get_update_interval(status, dates, today=None):
+    """
+    Returns delay before next update of a manga, learned from its release cadence
+
+    Cadence is the median gap between latest releases: a manga is checked again when its next release is expected,
+    then less and less often while this release is overdue. Complete and suspended mangas decay to rare checks.
+
+    :param status: status of manga
+    :param dates: dates of releases (chapters dates and date of last update which found new chapters)
+    :param today: reference date (today by default)
+    :rtype: datetime.timedelta
+    """
+    dates = sorted(set(date for date in dates if date is not None), reverse=True)[:UPDATE_CADENCE_NB_RELEASES + 1]
+    if not dates:
+        return UPDATE_INTERVAL_DEFAULT
+
+    today = today or datetime.date.today()
+    elapsed = max(datetime.timedelta(), today - dates[0])
+
+    if status in ('complete', 'suspended'):
+        return max(UPDATE_INTERVAL_INACTIVE_MIN, min(elapsed / 2, UPDATE_INTERVAL_INACTIVE_MAX))
+
+    if len(dates) > 1:
+        cadence = statistics.median(previous - date for previous, date in zip(dates, dates[1:]))
+    else:
+        # Unknown, a single release
+        cadence = datetime.timedelta()
+    if elapsed < cadence:
+        interval = cadence - elapsed
+    else:
+        # Overdue: a late release is soon found, an abandoned manga is rarely checked
+        interval = (elapsed - cadence) / 2
+
+    return max(UPDATE_INTERVAL_MIN, min(interval, UPDATE_INTERVAL_MAX))
+
+
+def get_natsort_key(title):
+    """
+    Returns a key whose binary ordering is the natural ordering of titles (case insensitive, integers compared by value)
+
+    Each run of digits is replaced by a marker lower than any printable character, followed by its length and its digits
+    (without leading zeros), so that '2' < '10' and 'Chapter 2' < 'Chapter 2.5' < 'Chapter 10' < 'Chapter A'.
+    """
+    if not title:
+        return ''
+
+    def encode_int(match):
+        digits = match.group(0).lstrip('0') or '0'
+        return '\x01' + chr(0x20 + len(digits)) + digits
+
+    return NATSORT_DIGITS_RE.sub(encode_int, title.casefold())
+
+
 @cache
 def get_db_path():
     app_profile = Gio.Application.get_default().profile
@@ -147,6 +413,11 @@ def get_db_path():
     return os.path.join(get_data_dir(), name)
 
 
+def get_db_connection():
+    """Returns the long-lived connection of the calling thread"""
+    return db_pool.get()
+
+
 @cache
 def get_db_backup_path():
     app_profile = Gio.Application.get_default().profile
@@ -167,6 +438,11 @@ def init_db():
         logger.info('Restore DB from backup')
         shutil.copyfile(db_backup_path, db_path)
 
+        # Stale WAL and shared-memory files must not be replayed on restored database
+        for suffix in ('-wal', '-shm'):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+
     sql_create_mangas_table = """CREATE TABLE IF NOT EXISTS mangas (
         id integer PRIMARY KEY,
         slug text NOT NULL,
@@ -188,6 +464,8 @@ def init_db():
         sort_order text,
         last_read timestamp,
         last_update timestamp,
+        update_validators json,
+        next_update timestamp,
         UNIQUE (slug, server_id)
     );"""
 
@@ -203,10 +481,11 @@ def init_db():
         rank integer NOT NULL,
         downloaded integer NOT NULL,
         recent integer NOT NULL,
-        read_progress text,
+        read_progress bitset,
         read integer NOT NULL,
         last_page_read_index integer,
         last_read timestamp,
+        natsort_key text, -- natural sort key of title, see get_natsort_key()
         UNIQUE (slug, manga_id)
     );"""
 
@@ -217,6 +496,7 @@ def init_db():
         percent float NOT NULL,
         errors integer DEFAULT 0,
         date timestamp NOT NULL,
+        priority integer NOT NULL DEFAULT 1, -- see DownloadPriority
         UNIQUE (chapter_id)
     );"""
 
@@ -236,10 +516,15 @@ def init_db():
         'CREATE INDEX IF NOT EXISTS idx_chapters_downloaded on chapters(manga_id, downloaded);',
         'CREATE INDEX IF NOT EXISTS idx_chapters_recent on chapters(manga_id, recent);',
         'CREATE INDEX IF NOT EXISTS idx_chapters_read on chapters(manga_id, read);',
-    ]
+        'CREATE INDEX IF NOT EXISTS idx_chapters_natsort_key on chapters(manga_id, natsort_key);',
+    ] + SQL_CREATE_INDEXES_V15
 
     db_conn = create_db_connection()
     if db_conn is not None:
+        # Readers don't block writer and writer doesn't block readers (persistent setting)
+        if db_conn.execute('PRAGMA journal_mode = WAL').fetchone()[0] != 'wal':
+            logger.warning('Failed to enable WAL journal mode')
+
         db_version = db_conn.execute('PRAGMA user_version').fetchone()[0]
 
         execute_sql(db_conn, sql_create_mangas_table)
@@ -247,8 +532,6 @@ def init_db():
         execute_sql(db_conn, sql_create_downloads_table)
         execute_sql(db_conn, sql_create_categories_table)
         execute_sql(db_conn, sql_create_categories_mangas_association_table)
-        for sql_create_index in sql_create_indexes:
-            execute_sql(db_conn, sql_create_index)
 
         if db_version == 0:
             # First launch
@@ -345,13 +628,14 @@ def init_db():
                         if not chapter_row['pages']:
                             continue
 
+                        pages = convert_json(chapter_row['pages'])
                         read_progress = ''
-                        for page in chapter_row['pages']:
+                        for page in pages:
                             read = page.pop('read', False)
                             read_progress += str(int(read))
                         if '1' in read_progress and '0' in read_progress:
                             ids.append(chapter_row['id'])
-                            data.append({'pages': chapter_row['pages'], 'read_progress': read_progress})
+                            data.append({'pages': pages, 'read_progress': read_progress})
 
                 if ids:
                     update_rows(db_conn, 'chapters', ids, data)
@@ -364,6 +648,62 @@ def init_db():
             execute_sql(db_conn, 'UPDATE mangas SET in_library = 1;')
             db_conn.execute('PRAGMA user_version = {0}'.format(12))
 
+        if 0 < db_version <= 12:
+            # Version 1.38.0
+            # Chapters: store pages reading status ('read_progress') as a bitset instead of a string of '0' and '1'
+            if execute_sql(db_conn, 'ALTER TABLE chapters RENAME COLUMN read_progress TO read_progress_text;') and \
+                    execute_sql(db_conn, 'ALTER TABLE chapters ADD COLUMN read_progress bitset;'):
+                rows = db_conn.execute('SELECT id, read_progress_text FROM chapters WHERE read_progress_text IS NOT NULL').fetchall()
+                with db_conn:
+                    db_conn.executemany(
+                        'UPDATE chapters SET read_progress = ? WHERE id = ?',
+                        [(ReadProgress.from_string(row['read_progress_text']), row['id']) for row in rows]
+                    )
+                    db_conn.execute('PRAGMA user_version = {0}'.format(13))
+
+                # Requires SQLite >= 3.35.0, left column is harmless otherwise
+                execute_sql(db_conn, 'ALTER TABLE chapters DROP COLUMN read_progress_text;')
+
+        if 0 < db_version <= 13:
+            # Version 1.39.0
+            # Chapters: add natural sort key of title (replaces natsort collation)
+            if execute_sql(db_conn, 'ALTER TABLE chapters ADD COLUMN natsort_key text;'):
+                rows = db_conn.execute('SELECT id, title FROM chapters').fetchall()
+                with db_conn:
+                    db_conn.executemany(
+                        'UPDATE chapters SET natsort_key = ? WHERE id = ?',
+                        [(get_natsort_key(row['title']), row['id']) for row in rows]
+                    )
+                    db_conn.execute('PRAGMA user_version = {0}'.format(14))
+
+        if 0 < db_version <= 14:
+            # Version 1.39.0
+            # Add indexes of hot queries
+            if all(execute_sql(db_conn, sql) for sql in SQL_CREATE_INDEXES_V15):
+                db_conn.execute('PRAGMA user_version = {0}'.format(15))
+
+        if 0 < db_version <= 15:
+            # Version 1.39.0
+            # Downloads: add priority
+            if execute_sql(db_conn, 'ALTER TABLE downloads ADD COLUMN priority integer NOT NULL DEFAULT 1;'):
+                db_conn.execute('PRAGMA user_version = {0}'.format(16))
+
+        if 0 < db_version <= 16:
+            # Version 1.39.0
+            # Mangas: add validators of last update (conditional requests, unchanged data detection)
+            if execute_sql(db_conn, 'ALTER TABLE mangas ADD COLUMN update_validators json;'):
+                db_conn.execute('PRAGMA user_version = {0}'.format(17))
+
+        if 0 < db_version <= 17:
+            # Version 1.39.0
+            # Mangas: add date of next scheduled update (learned from release cadence)
+            if execute_sql(db_conn, 'ALTER TABLE mangas ADD COLUMN next_update timestamp;'):
+                db_conn.execute('PRAGMA user_version = {0}'.format(18))
+
+        # Indexes are created once migrations are done: they may refer to columns added by migrations
+        for sql_create_index in sql_create_indexes:
+            execute_sql(db_conn, sql_create_index)
+
         logger.info('DB version {0}'.format(db_conn.execute('PRAGMA user_version').fetchone()[0]))
 
         db_conn.close()
@@ -405,21 +745,45 @@ def insert_row(db_conn, table, data):
         return cursor.lastrowid
 
 
-def insert_rows(db_conn, table, data):
-    sql = 'INSERT INTO {0} ({1}) VALUES ({2})'.format(table, ', '.join(data[0].keys()), ', '.join(['?'] * len(data[0])))
+def insert_rows(db_conn, table, data, ignore=False):
+    """
+    Inserts rows with a single statement
+
+    If statement fails, rows are inserted one by one: a bad row doesn't prevent others from being inserted.
+
+    :return: True if all rows have been inserted, False if some have been skipped
+    """
+    sql = 'INSERT {0}INTO {1} ({2}) VALUES ({3})'.format(
+        'OR IGNORE ' if ignore else '', table, ', '.join(data[0].keys()), ', '.join(['?'] * len(data[0]))
+    )
 
     seq = []
     for item in data:
         seq.append(tuple(item.values()))
 
+    # Rows inserted before a failure are rolled back to the savepoint
+    db_conn.execute('SAVEPOINT insert_rows')
     try:
         db_conn.executemany(sql, seq)
     except Exception as e:
-        print('SQLite-error:', e, data)
-        return False
+        db_conn.execute('ROLLBACK TO insert_rows')
+        logger.warning(f'Failed to insert rows in {table} ({e}): rows are inserted one by one')
     else:
+        db_conn.execute('RELEASE insert_rows')
         return True
 
+    ret = True
+    for index, values in enumerate(seq):
+        try:
+            db_conn.execute(sql, values)
+        except Exception as e:
+            logger.error(f'Row skipped: failed to insert row in {table} ({e}): {data[index]}')
+            ret = False
+
+    db_conn.execute('RELEASE insert_rows')
+
+    return ret
+
 
 def update_row(db_conn, table, id_, data):
     try:
@@ -450,9 +814,424 @@ def update_rows(db_conn, table, ids, data):
         return True
 
 
-class Manga:
-    _chapters = None
-    _server = None
+class ConnectionPool:
+    """
+    Pool of long-lived connections, one per thread
+
+    A connection is opened on first use in a thread, then reused by all queries of this thread.
+    Connections are kept in thread-local storage: a thread never gets the connection of another one,
+    even if it reuses the identifier of a terminated thread. The registry of connections is only used to close them:
+    connections of terminated threads are closed when a new connection is opened.
+    """
+
+    def __init__(self):
+        self.connections = {}  # connection of each thread, keyed by thread object
+        self.generation = 0  # incremented by `close_all`: connections of previous generations are closed
+        self.local = threading.local()
+        self.lock = threading.Lock()
+
+        self.nb_opened = 0
+        self.nb_reused = 0
+
+    def close_all(self):
+        with self.lock:
+            for con in self.connections.values():
+                con.close()
+            self.connections.clear()
+            self.generation += 1
+
+    def get(self):
+        con = getattr(self.local, 'connection', None)
+        if con is not None and self.local.generation == self.generation:
+            self.nb_reused += 1
+            return con
+
+        # Connections are only used by the thread which opened them but can be closed by any thread (see `close_all`)
+        con = create_db_connection(check_same_thread=False)
+
+        with self.lock:
+            for thread in [thread for thread in self.connections if not thread.is_alive()]:
+                self.connections.pop(thread).close()
+
+            self.connections[threading.current_thread()] = con
+            self.local.connection = con
+            self.local.generation = self.generation
+            self.nb_opened += 1
+
+        return con
+
+    @property
+    def stats(self):
+        return dict(
+            opened=self.nb_opened,
+            reused=self.nb_reused,
+            alive=len(self.connections),
+        )
+
+    @contextmanager
+    def transaction(self):
+        con = self.get()
+
+        depth = getattr(self.local, 'depth', 0)
+        self.local.depth = depth + 1
+        try:
+            if depth > 0:
+                # Nested: changes are committed (or rollbacked) by the outermost unit of work
+                yield con
+            else:
+                with con:
+                    yield con
+        finally:
+            self.local.depth = depth
+
+
+db_pool = ConnectionPool()
+
+
+class ChaptersCounters:
+    """
+    Chapters counters of mangas: number of unread, downloaded (and unread) and recent chapters
+
+    Counters of all library mangas are computed at once with a single aggregate query.
+    Then, counters of a manga are invalidated when its chapters change and lazily recomputed.
+    """
+
+    FIELDS = {'downloaded', 'read', 'recent'}  # chapters fields which affect counters
+
+    SQL = """
+        SELECT manga_id, sum(read = 0) AS unread, sum(downloaded = 1 AND read = 0) AS downloaded, sum(recent = 1) AS recent
+        FROM chapters
+    """
+
+    def __init__(self):
+        self.counters = {}
+        # Incremented by each invalidation: counters computed before an invalidation must not be stored
+        self.generation = 0
+        self.lock = threading.Lock()
+
+    def get(self, manga_id):
+        with self.lock:
+            if (counters := self.counters.get(manga_id)) is not None:
+                return counters
+            generation = self.generation
+
+        row = get_db_connection().execute(self.SQL + ' WHERE manga_id = ?', (manga_id,)).fetchone()
+        counters = self.__row_to_counters(row)
+
+        with self.lock:
+            if generation == self.generation:
+                self.counters[manga_id] = counters
+
+        return counters
+
+    def invalidate(self, manga_id=None):
+        with self.lock:
+            self.generation += 1
+            if manga_id is None:
+                self.counters.clear()
+            else:
+                self.counters.pop(manga_id, None)
+
+    def load(self):
+        """Computes counters of all library mangas"""
+        with self.lock:
+            generation = self.generation
+
+        rows = get_db_connection().execute(
+            self.SQL + ' WHERE manga_id IN (SELECT id FROM mangas WHERE in_library = 1) GROUP BY manga_id'
+        ).fetchall()
+
+        with self.lock:
+            if generation == self.generation:
+                self.counters = {row['manga_id']: self.__row_to_counters(row) for row in rows}
+            else:
+                # Counters have been invalidated meanwhile: they will be lazily recomputed
+                self.counters = {}
+
+    @staticmethod
+    def __row_to_counters(row):
+        return dict(
+            unread=row['unread'] or 0,
+            downloaded=row['downloaded'] or 0,
+            recent=row['recent'] or 0,
+        )
+
+
+chapters_counters = ChaptersCounters()
+
+
+class StorageUsage:
+    """
+    Disk usage of mangas folders (downloaded chapters)
+
+    Usage of a folder is computed once by walking it with `os.scandir` (no `du` subprocess), then kept up to date
+    incrementally when pages are downloaded. It's invalidated when chapters are cleared or mangas are deleted/moved.
+    """
+
+    def __init__(self):
+        self.loaded = False
+        self.lock = threading.Lock()
+        self.preload_thread = None
+        self.usages = {}  # manga folder path => usage (None when it must be recomputed)
+
+    def add(self, path, size, new_chapter=False, new_page=True):
+        """
+        Records a downloaded page of a manga
+
+        :param size: size of page or, if page replaces an existing one (`new_page` is False), size difference
+        """
+        with self.lock:
+            usage = self.usages.get(path)
+            if usage is None:
+                if self.loaded:
+                    # Computed on next access
+                    self.usages[path] = None
+                return
+
+            usage['size'] += size
+            usage['pages_size'] += size
+            if new_page:
+                usage['nb_pages'] += 1
+            if new_chapter:
+                usage['nb_chapters'] += 1
+
+    def estimate_chapter_size(self, chapter):
+        """
+        Estimates the disk space needed to download a chapter
+
+        Mean size of pages already downloaded for the same manga is used (for the whole library as fallback).
+
+        :return: size in bytes
+        :rtype: int
+        """
+        usage = self.get(chapter.manga.path)
+        if usage['nb_pages'] > 0:
+            page_size = usage['pages_size'] / usage['nb_pages']
+            nb_pages = usage['nb_pages'] / max(usage['nb_chapters'], 1)
+        else:
+            with self.lock:
+                usages = [usage for usage in self.usages.values() if usage and usage['nb_pages'] > 0]
+            page_size = sum(usage['pages_size'] for usage in usages) / sum(usage['nb_pages'] for usage in usages) \
+                if usages else STORAGE_DEFAULT_PAGE_SIZE
+            nb_pages = STORAGE_DEFAULT_NB_PAGES
+
+        if chapter.pages:
+            nb_pages = len(chapter.pages)
+
+        return int(page_size * nb_pages)
+
+    def get(self, path):
+        """
+        Returns usage of a manga folder
+
+        :return: total size, size and number of downloaded pages, number of downloaded chapters
+        :rtype: dict
+        """
+        with self.lock:
+            usage = self.usages.get(path)
+
+        if usage is None:
+            usage = self.__scan(path)
+            with self.lock:
+                self.usages[path] = usage
+
+        return dict(usage)
+
+    def get_total(self):
+        """
+        Returns total size (in bytes) of mangas folders of library
+
+        Folders of 'local' server are not counted.
+        """
+        thread = self.preload_thread
+        if thread is not None and thread is not threading.current_thread():
+            # Folders are being walked by preload, don't walk them twice
+            thread.join()
+
+        if not self.loaded:
+            paths = []
+            data_dir = get_data_dir()
+            if os.path.exists(data_dir):
+                for server_entry in os.scandir(data_dir):
+                    if not server_entry.is_dir() or server_entry.name == 'local':
+                        continue
+                    paths += [entry.path for entry in os.scandir(server_entry.path) if entry.is_dir()]
+
+            with self.lock:
+                for path in paths:
+                    self.usages.setdefault(path, None)
+                self.loaded = True
+
+        with self.lock:
+            paths = [path for path in self.usages if path.startswith(get_data_dir())]
+
+        return sum(self.get(path)['size'] for path in paths)
+
+    def preload(self):
+        """
+        Computes usage of library folders in a background thread
+
+        Called at startup, so that first storage quota check (in a download worker) doesn't have to walk whole library.
+        If usage is invalidated afterwards, it's computed again on next access.
+        """
+        def run():
+            try:
+                self.get_total()
+            finally:
+                self.preload_thread = None
+
+        with self.lock:
+            if self.loaded or self.preload_thread is not None:
+                return
+
+            self.preload_thread = threading.Thread(target=run)
+            self.preload_thread.daemon = True
+            self.preload_thread.start()
+
+    def invalidate(self, path=None):
+        with self.lock:
+            if path is None:
+                self.usages.clear()
+                self.loaded = False
+            elif path in self.usages:
+                self.usages[path] = None
+
+    @staticmethod
+    def __scan(path):
+        usage = dict(size=0, pages_size=0, nb_pages=0, nb_chapters=0)
+
+        def scan(dir_path, depth):
+            nb_pages = 0
+            for entry in os.scandir(dir_path):
+                if entry.is_dir(follow_symlinks=False):
+                    scan(entry.path, depth + 1)
+                    continue
+
+                size = entry.stat(follow_symlinks=False).st_size
+                usage['size'] += size
+                # Pages are stored in chapters folders, hidden files are manifests and partially written pages
+                if depth > 0 and not entry.name.startswith('.'):
+                    usage['pages_size'] += size
+                    nb_pages += 1
+
+            usage['nb_pages'] += nb_pages
+            if nb_pages:
+                usage['nb_chapters'] += 1
+
+        if os.path.exists(path):
+            scan(path, 0)
+
+        return usage
+
+
+storage_usage = StorageUsage()
+
+# Serializes updates of chapters manifests (see `Chapter.update_manifest`)
+chapters_manifests_lock = threading.Lock()
+
+
+class JsonColumn:
+    """
+    Descriptor of a JSON column: raw value (bytes or str) is decoded on first access
+
+    Decoded values are never strings: JSON columns contain lists or dicts.
+    """
+
+    __slots__ = ('name', 'raw_name')
+
+    def __set_name__(self, owner, name):
+        self.name = name
+        self.raw_name = f'_{name}_json'
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+
+        try:
+            value = getattr(obj, self.raw_name)
+        except AttributeError:
+            # Column was not selected: loaded once, NULL included
+            value = obj._load_column(self.name)
+            setattr(obj, self.raw_name, value)
+
+        if isinstance(value, (bytes, str)):
+            value = convert_json(value)
+            setattr(obj, self.raw_name, value)
+
+        return value
+
+    def __set__(self, obj, value):
+        setattr(obj, self.raw_name, value)
+
+
+class Model:
+    """
+    Base class of models: an instance maps a row of `TABLE`
+
+    - One slot per column (JSON columns use a `JsonColumn` descriptor backed by a slot)
+    - Columns not selected are loaded on first access
+    """
+
+    __slots__ = ()
+
+    TABLE = None
+    COLUMNS = ()
+
+    def __init__(self, row=None, keys=None):
+        if row is not None:
+            self._set_row(row, keys)
+
+    def __getattr__(self, name):
+        # Only called when attribute is not set: column was not selected
+        if name == 'id' or name not in self.COLUMNS:
+            raise AttributeError(f"'{self.__class__.__name__}' object has no attribute '{name}'")
+
+        value = self._load_column(name)
+        setattr(self, name, value)
+
+        return value
+
+    @classmethod
+    @cache
+    def _get_row_setters(cls, keys):
+        return tuple(getattr(cls, key).__set__ for key in keys)
+
+    @classmethod
+    @cache
+    def get_select_sql(cls, columns=None):
+        """Returns SELECT statement (without WHERE clause) of a set of columns (all by default)"""
+        return 'SELECT {0} FROM {1}'.format(', '.join(columns or cls.COLUMNS), cls.TABLE)
+
+    @classmethod
+    def get_row_keys(cls, cursor):
+        return tuple(description[0] for description in cursor.description)
+
+    def _load_column(self, name):
+        row = get_db_connection().execute(f'SELECT {name} FROM {self.TABLE} WHERE id = ?', (self.id,)).fetchone()
+
+        return row[0] if row else None
+
+    def _set_row(self, row, keys=None):
+        for setter, value in zip(self._get_row_setters(keys or tuple(row.keys())), row):
+            setter(self, value)
+
+
+class Manga(Model):
+    __slots__ = (
+        'id', 'slug', 'url', 'server_id', 'in_library', 'name', '_authors_json', '_scanlators_json', '_genres_json', 'synopsis',
+        'status', 'background_color', 'borders_crop', 'landscape_zoom', 'page_numbering', 'reading_mode', 'scaling', 'sort_order',
+        'last_read', 'last_update', '_update_validators_json', 'next_update',
+        '_chapters', '_server',
+    )
+
+    TABLE = 'mangas'
+    COLUMNS = (
+        'id', 'slug', 'url', 'server_id', 'in_library', 'name', 'authors', 'scanlators', 'genres', 'synopsis',
+        'status', 'background_color', 'borders_crop', 'landscape_zoom', 'page_numbering', 'reading_mode', 'scaling', 'sort_order',
+        'last_read', 'last_update', 'update_validators', 'next_update',
+    )
+    # Columns used by library
+    LIST_COLUMNS = ('id', 'slug', 'url', 'server_id', 'in_library', 'name', 'genres', 'last_read', 'last_update')
 
     STATUSES = dict(
         complete=_('Complete'),
@@ -461,27 +1240,31 @@ class Manga:
         hiatus=_('Hiatus'),
     )
 
-    def __init__(self, server=None):
-        if server:
-            self._server = server
+    authors = JsonColumn()
+    genres = JsonColumn()
+    scanlators = JsonColumn()
+    update_validators = JsonColumn()
+
+    def __init__(self, server=None, row=None, keys=None):
+        self._chapters = None
+        self._server = server
+
+        super().__init__(row, keys)
 
     @classmethod
-    def get(cls, id_, server=None, db_conn=None):
-        if db_conn is not None:
-            row = db_conn.execute('SELECT * FROM mangas WHERE id = ?', (id_,)).fetchone()
-        else:
-            db_conn = create_db_connection()
-            row = db_conn.execute('SELECT * FROM mangas WHERE id = ?', (id_,)).fetchone()
-            db_conn.close()
+    def get(cls, id_, server=None, db_conn=None, columns=None):
+        """
+        :param columns: columns to select, others are loaded on first access (all by default)
+        """
+        if db_conn is None:
+            db_conn = get_db_connection()
+
+        row = db_conn.execute(cls.get_select_sql(columns) + ' WHERE id = ?', (id_,)).fetchone()
 
         if row is None:
             return None
 
-        manga = cls(server=server)
-        for key in row.keys():
-            setattr(manga, key, row[key])
-
-        return manga
+        return cls(server=server, row=row)
 
     @classmethod
     def new(cls, data, server, long_strip_detection):
@@ -508,8 +1291,7 @@ class Manga:
                 scaling='width',
             ))
 
-        db_conn = create_db_connection()
-        with db_conn:
+        with db_transaction() as db_conn:
             id_ = insert_row(db_conn, 'mangas', data)
 
             rank = 0
@@ -522,8 +1304,6 @@ class Manga:
                 if chapter is not None:
                     rank += 1
 
-        db_conn.close()
-
         manga = cls.get(id_, server)
 
         if not os.path.exists(manga.path):
@@ -556,8 +1336,7 @@ class Manga:
 
     @property
     def categories(self):
-        db_conn = create_db_connection()
-        rows = db_conn.execute(
+        rows = get_db_connection().execute(
             'SELECT c.id FROM categories c JOIN categories_mangas_association cma ON cma.category_id = c.id WHERE cma.manga_id = ?',
             (self.id,)
         )
@@ -566,24 +1345,19 @@ class Manga:
         for row in rows:
             categories.append(row['id'])
 
-        db_conn.close()
-
         return categories
 
     @property
     def chapters(self):
         if self._chapters is None:
-            db_conn = create_db_connection()
-            if self.sort_order and self.sort_order.endswith('asc'):
-                rows = db_conn.execute('SELECT * FROM chapters WHERE manga_id = ? ORDER BY rank ASC', (self.id,))
-            else:
-                rows = db_conn.execute('SELECT * FROM chapters WHERE manga_id = ? ORDER BY rank DESC', (self.id,))
-
-            self._chapters = []
-            for row in rows:
-                self._chapters.append(Chapter(row=row, manga=self))
+            db_conn = get_db_connection()
+            sql = Chapter.get_select_sql(Chapter.LIST_COLUMNS) + ' WHERE manga_id = ? ORDER BY rank {0}'.format(
+                'ASC' if self.sort_order and self.sort_order.endswith('asc') else 'DESC'
+            )
+            cursor = db_conn.execute(sql, (self.id,))
+            keys = Chapter.get_row_keys(cursor)
 
-            db_conn.close()
+            self._chapters = [Chapter(row=row, manga=self, keys=keys) for row in cursor]
 
         return self._chapters
 
@@ -609,28 +1383,15 @@ class Manga:
 
     @property
     def nb_downloaded_chapters(self):
-        db_conn = create_db_connection()
-        row = db_conn.execute(
-            'SELECT count() AS downloaded FROM chapters WHERE manga_id = ? AND downloaded = 1 and read = 0', (self.id,)).fetchone()
-        db_conn.close()
-
-        return row['downloaded']
+        return chapters_counters.get(self.id)['downloaded']
 
     @property
     def nb_recent_chapters(self):
-        db_conn = create_db_connection()
-        row = db_conn.execute('SELECT count() AS recents FROM chapters WHERE manga_id = ? AND recent = 1', (self.id,)).fetchone()
-        db_conn.close()
-
-        return row['recents']
+        return chapters_counters.get(self.id)['recent']
 
     @property
     def nb_unread_chapters(self):
-        db_conn = create_db_connection()
-        row = db_conn.execute('SELECT count() AS unread FROM chapters WHERE manga_id = ? AND read = 0', (self.id,)).fetchone()
-        db_conn.close()
-
-        return row['unread']
+        return chapters_counters.get(self.id)['unread']
 
     @property
     def path(self):
@@ -651,6 +1412,9 @@ class Manga:
         if url is None:
             return
 
+        if not os.path.exists(self.path):
+            os.makedirs(self.path)
+
         # If cover has already been retrieved
         # Check first if it has changed using ETag
         current_etag = None
@@ -679,17 +1443,34 @@ class Manga:
         self.update(dict(in_library=True))
         shutil.move(old_path, self.path)
 
-    def delete(self):
-        db_conn = create_db_connection()
+        storage_usage.invalidate(old_path)
+        storage_usage.invalidate(self.path)
 
-        with db_conn:
+    def delete(self):
+        with db_transaction() as db_conn:
             db_conn.execute('DELETE FROM mangas WHERE id = ?', (self.id, ))
 
-        db_conn.close()
+        chapters_counters.invalidate(self.id)
 
         # Delete folder except when server is 'local'
         if os.path.exists(self.path) and self.server_id != 'local':
             shutil.rmtree(self.path)
+            storage_usage.invalidate(self.path)
+
+    def get_next_update(self, db_conn=None):
+        """Returns date of next scheduled update, learned from release cadence (see `get_update_interval()`)"""
+        if db_conn is None:
+            db_conn = get_db_connection()
+
+        rows = db_conn.execute(
+            'SELECT DISTINCT date FROM chapters WHERE manga_id = ? AND date IS NOT NULL ORDER BY date DESC LIMIT ?',
+            (self.id, UPDATE_CADENCE_NB_RELEASES + 1)
+        ).fetchall()
+        dates = [row['date'] for row in rows]
+        if self.last_update:
+            dates.append(self.last_update.date())
+
+        return datetime.datetime.utcnow() + get_update_interval(self.status, dates)
 
     def get_next_chapter(self, chapter, direction=1):
         """
@@ -698,37 +1479,35 @@ class Manga:
         """
         assert direction in (-1, 1), 'Invalid direction value'
 
-        db_conn = create_db_connection()
+        db_conn = get_db_connection()
 
         order = 'ASC' if direction == 1 else 'DESC'
         op = '>' if direction == 1 else '<'
 
+        select_sql = Chapter.get_select_sql()
         if self.sort_order in ('asc', 'desc', None):
             row = db_conn.execute(
-                f'SELECT * FROM chapters WHERE manga_id = ? AND rank {op} ? ORDER BY rank {order}',
+                f'{select_sql} WHERE manga_id = ? AND rank {op} ? ORDER BY rank {order}',
                 (self.id, chapter.rank)
             ).fetchone()
         elif self.sort_order in ('date-asc', 'date-desc'):
             row = db_conn.execute(
-                f'SELECT * FROM chapters WHERE manga_id = ? AND date {op} ? ORDER BY data {order}, id {order}',
+                f'{select_sql} WHERE manga_id = ? AND date {op} ? ORDER BY date {order}, id {order}',
                 (self.id, chapter.date)
             ).fetchone()
         elif self.sort_order in ('natural-asc', 'natural-desc'):
             row = db_conn.execute(
-                f'SELECT * FROM chapters WHERE manga_id = ? AND title {op} ? COLLATE natsort ORDER BY title {order}, id {order}',
-                (self.id, chapter.title)
+                f'{select_sql} WHERE manga_id = ? AND natsort_key {op} ? ORDER BY natsort_key {order}, id {order}',
+                (self.id, chapter.natsort_key)
             ).fetchone()
 
-        db_conn.close()
-
         if not row:
             return None
 
         return Chapter(row=row, manga=self)
 
     def toggle_category(self, category_id, active):
-        db_conn = create_db_connection()
-        with db_conn:
+        with db_transaction() as db_conn:
             if active:
                 insert_row(db_conn, 'categories_mangas_association', dict(category_id=category_id, manga_id=self.id))
             else:
@@ -737,8 +1516,6 @@ class Manga:
                     (category_id, self.id,)
                 )
 
-        db_conn.close()
-
     def update(self, data):
         """
         Updates specific fields
@@ -752,103 +1529,144 @@ class Manga:
         for key in data:
             setattr(self, key, data[key])
 
-        db_conn = create_db_connection()
-        with db_conn:
+        with db_transaction() as db_conn:
             ret = update_row(db_conn, 'mangas', self.id, data)
 
-        db_conn.close()
-
         return ret
 
     def update_full(self):
         """
         Updates manga
 
-        :return: True on success False otherwise, recent chapters IDs, number of deleted chapters
+        Chapters are reconciled in bulk: existing chapters are loaded once, changes (inserts, updates, deletes)
+        are computed in memory then applied with a few `executemany`.
+
+        Update is short-circuited when data is unchanged since previous update:
+        - servers which use `Server.session_get_if_modified()` skip request (304 response) or parsing (same response content)
+        - otherwise, DB reconciliation is skipped if hash of data (chapters list included) is the same
+
+        :return: True on success False otherwise, recent chapters IDs, number of deleted chapters, synced, unchanged
         :rtype: tuple
         """
-        gone_chapters_ranks = []
         recent_chapters_ids = []
         nb_deleted_chapters = 0
 
-        def get_free_rank(rank):
-            if rank not in gone_chapters_ranks:
-                return rank
-
-            return get_free_rank(rank + 1)
-
-        data = self.server.get_manga_data(dict(
-            slug=self.slug,
-            name=self.name,
-            url=self.url,
-            last_read=self.last_read
-        ))
-        gc.collect()
+        validators = self.update_validators or {}
+        try:
+            initial_data = dict(
+                slug=self.slug,
+                name=self.name,
+                url=self.url,
+                last_read=self.last_read,
+                update_validators=validators,
+            )
+            # Cached responses of server can't be used as is: new chapters would be missed
+            with forced_revalidation():
+                data = self.server.get_manga_data(initial_data)
+        except NotModifiedError:
+            logger.debug('[UPDATE] {0} ({1}): Not modified'.format(self.name, self.server_id))
+            # Validators are saved again: content may be the same with a new ETag or Last-Modified
+            self.update(dict(update_validators=initial_data['update_validators'], next_update=self.get_next_update()))
+            # Cover image may have changed anyway: its URL is saved with validators
+            self._save_cover(initial_data['update_validators'].get('cover'))
+            return True, [], 0, False, True
+        finally:
+            gc.collect()
 
         if data is None:
-            return False, 0, 0, False
+            return False, [], 0, False, False
 
         synced = self.server.sync and data['last_read'] != self.last_read
 
-        db_conn = create_db_connection()
-        with db_conn:
-            # Re-create the manga directory if it does not exist.
-            if not os.path.exists(self.path):
-                os.makedirs(self.path)
+        data.pop('update_validators', None)
+        # `last_read` is excluded: it's echoed from initial data when server doesn't sync read progress
+        data_hash = get_data_hash({key: value for key, value in data.items() if key != 'last_read'})
+
+        # Re-create the manga directory if it does not exist
+        if not os.path.exists(self.path):
+            os.makedirs(self.path)
+
+        # Update cover, even if data is unchanged: cover image may change while its URL remains the same
+        # (a conditional request using its ETag is sent)
+        cover = data.pop('cover')
+        self._save_cover(cover)
+
+        if data_hash == validators.get('data_hash') and not synced:
+            logger.debug('[UPDATE] {0} ({1}): Unchanged'.format(self.name, self.server_id))
+            self.update(dict(update_validators=dict(validators, cover=cover), next_update=self.get_next_update()))
+            return True, [], 0, False, True
 
-            # Update cover
-            cover = data.pop('cover')
-            if cover:
-                self._save_cover(cover)
+        # Validators are saved with changes: they must not be saved if update fails
+        data['update_validators'] = dict(initial_data['update_validators'], data_hash=data_hash, cover=cover)
 
+        with db_transaction() as db_conn:
             # Update chapters
-            chapters_data = data.pop('chapters')
+            chapters_data = []
+            chapters_slugs = set()
+            for chapter_data in data.pop('chapters'):
+                if chapter_data['slug'] in chapters_slugs:
+                    # Ignore duplicates, slug must be unique
+                    continue
+                chapters_slugs.add(chapter_data['slug'])
+                chapters_data.append(chapter_data)
+
+            cursor = db_conn.execute(
+                'SELECT id, slug, url, title, scanlators, date, rank, downloaded FROM chapters WHERE manga_id = ?', (self.id,)
+            )
+            keys = Chapter.get_row_keys(cursor)
+            rows = {row['slug']: row for row in cursor}
 
             # First, delete chapters that no longer exist on server EXCEPT those marked as downloaded
             # In case of downloaded, we keep track of ranks because they must not be reused
-            chapters_slugs = [chapter_data['slug'] for chapter_data in chapters_data]
-            rows = db_conn.execute('SELECT * FROM chapters WHERE manga_id = ?', (self.id,))
-            for row in rows:
-                if row['slug'] not in chapters_slugs:
-                    gone_chapter = Chapter.get(row['id'], manga=self, db_conn=db_conn)
-                    if not gone_chapter.downloaded:
-                        # Delete chapter
-                        gone_chapter.delete(db_conn)
-                        nb_deleted_chapters += 1
-
-                        logger.warning(
-                            '[UPDATE] {0} ({1}): Delete chapter {2} (no longer available)'.format(
-                                self.name, self.server_id, gone_chapter.title
-                            )
-                        )
-                    else:
-                        # Keep track of rank freed
-                        gone_chapters_ranks.append(gone_chapter.rank)
-
-            # Then, add or update chapters
+            gone_chapters_ranks = set()
+            gone_chapters = []
+            for slug, row in rows.items():
+                if slug in chapters_slugs:
+                    continue
+
+                if row['downloaded']:
+                    # Keep track of rank freed
+                    gone_chapters_ranks.add(row['rank'])
+                    continue
+
+                gone_chapters.append(Chapter(row=row, manga=self, keys=keys))
+
+                logger.warning(
+                    '[UPDATE] {0} ({1}): Delete chapter {2} (no longer available)'.format(self.name, self.server_id, row['title'])
+                )
+
+            if gone_chapters:
+                delete_rows(db_conn, 'chapters', [chapter.id for chapter in gone_chapters])
+                nb_deleted_chapters = len(gone_chapters)
+
+            # Then, compute chapters to add or update
+            # Rows to update are grouped by set of changed fields (a same SQL statement is used for each group)
+            new_chapters_data = {}
+            updates = {}
             rank = 0
             for chapter_data in chapters_data:
-                row = db_conn.execute(
-                    'SELECT * FROM chapters WHERE manga_id = ? AND slug = ?', (self.id, chapter_data['slug'])
-                ).fetchone()
+                while rank in gone_chapters_ranks:
+                    rank += 1
 
-                rank = get_free_rank(rank)
+                row = rows.get(chapter_data['slug'])
                 if row:
                     # Update changes
                     changes = {}
                     if row['title'] != chapter_data['title']:
                         changes['title'] = chapter_data['title']
+                        changes['natsort_key'] = get_natsort_key(chapter_data['title'])
                     if row['url'] != chapter_data.get('url'):
-                        changes['url'] = chapter_data['url']
+                        changes['url'] = chapter_data.get('url')
                     if chapter_data.get('date') and row['date'] != chapter_data['date']:
                         changes['date'] = chapter_data['date']
-                    if row['scanlators'] != chapter_data.get('scanlators'):
-                        changes['scanlators'] = chapter_data['scanlators']
+                    if (convert_json(row['scanlators']) if row['scanlators'] else None) != chapter_data.get('scanlators'):
+                        changes['scanlators'] = chapter_data.get('scanlators')
                     if row['rank'] != rank:
                         changes['rank'] = rank
                     if changes:
-                        update_row(db_conn, 'chapters', row['id'], changes)
-                    rank += 1
+                        ids, changes_data = updates.setdefault(tuple(changes), ([], []))
+                        ids.append(row['id'])
+                        changes_data.append(changes)
                 else:
                     # Add new chapter
                     if not chapter_data.get('date'):
@@ -861,18 +1679,37 @@ class Manga:
                         downloaded=chapter_data.get('downloaded', 0),
                         recent=1,
                         read=0,
+                        natsort_key=get_natsort_key(chapter_data['title']),
                     ))
-                    id_ = insert_row(db_conn, 'chapters', chapter_data)
-                    if id_ is not None:
-                        recent_chapters_ids.append(id_)
-                        rank += 1
+                    # Rows to insert are grouped by set of fields too
+                    new_chapters_data.setdefault(tuple(chapter_data), []).append(chapter_data)
+
+                rank += 1
+
+            # Apply changes
+            for ids, changes_data in updates.values():
+                update_rows(db_conn, 'chapters', ids, changes_data)
+
+            for group_data in new_chapters_data.values():
+                insert_rows(db_conn, 'chapters', group_data)
 
-                        logger.info('[UPDATE] {0} ({1}): Add new chapter {2}'.format(self.name, self.server_id, chapter_data['title']))
+            if new_chapters_data:
+                ids = {
+                    row['slug']: row['id']
+                    for row in db_conn.execute('SELECT id, slug FROM chapters WHERE manga_id = ? AND recent = 1', (self.id,))
+                }
+                for chapter_data in chapters_data:
+                    if chapter_data['slug'] in rows or chapter_data['slug'] not in ids:
+                        continue
+
+                    recent_chapters_ids.append(ids[chapter_data['slug']])
+                    logger.info('[UPDATE] {0} ({1}): Add new chapter {2}'.format(self.name, self.server_id, chapter_data['title']))
 
             if len(recent_chapters_ids) > 0 or nb_deleted_chapters > 0:
                 data['last_update'] = datetime.datetime.utcnow()
 
             self._chapters = None
+            chapters_counters.invalidate(self.id)
 
             # Store old path
             old_path = self.path
@@ -881,35 +1718,58 @@ class Manga:
             for key in data:
                 setattr(self, key, data[key])
 
+            # Chapters are reconciled: next update can be scheduled
+            data['next_update'] = self.next_update = self.get_next_update(db_conn)
+
             update_row(db_conn, 'mangas', self.id, data)
 
             if old_path != self.path:
                 # Manga name changes, manga folder must be renamed too
                 os.rename(old_path, self.path)
 
-        db_conn.close()
+        # Remove folders of deleted chapters (may contain some pages)
+        for chapter in gone_chapters:
+            if os.path.exists(chapter.path):
+                shutil.rmtree(chapter.path)
 
-        return True, recent_chapters_ids, nb_deleted_chapters, synced
+        return True, recent_chapters_ids, nb_deleted_chapters, synced, False
 
 
-class Chapter:
-    _manga = None
+class Chapter(Model):
+    __slots__ = (
+        'id', 'manga_id', 'slug', 'url', 'title', '_scanlators_json', '_pages_json', 'date', 'rank', 'downloaded', 'recent',
+        'read_progress', 'read', 'last_page_read_index', 'last_read', 'natsort_key',
+        '_manga', '_nb_pages',
+    )
 
-    def __init__(self, row=None, manga=None):
-        if row is not None:
-            if manga:
-                self._manga = manga
-            for key in row.keys():
-                setattr(self, key, row[key])
+    TABLE = 'chapters'
+    COLUMNS = (
+        'id', 'manga_id', 'slug', 'url', 'title', 'scanlators', 'pages', 'date', 'rank', 'downloaded', 'recent',
+        'read_progress', 'read', 'last_page_read_index', 'last_read', 'natsort_key',
+    )
+    # Columns used by chapters list (pages and reading progress are loaded on demand, only number of pages is selected)
+    LIST_COLUMNS = (
+        'id', 'manga_id', 'slug', 'url', 'title', 'scanlators', 'date', 'rank', 'downloaded', 'recent',
+        'read', 'last_page_read_index', 'last_read', 'natsort_key', 'json_array_length(CAST(pages AS TEXT)) AS nb_pages',
+    )
+
+    pages = JsonColumn()
+    scanlators = JsonColumn()
+
+    def __init__(self, row=None, manga=None, keys=None):
+        self._manga = manga
+
+        super().__init__(row, keys)
 
     @classmethod
-    def get(cls, id_, manga=None, db_conn=None):
-        if db_conn is not None:
-            row = db_conn.execute('SELECT * FROM chapters WHERE id = ?', (id_,)).fetchone()
-        else:
-            db_conn = create_db_connection()
-            row = db_conn.execute('SELECT * FROM chapters WHERE id = ?', (id_,)).fetchone()
-            db_conn.close()
+    def get(cls, id_, manga=None, db_conn=None, columns=None):
+        """
+        :param columns: columns to select, others are loaded on first access (all by default)
+        """
+        if db_conn is None:
+            db_conn = get_db_connection()
+
+        row = db_conn.execute(cls.get_select_sql(columns) + ' WHERE id = ?', (id_,)).fetchone()
 
         if row is None:
             return None
@@ -926,16 +1786,17 @@ class Chapter:
             downloaded=data.get('downloaded', 0),
             recent=0,
             read=0,
+            natsort_key=get_natsort_key(data['title']),
         ))
 
         if db_conn is not None:
             id_ = insert_row(db_conn, 'chapters', data)
         else:
-            db_conn = create_db_connection()
-
-            with db_conn:
+            with db_transaction() as db_conn:
                 id_ = insert_row(db_conn, 'chapters', data)
 
+        chapters_counters.invalidate(manga_id)
+
         chapter = cls.get(id_, db_conn=db_conn) if id_ is not None else None
 
         return chapter
@@ -952,6 +1813,24 @@ class Chapter:
 
         return self._manga
 
+    @property
+    def nb_pages(self):
+        """Number of pages or None if pages are unknown"""
+        try:
+            self._pages_json
+        except AttributeError:
+            # Pages were not selected, their number may have been (see `LIST_COLUMNS`)
+            try:
+                return self._nb_pages
+            except AttributeError:
+                pass
+
+        return len(self.pages) if self.pages else None
+
+    @nb_pages.setter
+    def nb_pages(self, value):
+        self._nb_pages = value
+
     @property
     def path(self):
         # BEWARE: self.slug may contain '/' characters
@@ -969,6 +1848,7 @@ class Chapter:
         """
         if self.clearable:
             shutil.rmtree(self.path)
+            storage_usage.invalidate(self.manga.path)
 
         data = dict(
             downloaded=0,
@@ -1011,28 +1891,53 @@ class Chapter:
                 ))
             data.append(updated_data)
 
-        db_conn = create_db_connection()
-        with db_conn:
+        with db_transaction() as db_conn:
             update_rows(db_conn, 'chapters', ids, data)
 
-        db_conn.close()
+        chapters_counters.invalidate(manga.id)
+        storage_usage.invalidate(manga.path)
 
     def delete(self, db_conn=None):
         if db_conn is not None:
             db_conn.execute('DELETE FROM chapters WHERE id = ?', (self.id, ))
         else:
-            db_conn = create_db_connection()
-
-            with db_conn:
+            with db_transaction() as db_conn:
                 db_conn.execute('DELETE FROM chapters WHERE id = ?', (self.id, ))
 
-            db_conn.close()
+        chapters_counters.invalidate(self.manga_id)
 
         if os.path.exists(self.path):
             shutil.rmtree(self.path)
+            storage_usage.invalidate(self.manga.path)
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.path, CHAPTER_MANIFEST_NAME)
+
+    def get_manifest(self):
+        """
+        Returns manifest of downloaded pages
+
+        Manifest is a dict: {'pages': {index (str): {'name', 'size', 'sha256'}}}
+        """
+        try:
+            with open(self.manifest_path) as fp:
+                manifest = json.load(fp)
+        except (OSError, ValueError):
+            manifest = None
+
+        if not isinstance(manifest, dict) or not isinstance(manifest.get('pages'), dict):
+            manifest = dict(pages={})
+
+        return manifest
 
-    def get_page(self, index):
-        page_path = self.get_page_path(index)
+    def get_page(self, index, manifest=None):
+        """
+        Returns path of a page, downloads it if needed
+
+        :param manifest: manifest of chapter (loaded if not provided)
+        """
+        page_path = self.get_page_path(index, manifest=manifest)
         if page_path:
             return page_path
 
@@ -1047,20 +1952,29 @@ class Chapter:
         if not os.path.exists(self.path):
             os.makedirs(self.path, exist_ok=True)
 
-        image = data['buffer']
+        content = data['buffer']
 
         if data['mime_type'] == 'image/webp':
-            if data['mime_type'] == 'image/webp':
-                data['name'] = os.path.splitext(data['name'])[0] + '.jpg'
-                image = convert_image(image, 'jpeg')
+            data['name'] = os.path.splitext(data['name'])[0] + '.jpg'
+            content = convert_image(content, 'jpeg', ret_type='bytes')
 
         page_path = os.path.join(self.path, data['name'])
 
-        if isinstance(image, Image.Image):
-            image.save(page_path)
+        # Page may be downloaded again (retry of a failed or corrupted page): only size difference is added to storage usage
+        old_size = os.path.getsize(page_path) if os.path.exists(page_path) else None
+
+        # Page is written in a temporary file, then atomically renamed: an interrupted download never leaves a truncated page
+        tmp_path = os.path.join(self.path, '.part-' + data['name'])
+        with open(tmp_path, 'wb') as fp:
+            fp.write(content)
+        os.replace(tmp_path, page_path)
+
+        # Size and checksum are computed from the buffer just written, the file is not read back
+        manifest = self.update_manifest(index, data['name'], len(content), hashlib.sha256(content).hexdigest())
+        if old_size is None:
+            storage_usage.add(self.manga.path, len(content), new_chapter=len(manifest['pages']) == 1)
         else:
-            with open(page_path, 'wb') as fp:
-                fp.write(image)
+            storage_usage.add(self.manga.path, len(content) - old_size, new_page=False)
 
         updated_data = {}
 
@@ -1074,7 +1988,10 @@ class Chapter:
             self.pages[index]['name'] = data['name']
             updated_data['pages'] = self.pages
 
-        downloaded = len(next(os.walk(self.path))[2]) == len(self.pages)
+        downloaded = len(manifest['pages']) == len(self.pages)
+        if not downloaded and self.has_unlisted_pages(manifest):
+            # Pages downloaded before manifests existed: they are added to manifest once checked
+            downloaded = all(self.get_page_path(page_index, manifest=manifest) for page_index in range(len(self.pages)))
         if downloaded != self.downloaded:
             updated_data['downloaded'] = downloaded
 
@@ -1091,7 +2008,16 @@ class Chapter:
         """
         return self.manga.server.get_manga_chapter_page_image(self.manga.slug, self.manga.name, self.slug, self.pages[index])
 
-    def get_page_path(self, index):
+    def get_page_path(self, index, manifest=None, verify=False):
+        """
+        Returns path of a page if it has been downloaded
+
+        Page file size is checked against manifest. Pages downloaded before manifests existed are trusted
+        and added to manifest (without checksum).
+
+        :param manifest: manifest of chapter (loaded if not provided)
+        :param verify: also verify page checksum (used when a download is resumed)
+        """
         if not self.pages:
             return None
 
@@ -1114,8 +2040,35 @@ class Chapter:
             return None
 
         path = os.path.join(self.path, name)
+        if not os.path.exists(path):
+            return None
+
+        if manifest is None:
+            manifest = self.get_manifest()
+
+        entry = manifest['pages'].get(str(index))
+        if entry is None or entry['name'] != name:
+            entry = self.update_manifest(index, name, os.path.getsize(path), None)['pages'][str(index)]
+            manifest['pages'][str(index)] = entry
 
-        return path if os.path.exists(path) else None
+        if os.path.getsize(path) != entry['size']:
+            return None
+
+        if verify and entry['sha256'] is not None:
+            with open(path, 'rb') as fp:
+                if hashlib.sha256(fp.read()).hexdigest() != entry['sha256']:
+                    return None
+
+        return path
+
+    def has_unlisted_pages(self, manifest):
+        """Returns True if chapter folder contains files missing from manifest (pages downloaded before manifests existed)"""
+        names = {entry['name'] for entry in manifest['pages'].values()}
+
+        try:
+            return any(not name.startswith('.') and name not in names for name in os.listdir(self.path))
+        except FileNotFoundError:
+            return False
 
     def update(self, data):
         """
@@ -1126,14 +2079,17 @@ class Chapter:
         """
         ret = False
 
+        if 'title' in data:
+            data = dict(data, natsort_key=get_natsort_key(data['title']))
+
         for key in data:
             setattr(self, key, data[key])
 
-        db_conn = create_db_connection()
-        with db_conn:
+        with db_transaction() as db_conn:
             ret = update_row(db_conn, 'chapters', self.id, data)
 
-        db_conn.close()
+        if not chapters_counters.FIELDS.isdisjoint(data):
+            chapters_counters.invalidate(self.manga_id)
 
         return ret
 
@@ -1156,21 +2112,45 @@ class Chapter:
 
         return self.update(data)
 
+    def update_manifest(self, index, name, size, checksum):
+        """
+        Records a downloaded page in manifest
 
-class Category:
-    def __init__(self, row=None):
-        if row is not None:
-            for key in row.keys():
-                setattr(self, key, row[key])
+        Pages of a chapter can be downloaded concurrently: manifest is read and (atomically) rewritten under a lock.
+
+        :param checksum: None for a page downloaded before manifests existed, only recorded if page is not already in manifest
+        :return: updated manifest
+        :rtype: dict
+        """
+        with chapters_manifests_lock:
+            manifest = self.get_manifest()
+            entry = manifest['pages'].get(str(index))
+            if checksum is None and entry is not None and entry['name'] == name:
+                # Page has been downloaded again in the meantime
+                return manifest
+
+            manifest['pages'][str(index)] = dict(name=name, size=size, sha256=checksum)
+
+            tmp_path = self.manifest_path + '.part'
+            with open(tmp_path, 'w') as fp:
+                json.dump(manifest, fp)
+            os.replace(tmp_path, self.manifest_path)
+
+        return manifest
+
+
+class Category(Model):
+    __slots__ = ('id', 'label')
+
+    TABLE = 'categories'
+    COLUMNS = ('id', 'label')
 
     @classmethod
     def get(cls, id_, db_conn=None):
-        if db_conn is not None:
-            row = db_conn.execute('SELECT * FROM categories WHERE id = ?', (id_,)).fetchone()
-        else:
-            db_conn = create_db_connection()
-            row = db_conn.execute('SELECT * FROM categories WHERE id = ?', (id_,)).fetchone()
-            db_conn.close()
+        if db_conn is None:
+            db_conn = get_db_connection()
+
+        row = db_conn.execute(cls.get_select_sql() + ' WHERE id = ?', (id_,)).fetchone()
 
         if row is None:
             return None
@@ -1186,33 +2166,23 @@ class Category:
         if db_conn is not None:
             id_ = insert_row(db_conn, 'categories', data)
         else:
-            db_conn = create_db_connection()
-
-            with db_conn:
+            with db_transaction() as db_conn:
                 id_ = insert_row(db_conn, 'categories', data)
 
         category = cls.get(id_, db_conn=db_conn) if id_ is not None else None
 
-        db_conn.close()
-
         return category
 
     @property
     def mangas(self):
-        db_conn = create_db_connection()
-        rows = db_conn.execute('SELECT manga_id FROM categories_mangas_association WHERE category_id = ?', (self.id,)).fetchall()
-        db_conn.close()
+        rows = get_db_connection().execute('SELECT manga_id FROM categories_mangas_association WHERE category_id = ?', (self.id,)).fetchall()
 
         return [row['manga_id'] for row in rows] if rows else []
 
     def delete(self):
-        db_conn = create_db_connection()
-
-        with db_conn:
+        with db_transaction() as db_conn:
             db_conn.execute('DELETE FROM categories WHERE id = ?', (self.id, ))
 
-        db_conn.close()
-
     def update(self, data):
         """
         Updates specific fields
@@ -1225,12 +2195,9 @@ class Category:
         for key in data:
             setattr(self, key, data[key])
 
-        db_conn = create_db_connection()
-        with db_conn:
+        with db_transaction() as db_conn:
             ret = update_row(db_conn, 'categories', self.id, data)
 
-        db_conn.close()
-
         return ret
 
 
@@ -1239,65 +2206,115 @@ class CategoryVirtual(IntEnum):
     UNCATEGORIZED = -1
 
 
-class Download:
-    _chapter = None
+class DownloadPriority(IntEnum):
+    AUTO = 0  # Automatic download of new chapters
+    USER = 1  # Chapters queued by user
+    READER = 2  # Chapter currently read
+
+
+class Download(Model):
+    __slots__ = ('id', 'chapter_id', 'status', 'percent', 'errors', 'date', 'priority', '_chapter')
+
+    TABLE = 'downloads'
+    COLUMNS = ('id', 'chapter_id', 'status', 'percent', 'errors', 'date', 'priority')
 
     STATUSES = dict(
+        paused=_('Download paused'),
         pending=_('Download pending'),
         downloaded=_('Downloaded'),
         downloading=_('Downloading'),
         error=_('Download error'),
     )
 
+    def __init__(self, row=None):
+        self._chapter = None
+
+        super().__init__(row)
+
     @classmethod
     def get(cls, id_):
-        db_conn = create_db_connection()
-        row = db_conn.execute('SELECT * FROM downloads WHERE id = ?', (id_,)).fetchone()
-        db_conn.close()
+        row = get_db_connection().execute(cls.get_select_sql() + ' WHERE id = ?', (id_,)).fetchone()
 
         if row is None:
             return None
 
-        d = cls()
-        for key in row.keys():
-            setattr(d, key, row[key])
-
-        return d
+        return cls(row)
 
     @classmethod
     def get_by_chapter_id(cls, chapter_id):
-        db_conn = create_db_connection()
-        row = db_conn.execute('SELECT * FROM downloads WHERE chapter_id = ?', (chapter_id,)).fetchone()
-        db_conn.close()
+        row = get_db_connection().execute(cls.get_select_sql() + ' WHERE chapter_id = ?', (chapter_id,)).fetchone()
 
-        if row:
-            d = cls()
+        if row is None:
+            return None
 
-            for key in row.keys():
-                setattr(d, key, row[key])
+        return cls(row)
 
-            return d
+    @classmethod
+    def get_by_chapters_ids(cls, chapters_ids):
+        """Returns downloads of a list of chapters (in a single query)"""
+        cursor = get_db_connection().execute(
+            cls.get_select_sql() + ' WHERE chapter_id IN (SELECT value FROM json_each(?)) ORDER BY id', (json.dumps(chapters_ids),)
+        )
 
-        return None
+        return [cls(row) for row in cursor.fetchall()]
+
+    @classmethod
+    def new_many(cls, chapters_ids, priority=DownloadPriority.USER):
+        """
+        Adds chapters to downloads queue
+
+        Chapters already queued are skipped: they are found with a single query and, in case a concurrent
+        thread queued some in the meantime, rows are inserted with `INSERT OR IGNORE` (chapter_id is UNIQUE).
+
+        :param chapters_ids: list of chapters IDs
+        :param priority: a `DownloadPriority`
+        :return: IDs of chapters queued by this call
+        :rtype: list
+        """
+        chapters_ids = list(dict.fromkeys(chapters_ids))
+        if not chapters_ids:
+            return []
+
+        db_conn = get_db_connection()
+        queued_ids = {
+            row[0] for row in db_conn.execute(
+                'SELECT chapter_id FROM downloads WHERE chapter_id IN (SELECT value FROM json_each(?))', (json.dumps(chapters_ids),)
+            )
+        }
+        chapters_ids = [chapter_id for chapter_id in chapters_ids if chapter_id not in queued_ids]
+        if not chapters_ids:
+            return []
+
+        date = datetime.datetime.utcnow()
+        rows_data = [
+            dict(chapter_id=chapter_id, status='pending', percent=0, date=date, priority=priority)
+            for chapter_id in chapters_ids
+        ]
+
+        with db_transaction() as db_conn:
+            insert_rows(db_conn, 'downloads', rows_data, ignore=True)
+
+            # Rows skipped (failure) or ignored (queued by a concurrent thread) are excluded
+            rows = db_conn.execute(
+                'SELECT chapter_id FROM downloads WHERE chapter_id IN (SELECT value FROM json_each(?)) AND date = ?',
+                (json.dumps(chapters_ids), date)
+            )
+            inserted_ids = {row[0] for row in rows}
+
+        return [chapter_id for chapter_id in chapters_ids if chapter_id in inserted_ids]
 
     @classmethod
     def next(cls, exclude_errors=False):
-        db_conn = create_db_connection()
+        db_conn = get_db_connection()
         if exclude_errors:
-            row = db_conn.execute('SELECT * FROM downloads WHERE status = "pending" ORDER BY date ASC').fetchone()
+            row = db_conn.execute(cls.get_select_sql() + ' WHERE status = "pending" ORDER BY priority DESC, date ASC').fetchone()
         else:
-            row = db_conn.execute('SELECT * FROM downloads ORDER BY date ASC').fetchone()
-        db_conn.close()
-
-        if row:
-            c = cls()
+            row = db_conn.execute(cls.get_select_sql() + ' ORDER BY priority DESC, date ASC').fetchone()
 
-            for key in row.keys():
-                setattr(c, key, row[key])
-
-            return c
+        if row is None:
+            return None
 
-        return None
+        return cls(row)
 
     @property
     def chapter(self):
@@ -1307,13 +2324,9 @@ class Download:
         return self._chapter
 
     def delete(self):
-        db_conn = create_db_connection()
-
-        with db_conn:
+        with db_transaction() as db_conn:
             db_conn.execute('DELETE FROM downloads WHERE id = ?', (self.id, ))
 
-        db_conn.close()
-
     def update(self, data):
         """
         Updates download
@@ -1321,16 +2334,12 @@ class Download:
         :param data: percent of pages downloaded, errors or status
         :return: True on success False otherwise
         """
-
-        db_conn = create_db_connection()
         result = False
 
-        with db_conn:
+        with db_transaction() as db_conn:
             if update_row(db_conn, 'downloads', self.id, data):
                 result = True
                 for key in data:
                     setattr(self, key, data[key])
 
-        db_conn.close()
-
         return result
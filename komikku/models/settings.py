@@ -455,6 +455,24 @@ class Settings(Gio.Settings):
     def selected_category(self, state):
         self.set_int('selected-category', state)
 
+    def set_server_download_concurrency(self, uid, value):
+        """
+        Sets number of pages of a chapter downloaded concurrently from a server
+
+        :param value: number of pages, None to use server default value
+        """
+        settings = self.servers_settings
+
+        if uid not in settings:
+            settings[uid] = dict(
+                langs={},
+                enabled=True,
+            )
+
+        settings[uid]['download_concurrency'] = value
+
+        self.servers_settings = settings
+
     def toggle_server(self, uid, state):
         settings = self.servers_settings
 
@@ -511,6 +529,34 @@ class Settings(Gio.Settings):
         codes = GLib.Variant('as', codes)
         self.set_value('servers-languages', codes)
 
+    @property
+    def storage_quota(self):
+        return self.get_double('storage-quota')
+
+    @storage_quota.setter
+    def storage_quota(self, value):
+        """
+        Set max disk space used by downloaded chapters
+
+        :param value: size in GiB (0 for no limit)
+        :type value: float
+        """
+        self.set_double('storage-quota', value)
+
+    @property
+    def storage_quota_per_manga(self):
+        return self.get_double('storage-quota-per-manga')
+
+    @storage_quota_per_manga.setter
+    def storage_quota_per_manga(self, value):
+        """
+        Set max disk space used by downloaded chapters of a manga
+
+        :param value: size in GiB (0 for no limit)
+        :type value: float
+        """
+        self.set_double('storage-quota-per-manga', value)
+
     @property
     def update_at_startup(self):
         return self.get_boolean('update-at-startup')
@@ -3,12 +3,16 @@
 # Author: Valéry Febvre <vfebvre@easter-eggs.com>
 
 from gettext import gettext as _
+import shutil
+import threading
 
 from gi.repository import Adw
 from gi.repository import GLib
 from gi.repository import Gtk
 
+from komikku.downloader import DOWNLOAD_MAX_CONCURRENCY
 from komikku.models import Settings
+from komikku.models import storage_usage
 from komikku.models.database import clear_cached_data
 from komikku.models.keyring import KeyringHelper
 from komikku.servers import LANGUAGES
@@ -16,6 +20,7 @@ from komikku.servers.utils import get_server_main_id_by_id
 from komikku.servers.utils import get_servers_list
 from komikku.utils import folder_size
 from komikku.utils import get_cached_data_dir
+from komikku.utils import get_data_dir
 from komikku.utils import html_escape
 
 
@@ -41,6 +46,9 @@ class PreferencesPage(Adw.NavigationPage):
     library_badge_recent_chapters_switch = Gtk.Template.Child('library_badge_recent_chapters_switch')
     update_at_startup_switch = Gtk.Template.Child('update_at_startup_switch')
     new_chapters_auto_download_switch = Gtk.Template.Child('new_chapters_auto_download_switch')
+    storage_group = Gtk.Template.Child('storage_group')
+    storage_quota_adjustment = Gtk.Template.Child('storage_quota_adjustment')
+    storage_quota_per_manga_adjustment = Gtk.Template.Child('storage_quota_per_manga_adjustment')
     nsfw_content_switch = Gtk.Template.Child('nsfw_content_switch')
     nsfw_only_content_switch = Gtk.Template.Child('nsfw_only_content_switch')
     servers_languages_actionrow = Gtk.Template.Child('servers_languages_actionrow')
@@ -263,6 +271,12 @@ class PreferencesPage(Adw.NavigationPage):
         elif index == 3:
             self.settings.scaling = 'original'
 
+    def on_storage_quota_changed(self, adjustment):
+        self.settings.storage_quota = adjustment.get_value()
+
+    def on_storage_quota_per_manga_changed(self, adjustment):
+        self.settings.storage_quota_per_manga = adjustment.get_value()
+
     def on_update_at_startup_changed(self, switch_button, _gparam):
         if switch_button.get_active():
             self.settings.update_at_startup = True
@@ -326,6 +340,12 @@ class PreferencesPage(Adw.NavigationPage):
         self.new_chapters_auto_download_switch.set_active(self.settings.new_chapters_auto_download)
         self.new_chapters_auto_download_switch.connect('notify::active', self.on_new_chapters_auto_download_changed)
 
+        # Storage quotas
+        self.storage_quota_adjustment.set_value(self.settings.storage_quota)
+        self.storage_quota_adjustment.connect('value-changed', self.on_storage_quota_changed)
+        self.storage_quota_per_manga_adjustment.set_value(self.settings.storage_quota_per_manga)
+        self.storage_quota_per_manga_adjustment.connect('value-changed', self.on_storage_quota_per_manga_changed)
+
         # Servers languages
         self.servers_languages_subpage = PreferencesServersLanguagesSubPage(self)
         self.window.navigationview.add(self.servers_languages_subpage)
@@ -417,12 +437,28 @@ class PreferencesPage(Adw.NavigationPage):
         self.clamp_size_adjustment.set_upper(self.window.monitor.props.geometry.width)
 
         self.update_cached_data_size()
+        self.update_storage_usage()
 
         self.window.navigationview.push(self)
 
     def update_cached_data_size(self):
         self.clear_cached_data_actionrow.set_subtitle(folder_size(get_cached_data_dir()) or '-')
 
+    def update_storage_usage(self):
+        def run():
+            # Library folders are only walked once, usage is then kept up to date by downloader
+            size = storage_usage.get_total()
+            free = shutil.disk_usage(get_data_dir()).free
+
+            GLib.idle_add(
+                self.storage_group.set_description,
+                _('Downloaded chapters use {0} ({1} free on disk)').format(GLib.format_size(size), GLib.format_size(free))
+            )
+
+        thread = threading.Thread(target=run)
+        thread.daemon = True
+        thread.start()
+
 
 @Gtk.Template.from_resource('/info/febvre/Komikku/ui/preferences_servers_languages.ui')
 class PreferencesServersLanguagesSubPage(Adw.NavigationPage):
@@ -479,6 +515,29 @@ class PreferencesServersSettingsSubPage(Adw.NavigationPage):
 
         self.populate()
 
+    def build_server_download_concurrency_button(self, server_main_id, server_class):
+        hbox = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, margin_top=6, margin_bottom=6, spacing=12)
+
+        label = Gtk.Label(label=_('Concurrent Page Downloads'), xalign=0, hexpand=True)
+        hbox.append(label)
+
+        spinbutton = Gtk.SpinButton.new_with_range(1, DOWNLOAD_MAX_CONCURRENCY, 1)
+        spinbutton.set_valign(Gtk.Align.CENTER)
+        spinbutton.set_value(self.window.downloader.get_server_concurrency(server_class))
+        spinbutton.connect('value-changed', self.on_server_download_concurrency_changed, server_main_id)
+        hbox.append(spinbutton)
+
+        popover = Gtk.Popover()
+        popover.set_child(hbox)
+
+        button = Gtk.MenuButton(valign=Gtk.Align.CENTER)
+        button.set_icon_name('folder-download-symbolic')
+        button.set_tooltip_text(_('Concurrent Page Downloads'))
+        button.add_css_class('flat')
+        button.set_popover(popover)
+
+        return button
+
     def on_server_activated(self, row, _gparam, server_main_id):
         if isinstance(row, Adw.ExpanderRow):
             self.settings.toggle_server(server_main_id, row.get_enable_expansion())
@@ -489,6 +548,9 @@ class PreferencesServersSettingsSubPage(Adw.NavigationPage):
         if self.window.explorer.servers_page in self.window.navigationview.get_navigation_stack():
             self.window.explorer.servers_page.populate()
 
+    def on_server_download_concurrency_changed(self, spinbutton, server_main_id):
+        self.settings.set_server_download_concurrency(server_main_id, spinbutton.get_value_as_int())
+
     def on_server_language_activated(self, switch_button, _gparam, server_main_id, lang):
         self.settings.toggle_server_lang(server_main_id, lang, switch_button.get_active())
 
@@ -553,6 +615,7 @@ class PreferencesServersSettingsSubPage(Adw.NavigationPage):
                 expander_row.set_enable_expansion(server_enabled)
                 expander_row.set_sensitive(server_allowed)
                 expander_row.connect('notify::enable-expansion', self.on_server_activated, server_main_id)
+                expander_row.add_suffix(self.build_server_download_concurrency_button(server_main_id, server_class))
                 expander_row.add_row(vbox)
 
                 self.group.add(expander_row)
@@ -647,6 +710,7 @@ class PreferencesServersSettingsSubPage(Adw.NavigationPage):
                 switchrow.set_sensitive(server_allowed)
                 switchrow.set_active(server_enabled and server_allowed)
                 switchrow.connect('notify::active', self.on_server_activated, server_main_id)
+                switchrow.add_suffix(self.build_server_download_concurrency_button(server_main_id, server_class))
 
                 self.group.add(switchrow)
 
@@ -238,6 +238,9 @@ class ReaderPage(Adw.NavigationPage):
         self.page_numbering_label.set_visible(False)
         self.window.unfullscreen()
 
+        # Chapter is no longer read: its download (if pending) gets back its priority
+        self.window.downloader.deprioritize()
+
         # Sync Card page
         if self.window.card in self.window.navigationview.get_navigation_stack():
             if self.chapters_consulted:
@@ -437,3 +440,6 @@ class ReaderPage(Adw.NavigationPage):
         if chapter.manga.name in subtitle:
             subtitle = subtitle.replace(chapter.manga.name, '').strip()
         self.title.set_subtitle(subtitle)
+
+        # If chapter download is pending, it jumps ahead of other downloads of server
+        self.window.downloader.prioritize(chapter)
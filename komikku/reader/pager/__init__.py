@@ -13,6 +13,7 @@ from gi.repository import GLib
 from gi.repository import GObject
 from gi.repository import Gtk
 
+from komikku.models import ReadProgress
 from komikku.reader.pager.page import Page
 from komikku.utils import log_error_traceback
 
@@ -116,14 +117,14 @@ class BasePager:
                 self.reader.chapters_consulted.add(chapter)
 
                 read_progress = chapter.read_progress
-                if read_progress is None:
-                    # Init and fill with '0'
-                    read_progress = '0' * len(chapter.pages)
+                if read_progress is None or len(read_progress) != len(chapter.pages):
+                    # Init: no pages read
+                    read_progress = ReadProgress(len(chapter.pages))
 
                 # Mark current page as read
                 for index in pages:
-                    read_progress = read_progress[:index] + '1' + read_progress[index + 1:]
-                chapter_is_read = '0' not in read_progress
+                    read_progress.set(index)
+                chapter_is_read = read_progress.all_read
                 if chapter_is_read:
                     read_progress = None
 
@@ -193,10 +193,13 @@ class Page(Gtk.Overlay):
             self.loadable = True
 
             if self.reader.manga.server_id != 'local':
-                page_path = self.chapter.get_page_path(self.index)
+                manifest = self.chapter.get_manifest()
+                page_path = self.chapter.get_page_path(self.index, manifest=manifest)
                 if page_path is None:
                     try:
-                        page_path = self.chapter.get_page(self.index)
+                        # Background downloads of server are paused in the meantime
+                        with self.reader.window.downloader.preempt(self.reader.manga.server_id):
+                            page_path = self.chapter.get_page(self.index, manifest=manifest)
                         if page_path:
                             self.path = page_path
                         else:
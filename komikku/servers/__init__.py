@@ -6,15 +6,37 @@ from abc import ABC
 from abc import abstractmethod
 from bs4 import BeautifulSoup
 from functools import cached_property
+import hashlib
 import inspect
 import logging
 import os
 import pickle
 import requests
+import time
 from requests.adapters import TimeoutSauce
+from urllib.parse import urlsplit
 
 from komikku.models.keyring import KeyringHelper
+from komikku.servers.cache import get_endpoint_ttl
+from komikku.servers.cache import get_entry_response
+from komikku.servers.cache import get_response_entry
+from komikku.servers.cache import get_response_ttl
+from komikku.servers.cache import http_cache
+from komikku.servers.cache import is_revalidation_forced
+from komikku.servers.exceptions import NotModifiedError
+from komikku.servers.exceptions import ServerUnavailableError
 from komikku.servers.loader import server_finder
+from komikku.servers.pool import connection_pools
+from komikku.servers.ratelimit import get_retry_after_delay
+from komikku.servers.ratelimit import rate_limiters
+from komikku.servers.ratelimit import RETRY_AFTER_MAX
+from komikku.servers.resilience import circuit_breakers
+from komikku.servers.resilience import classify_failure
+from komikku.servers.resilience import get_backoff_delay
+from komikku.servers.resilience import RETRY_MAX_ATTEMPTS
+from komikku.servers.resilience import RETRYABLE_FAILURES
+from komikku.servers.resilience import RETRYABLE_METHODS
+from komikku.servers.resilience import wait_before_retry
 from komikku.servers.utils import convert_image
 from komikku.servers.utils import get_buffer_mime_type
 from komikku.servers.utils import get_server_main_id_by_id
@@ -81,13 +103,19 @@ class Server(ABC):
     base_url = None
 
     bypass_cf_url = None
+    download_concurrency = 1  # Number of pages of a chapter that can be safely downloaded concurrently
     has_cf = False
     has_login = False
     headers = None
+    http_cache_images = False  # If True, image responses of cached endpoints are cached too
+    http_cache_ttls = None  # Cached endpoints: regular expression matching URL path => TTL in seconds (None: no cache)
     is_nsfw = False
     is_nsfw_only = False
     long_strip_genres = []
     manga_title_css_selector = None  # Used to extract manga title in a manga URL
+    rate_limit_burst = None  # Number of requests that can be sent at once to a host (None: default value)
+    rate_limit_rate = None  # Number of requests per second sent to a host (None: default value)
+    retry_max_attempts = RETRY_MAX_ATTEMPTS  # Max number of attempts of a request failing transiently
     true_search = True  # If False, hide search in Explorer search page (XKCD, DBM, pepper&carotte…)
     status = 'enabled'
     sync = False
@@ -163,6 +191,9 @@ class Server(ABC):
 
     @session.setter
     def session(self, value):
+        if value is not None:
+            # Connections are pooled per host across sessions of all servers
+            connection_pools.mount(value)
         Server.__sessions[self.id] = value
 
     @property
@@ -208,7 +239,7 @@ class Server(ABC):
         if etag:
             headers['If-None-Match'] = etag
 
-        r = self.session.get(url, headers=headers)
+        r = self.session_get(url, headers=headers)
         if r.status_code != 200:
             return None, None
 
@@ -375,32 +406,163 @@ class Server(ABC):
         """
         pass
 
-    def session_get(self, *args, **kwargs):
-        try:
-            r = self.session.get(*args, **kwargs)
-        except Exception as error:
-            logger.debug(error)
-            raise
+    def session_get(self, url, *args, **kwargs):
+        """
+        Sends a GET request using session
+
+        Responses of the endpoints declared in `http_cache_ttls` are cached on disk (see `komikku.servers.cache`).
+        A fresh cached response is returned without sending any request. A stale one is revalidated
+        with a conditional request if it has an ETag or a Last-Modified date.
+
+        Cache is bypassed for streamed requests and for conditional requests sent by caller.
+        A `Cache-Control: no-cache` request header forces revalidation, as well as manga updates (see `forced_revalidation()`).
+        """
+        ttl = get_endpoint_ttl(self.http_cache_ttls, url) if self.http_cache_ttls else None
+        headers = kwargs.get('headers') or {}
+        if ttl is None or kwargs.get('stream') or 'If-None-Match' in headers or 'If-Modified-Since' in headers:
+            return self.session_request('get', url, *args, **kwargs)
+
+        key = http_cache.get_key(self.id, url, kwargs.get('params'))
+        entry = http_cache.get(key)
+        if entry is not None:
+            revalidate = is_revalidation_forced() or 'no-cache' in (headers.get('Cache-Control') or '')
+            if entry['expires'] > time.time() and not revalidate:
+                http_cache.record(hit=True)
+                return get_entry_response(entry)
+
+            # Stale: revalidate
+            headers = dict(headers)
+            if entry['etag']:
+                headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                headers['If-Modified-Since'] = entry['last_modified']
+            kwargs['headers'] = headers
+
+        r = self.session_request('get', url, *args, **kwargs)
+
+        if entry is not None and r.status_code == 304:
+            http_cache.record(hit=True, revalidated=True)
+            if (ttl := get_response_ttl(r, ttl)) is not None:
+                entry['expires'] = time.time() + ttl
+                http_cache.set(key, entry)
+
+            return get_entry_response(entry)
+
+        http_cache.record(hit=False)
+        if new_entry := get_response_entry(r, ttl, self.http_cache_images):
+            http_cache.set(key, new_entry)
 
         return r
 
-    def session_patch(self, *args, **kwargs):
-        try:
-            r = self.session.patch(*args, **kwargs)
-        except Exception as error:
-            logger.debug(error)
-            raise
+    def session_get_if_modified(self, url, initial_data, *args, **kwargs):
+        """
+        Sends a conditional GET request of a manga page or API payload
+
+        Opt-in helper for `get_manga_data()`, to be used when a single response contains all manga data (chapters included).
+        Validators of previous response (ETag, Last-Modified and content hash) are read from `initial_data['update_validators']`
+        and replaced by the ones of the response.
+
+        :param initial_data: initial data passed to `get_manga_data()`
+        :raises NotModifiedError: response is unchanged since previous update (304 response or same content)
+        """
+        validators = initial_data.get('update_validators') or {}
+
+        headers = kwargs.pop('headers', None) or {}
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
+
+        r = self.session_get(url, *args, headers=headers, **kwargs)
+        if r.status_code == 304:
+            raise NotModifiedError()
+        if r.status_code != 200:
+            return r
+
+        content_hash = hashlib.sha1(r.content).hexdigest()
+        initial_data['update_validators'] = dict(
+            validators,
+            etag=r.headers.get('ETag'),
+            last_modified=r.headers.get('Last-Modified'),
+            content_hash=content_hash,
+        )
+        if content_hash == validators.get('content_hash'):
+            raise NotModifiedError()
 
         return r
 
+    def session_patch(self, *args, **kwargs):
+        return self.session_request('patch', *args, **kwargs)
+
     def session_post(self, *args, **kwargs):
-        try:
-            r = self.session.post(*args, **kwargs)
-        except Exception as error:
-            logger.debug(error)
-            raise
+        return self.session_request('post', *args, **kwargs)
 
-        return r
+    def session_request(self, method, url, *args, retry=None, **kwargs):
+        """
+        Sends a request using session
+
+        Requests are rate limited per host (see `komikku.servers.ratelimit`).
+        A 429 or 503 response with a short `Retry-After` delay blocks the host for that delay.
+
+        Transient failures (timeout, connection error, 429, 5xx) of idempotent requests (GET, HEAD, OPTIONS)
+        are retried with a jittered exponential backoff. Other requests are retried only if `retry` is True.
+        Waits before retries are interrupted when downloader or updater is stopped (see `set_retries_stop_event`).
+        Final outcome is recorded by the circuit breaker of server: no request is sent while it's open
+        (see `komikku.servers.resilience`).
+        """
+        breaker = circuit_breakers.get(self.id, self.name)
+        if not breaker.allow():
+            raise ServerUnavailableError()
+
+        limiter = rate_limiters.get(urlsplit(url).netloc, self.rate_limit_rate, self.rate_limit_burst)
+        if retry is None:
+            retry = method in RETRYABLE_METHODS
+
+        attempt = 0
+        while True:
+            limiter.acquire()
+
+            try:
+                r = getattr(self.session, method)(url, *args, **kwargs)
+            except Exception as error:
+                failure = classify_failure(error=error)
+                if retry and failure in RETRYABLE_FAILURES and attempt + 1 < self.retry_max_attempts:
+                    delay = get_backoff_delay(attempt)
+                    logger.debug(f'{failure} failure, retry in {delay:.1f}s: {url}')
+                    if wait_before_retry(delay):
+                        attempt += 1
+                        continue
+
+                if failure is not None:
+                    breaker.record_failure(failure)
+                else:
+                    # Not a server failure (invalid URL for ex.): breaker is left untouched
+                    breaker.release()
+                logger.debug(error)
+                raise
+
+            failure = classify_failure(response=r)
+
+            delay = get_retry_after_delay(r)
+            if delay is not None:
+                limiter.block(min(delay, RETRY_AFTER_MAX))
+
+            if retry and failure in RETRYABLE_FAILURES and attempt + 1 < self.retry_max_attempts and (delay is None or delay <= RETRY_AFTER_MAX):
+                if delay is None:
+                    # No Retry-After delay: backoff
+                    delay = get_backoff_delay(attempt)
+                logger.debug(f'{r.status_code} response, retry after {delay:.1f}s: {url}')
+                # Retry-After delay is waited here rather than by rate limiter: wait can be interrupted
+                if wait_before_retry(delay):
+                    attempt += 1
+                    continue
+
+            if failure is not None:
+                breaker.record_failure(failure)
+            else:
+                breaker.record_success()
+
+            return r
 
     def update_chapter_read_progress(self, data, manga_slug, manga_name, chapter_slug, chapter_url):
         return NotImplemented
@@ -0,0 +1,295 @@
+# Copyright (C) 2019-2024 Valéry Febvre
+# SPDX-License-Identifier: GPL-3.0-only or GPL-3.0-or-later
+# Author: Valéry Febvre <vfebvre@easter-eggs.com>
+
+from collections import OrderedDict
+from contextlib import contextmanager
+import hashlib
+import logging
+import os
+import pickle
+import re
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from komikku.utils import get_cache_dir
+
+HTTP_CACHE_MAX_SIZE = 50 * 1024 * 1024  # in bytes, least recently used responses are evicted beyond
+
+logger = logging.getLogger('komikku.servers')
+
+revalidation = threading.local()  # per thread flag, see `forced_revalidation()`
+
+
+class HTTPCache:
+    """
+    On-disk cache of GET responses, shared by all servers
+
+    Opt-in: only responses of the endpoints declared by a server in `Server.http_cache_ttls` are cached
+    (see `Server.session_get`).
+
+    Each response is stored in its own file. Files modification time is used as last access time:
+    least recently used responses are evicted when total size exceeds `max_size`.
+    """
+
+    def __init__(self, dir_path=None, max_size=HTTP_CACHE_MAX_SIZE):
+        self._dir_path = dir_path
+        self.max_size = max_size
+
+        self.entries = None  # OrderedDict of key => size, from least to most recently used
+        self.lock = threading.Lock()
+        self.size = 0
+
+        # Metrics
+        self.nb_evictions = 0
+        self.nb_hits = 0
+        self.nb_misses = 0
+        self.nb_revalidations = 0
+
+    @property
+    def dir_path(self):
+        if self._dir_path is None:
+            self._dir_path = os.path.join(get_cache_dir(), 'http')
+        if not os.path.exists(self._dir_path):
+            os.makedirs(self._dir_path, exist_ok=True)
+
+        return self._dir_path
+
+    def _load(self):
+        """Builds index of stored responses from disk, on first use (lock must be held)"""
+        if self.entries is not None:
+            return
+
+        files = []
+        with os.scandir(self.dir_path) as it:
+            for entry in it:
+                if entry.is_file() and entry.name.endswith('.pickle'):
+                    stat = entry.stat()
+                    files.append((stat.st_mtime, entry.name[:-7], stat.st_size))
+
+        self.entries = OrderedDict()
+        self.size = 0
+        for _mtime, key, size in sorted(files):
+            self.entries[key] = size
+            self.size += size
+
+    def _path(self, key):
+        return os.path.join(self.dir_path, f'{key}.pickle')
+
+    def _remove(self, key):
+        """Removes a stored response (lock must be held)"""
+        self.size -= self.entries.pop(key, 0)
+        try:
+            os.unlink(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def clear(self):
+        with self.lock:
+            self._load()
+            for key in list(self.entries):
+                self._remove(key)
+
+    def get(self, key):
+        """
+        Returns a stored response entry
+
+        :return: entry (dict) or None if response is not stored
+        """
+        with self.lock:
+            self._load()
+            if key not in self.entries:
+                return None
+
+            try:
+                with open(self._path(key), 'rb') as fp:
+                    entry = pickle.load(fp)
+                os.utime(self._path(key))
+            except Exception as error:
+                logger.debug(f'HTTP cache: invalid entry {key}: {error}')
+                self._remove(key)
+                return None
+
+            self.entries.move_to_end(key)
+
+            return entry
+
+    @staticmethod
+    def get_key(server_id, url, params=None):
+        url = requests.Request('GET', url, params=params).prepare().url
+
+        return hashlib.sha1(f'{server_id} {url}'.encode()).hexdigest()
+
+    def record(self, hit, revalidated=False):
+        with self.lock:
+            if hit:
+                self.nb_hits += 1
+            else:
+                self.nb_misses += 1
+            if revalidated:
+                self.nb_revalidations += 1
+
+    def set(self, key, entry):
+        """Stores a response entry and evicts least recently used ones if cache is full"""
+        data = pickle.dumps(entry)
+        if len(data) > self.max_size:
+            return
+
+        with self.lock:
+            self._load()
+            self._remove(key)
+
+            # Write in a temporary file first: a concurrent reader must never read a partial file
+            tmp_path = f'{self._path(key)}.{os.getpid()}.tmp'
+            with open(tmp_path, 'wb') as fp:
+                fp.write(data)
+            os.replace(tmp_path, self._path(key))
+
+            self.entries[key] = len(data)
+            self.size += len(data)
+
+            while self.size > self.max_size:
+                self._remove(next(iter(self.entries)))
+                self.nb_evictions += 1
+
+    @property
+    def stats(self):
+        with self.lock:
+            return dict(
+                entries=len(self.entries) if self.entries is not None else None,
+                size=self.size,
+                hits=self.nb_hits,
+                misses=self.nb_misses,
+                revalidations=self.nb_revalidations,
+                evictions=self.nb_evictions,
+            )
+
+
+@contextmanager
+def forced_revalidation():
+    """
+    Forces revalidation of cached responses for requests sent by calling thread
+
+    Fresh cached responses are not returned as is: a (conditional) request is always sent.
+    Used by manga updates, which must not miss new chapters because of a cached chapters list.
+    """
+    forced = getattr(revalidation, 'forced', False)
+    revalidation.forced = True
+    try:
+        yield
+    finally:
+        revalidation.forced = forced
+
+
+def get_cache_control(headers):
+    """
+    Parses `Cache-Control` header
+
+    :return: directives, ex. {'max-age': '60', 'no-cache': None}
+    :rtype: dict
+    """
+    directives = {}
+    for directive in (headers.get('Cache-Control') or '').split(','):
+        name, _sep, value = directive.strip().partition('=')
+        if name:
+            directives[name.lower()] = value.strip('"') or None
+
+    return directives
+
+
+def get_endpoint_ttl(ttls, url):
+    """
+    Returns TTL of an endpoint
+
+    :param ttls: dict of regular expression matching URL path => TTL (in seconds)
+    :return: TTL or None if endpoint is not cacheable
+    """
+    path = urlsplit(url).path
+    for pattern, ttl in ttls.items():
+        if re.search(pattern, path):
+            return ttl
+
+    return None
+
+
+def get_response_entry(response, ttl, images=False):
+    """
+    Returns the entry to store for a response
+
+    Responses that are immediately stale (`no-cache` or `max-age=0`) are stored only if they can be revalidated
+    (ETag or Last-Modified).
+
+    :param ttl: TTL declared by server (in seconds)
+    :param images: whether image responses can be stored
+    :return: entry (dict) or None if response must not be stored
+    """
+    if response.status_code != 200:
+        return None
+
+    content_type = response.headers.get('Content-Type') or ''
+    if not images and content_type.startswith('image/'):
+        return None
+
+    ttl = get_response_ttl(response, ttl)
+    if ttl is None:
+        return None
+
+    etag = response.headers.get('ETag')
+    last_modified = response.headers.get('Last-Modified')
+    if ttl <= 0 and not etag and not last_modified:
+        return None
+
+    return dict(
+        content=response.content,
+        encoding=response.encoding,
+        etag=etag,
+        expires=time.time() + ttl,
+        headers=dict(response.headers),
+        last_modified=last_modified,
+        reason=response.reason,
+        status_code=response.status_code,
+        url=response.url,
+    )
+
+
+def get_response_ttl(response, ttl):
+    """
+    Returns TTL of a response: TTL declared by server, capped by `Cache-Control` directives of response
+
+    :param ttl: TTL declared by server (in seconds)
+    :return: TTL or None if response must not be stored (`no-store`)
+    """
+    directives = get_cache_control(response.headers)
+    if 'no-store' in directives:
+        return None
+
+    if 'no-cache' in directives:
+        return 0
+    if (max_age := directives.get('max-age')) and max_age.isdigit():
+        return min(ttl, int(max_age))
+
+    return ttl
+
+
+def get_entry_response(entry):
+    """Returns a response built from a stored entry"""
+    response = requests.Response()
+    response._content = entry['content']
+    response.encoding = entry['encoding']
+    response.headers = CaseInsensitiveDict(entry['headers'])
+    response.reason = entry['reason']
+    response.status_code = entry['status_code']
+    response.url = entry['url']
+
+    return response
+
+
+def is_revalidation_forced():
+    return getattr(revalidation, 'forced', False)
+
+
+http_cache = HTTPCache()
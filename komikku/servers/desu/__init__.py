@@ -45,7 +45,7 @@ class Desu(Server):
         """
         assert 'slug' in initial_data, 'Slug is missing in initial data'
 
-        r = self.session_get(self.api_manga_url.format(initial_data['slug']))
+        r = self.session_get_if_modified(self.api_manga_url.format(initial_data['slug']), initial_data)
         if r.status_code != 200:
             return None
 
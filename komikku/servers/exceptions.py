@@ -29,3 +29,13 @@ class CfBypassError(ServerException):
 class NotFoundError(ServerException):
     def __init__(self):
         super().__init__(_('No longer exists.'))
+
+
+class NotModifiedError(ServerException):
+    def __init__(self):
+        super().__init__(_('No changes since last update.'))
+
+
+class ServerUnavailableError(ServerException):
+    def __init__(self):
+        super().__init__(_('Server is temporarily unavailable (too many failures). Please try again later.'))
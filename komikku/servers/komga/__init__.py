@@ -224,7 +224,7 @@ class Komga(Server):
 
     def login(self, username, password):
         try:
-            r = self.session.get(
+            r = self.session_get(
                 self.api_search_url,
                 params={
                     'remember-me': True,
@@ -5,11 +5,13 @@
 import json
 from regex import Regex
 import requests
+from urllib.parse import urlsplit
 
 from bs4 import BeautifulSoup
 
 from komikku.servers import Server, USER_AGENT
 from komikku.servers.exceptions import NotFoundError
+from komikku.servers.ratelimit import rate_limiters
 from komikku.servers.utils import get_buffer_mime_type
 
 
@@ -125,6 +127,8 @@ class Littlexgarden(Server):
         ))
 
         # Request directly their data rather than scraping a page as chapters are dynamically loaded
+        # Sent without session (no cookies nor headers of session) but rate limited as other requests to host
+        rate_limiters.get(urlsplit(self.api_url).netloc, self.rate_limit_rate, self.rate_limit_burst).acquire()
         r = requests.post(
             self.api_url,
             data=body,
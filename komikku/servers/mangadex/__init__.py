@@ -11,8 +11,6 @@ from functools import lru_cache
 import html
 import logging
 import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util import Retry
 from uuid import UUID
 
 from komikku.servers import Server
@@ -36,6 +34,15 @@ class Mangadex(Server):
     lang_code = 'en'
     is_nsfw = True
     long_strip_genres = ['Long Strip', ]
+    download_concurrency = 4  # Pages are served by MangaDex@Home CDN nodes
+    rate_limit_burst = 5
+    rate_limit_rate = 5  # API global rate limit is 5 requests per second per IP
+    retry_max_attempts = 6  # API is often overloaded: failed requests are retried 5 times
+    http_cache_ttls = {
+        r'^/manga$': 300,  # search, latest updates, most populars
+        r'^/manga/[^/]+$': 600,  # manga
+        r'^/chapter$': 600,  # chapters of a manga
+    }
 
     base_url = 'https://mangadex.org'
     api_base_url = 'https://api.mangadex.org'
@@ -99,9 +106,6 @@ class Mangadex(Server):
             self.session = requests.Session()
             self.session.headers.update({'user-agent': USER_AGENT})
 
-            retry = Retry(total=5, backoff_factor=1, respect_retry_after_header=False, status_forcelist=Retry.RETRY_AFTER_STATUS_CODES)
-            self.session.mount(self.api_base_url, HTTPAdapter(max_retries=retry))
-
     @staticmethod
     def get_group_name(group_id, groups_list):
         """Get group name from group id"""
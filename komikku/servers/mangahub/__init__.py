@@ -67,7 +67,7 @@ class Mangahub(Server):
         query = {
             'query': '{latestPopular(x:m01){id,rank,title,slug,image,latestChapter,unauthFile,updatedDate}manga(x:m01,slug:"%s"){id,rank,title,slug,status,image,latestChapter,author,artist,genres,description,alternativeTitle,mainSlug,isYaoi,isPorn,isSoftPorn,unauthFile,noCoverAd,isLicensed,createdDate,updatedDate,chapters{id,number,title,slug,date}}}' % initial_data['slug']
         }
-        r = self.session.post(
+        r = self.session_post(
             self.api_url,
             json=query,
             headers={
@@ -219,7 +219,7 @@ class Mangahub(Server):
                 'query': '{search(x:m01,q:"%s",limit:10){rows{id,title,slug,image,rank,latestChapter,createdDate}}}' % term
             }
 
-        r = self.session.post(self.api_url, json=query, headers={
+        r = self.session_post(self.api_url, json=query, headers={
             'Accept': 'application/json',
             'Content-Type': 'application/json',
             'Referer': self.base_url + '/',
@@ -39,7 +39,7 @@ class Mangainua(Server):
         """
         assert 'url' in initial_data, 'url is missing in initial data'
 
-        r = self.session.get(initial_data['url'])
+        r = self.session_get(initial_data['url'])
         if r.status_code != 200:
             return None
 
@@ -233,7 +233,7 @@ class Mangainua(Server):
         return results
 
     def search(self, term):
-        r = self.session.post(self.search_url, data={'do': 'search', 'subaction': 'search', 'titleonly': '3', 'story': term})
+        r = self.session_post(self.search_url, data={'do': 'search', 'subaction': 'search', 'titleonly': '3', 'story': term})
         if r.status_code != 200:
             return None
 
@@ -4,8 +4,6 @@
 
 from bs4 import BeautifulSoup
 import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util import Retry
 from urllib.parse import unquote_plus
 
 from komikku.servers import Server
@@ -19,6 +17,7 @@ class Ninemanga(Server):
     name = 'Nine Manga'
     lang = 'en'
     is_nsfw = True
+    retry_max_attempts = 4  # Failed requests are retried 3 times
 
     base_url = 'https://www.ninemanga.com'
     search_url = base_url + '/search/ajax/'
@@ -37,9 +36,6 @@ class Ninemanga(Server):
                 'Accept-Language': 'en-US,en;q=0.5',
             }
 
-            retry = Retry(total=3, backoff_factor=1, respect_retry_after_header=False, status_forcelist=Retry.RETRY_AFTER_STATUS_CODES)
-            self.session.mount(self.base_url, HTTPAdapter(max_retries=retry))
-
     @classmethod
     def get_manga_initial_data_from_url(cls, url):
         return dict(slug=url.split('?')[0].split('/')[-1].replace('.html', ''))
@@ -0,0 +1,147 @@
+# Copyright (C) 2019-2024 Valéry Febvre
+# SPDX-License-Identifier: GPL-3.0-only or GPL-3.0-or-later
+# Author: Valéry Febvre <vfebvre@easter-eggs.com>
+
+import threading
+import weakref
+
+from requests.adapters import DEFAULT_RETRIES
+from requests.adapters import HTTPAdapter
+
+POOL_BASE_SIZE = 4  # Connections kept alive per host for reader, explorer and card (see `ConnectionPools.reserve()`)
+POOL_MAX_HOSTS = 100  # Number of hosts whose connections are kept alive, least recently used ones are closed beyond
+
+
+class PooledAdapter(HTTPAdapter):
+    """
+    Transport adapter shared by sessions of all servers
+
+    Connections pools are keyed by host: sessions of the servers of a same host (multi-languages servers for ex.)
+    reuse the same keep-alive connections. Cookies and headers remain per session.
+
+    Pools used by adapter are recorded to report their metrics, closed ones included.
+    """
+
+    pools_lock = threading.Lock()
+
+    def __init__(self, *args, pools=None, **kwargs):
+        # Pools of a replaced adapter can be passed: their metrics are kept
+        self.pools = pools if pools is not None else set()
+
+        super().__init__(*args, **kwargs)
+
+    def close(self):
+        # Adapter is shared: closing a session must not close connections used by sessions of other servers
+        pass
+
+    def get_connection(self, *args, **kwargs):
+        # requests < 2.32.2
+        return self.record_pool(super().get_connection(*args, **kwargs))
+
+    def get_connection_with_tls_context(self, *args, **kwargs):
+        return self.record_pool(super().get_connection_with_tls_context(*args, **kwargs))
+
+    def record_pool(self, pool):
+        with self.pools_lock:
+            self.pools.add(pool)
+
+        return pool
+
+    @property
+    def stats(self):
+        """
+        Metrics of pools, keyed by host
+
+        A hit is a request sent over a kept alive connection, a miss is a new connection.
+        """
+        with self.pools_lock:
+            pools = list(self.pools)
+
+        stats = {}
+        for pool in pools:
+            values = stats.setdefault(get_pool_host(pool), dict(connections=0, requests=0))
+            values['connections'] += pool.num_connections
+            values['requests'] += pool.num_requests
+
+        return {
+            host: dict(
+                hits=max(0, values['requests'] - values['connections']),
+                misses=values['connections'],
+            )
+            for host, values in sorted(stats.items())
+        }
+
+
+class ConnectionPools:
+    """
+    Registry of connections pools, shared by sessions of all servers
+
+    Size of pools (max number of connections kept alive per host) matches concurrency of the components
+    sending requests: each one reserves the number of requests it can send concurrently to a same host.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.maxsize = POOL_BASE_SIZE
+        self.reservations = {}
+        self.sessions = weakref.WeakSet()
+
+        self.adapter = PooledAdapter(pool_connections=POOL_MAX_HOSTS, pool_maxsize=self.maxsize)
+
+    def mount(self, session):
+        """
+        Mounts shared adapter on a session
+
+        Only default adapters are replaced: custom adapters mounted by a server (TLS settings for ex.) are left untouched.
+        """
+        if getattr(session, 'adapters', None) is None:
+            return
+
+        with self.lock:
+            for prefix in ('https://', 'http://'):
+                adapter = session.adapters.get(prefix)
+                # An adapter of a session loaded from disk is a copy of shared adapter
+                if adapter is not self.adapter and (is_default_adapter(adapter) or isinstance(adapter, PooledAdapter)):
+                    session.mount(prefix, self.adapter)
+
+            self.sessions.add(session)
+
+    def reserve(self, name, concurrency):
+        """
+        Sets the number of requests a component (downloader, updater…) can send concurrently to a same host
+
+        Shared adapter is replaced by an adapter with pools of the new size. Its pools are closed once requests
+        in progress are completed.
+        """
+        with self.lock:
+            self.reservations[name] = concurrency
+
+            maxsize = POOL_BASE_SIZE + sum(self.reservations.values())
+            if maxsize == self.maxsize:
+                return
+
+            previous_adapter = self.adapter
+            self.adapter = PooledAdapter(pool_connections=POOL_MAX_HOSTS, pool_maxsize=maxsize, pools=previous_adapter.pools)
+            self.maxsize = maxsize
+
+            for session in list(self.sessions):
+                for prefix, adapter in list(session.adapters.items()):
+                    if adapter is previous_adapter:
+                        session.mount(prefix, self.adapter)
+
+    @property
+    def stats(self):
+        """Metrics of pools, keyed by host (see `PooledAdapter.stats`)"""
+        return self.adapter.stats
+
+
+def get_pool_host(pool):
+    return f'{pool.scheme}://{pool.host}' if pool.port in (None, 80, 443) else f'{pool.scheme}://{pool.host}:{pool.port}'
+
+
+def is_default_adapter(adapter):
+    """Returns True if adapter is the one mounted by default by `requests.Session` (no retries, no subclass)"""
+    return type(adapter) is HTTPAdapter and adapter.max_retries.total == DEFAULT_RETRIES
+
+
+connection_pools = ConnectionPools()
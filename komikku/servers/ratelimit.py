@@ -0,0 +1,160 @@
+# Copyright (C) 2019-2024 Valéry Febvre
+# SPDX-License-Identifier: GPL-3.0-only or GPL-3.0-or-later
+# Author: Valéry Febvre <vfebvre@easter-eggs.com>
+
+import datetime
+from email.utils import parsedate_to_datetime
+import threading
+import time
+
+RATE_LIMIT_BURST = 4  # Default number of requests that can be sent at once
+RATE_LIMIT_RATE = 2  # Default number of requests per second (sustained)
+RETRY_AFTER_MAX = 30  # in seconds, longer Retry-After delays are not waited
+
+
+class TokenBucket:
+    """
+    Token bucket rate limiter of a host
+
+    Depending on the amount of bandwidth a server has, we must be mindful not to overload it with our requests.
+    Furthermore, multiple and fast-paced requests from the same IP address can alert the system administrator
+    that potentially unwanted actions are taking place. This may result in an IP ban.
+
+    Bucket holds up to `burst` tokens and is refilled at `rate` tokens per second. Each request consumes a token.
+    When bucket is empty, tokens are reserved in advance: requests are spaced out at `rate` per second.
+    """
+
+    def __init__(self, rate=RATE_LIMIT_RATE, burst=RATE_LIMIT_BURST):
+        self.rate = rate
+        self.burst = burst
+
+        self.blocked_until = 0
+        self.lock = threading.Lock()
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+        # Metrics
+        self.nb_requests = 0
+        self.nb_retry_after = 0
+        self.nb_throttled = 0
+        self.wait_time = 0
+
+    def acquire(self):
+        """
+        Waits until a request can be sent
+
+        :return: waited time in seconds
+        :rtype: float
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+            delay = max(self.blocked_until - now, (1 - self.tokens) / self.rate if self.tokens < 1 else 0)
+            self.tokens -= 1
+
+            self.nb_requests += 1
+            if delay > 0:
+                self.nb_throttled += 1
+                self.wait_time += delay
+
+        if delay > 0:
+            time.sleep(delay)
+
+        return delay
+
+    def block(self, delay):
+        """Blocks requests for `delay` seconds (Retry-After)"""
+        with self.lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + delay)
+            self.tokens = min(self.tokens, 0)
+            self.nb_retry_after += 1
+
+    def configure(self, rate=None, burst=None):
+        with self.lock:
+            if rate is not None:
+                self.rate = rate
+            if burst is not None:
+                self.burst = burst
+                self.tokens = min(self.tokens, burst)
+
+    @property
+    def stats(self):
+        return dict(
+            rate=self.rate,
+            burst=self.burst,
+            requests=self.nb_requests,
+            throttled=self.nb_throttled,
+            wait_time=round(self.wait_time, 3),
+            retry_after=self.nb_retry_after,
+        )
+
+
+class RateLimiters:
+    """
+    Registry of rate limiters, keyed by host
+
+    All threads (downloader, updater, reader, explorer…) sending requests to a same host share the same limiter.
+    """
+
+    def __init__(self):
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def configure(self, host, rate=None, burst=None):
+        """Sets rate and/or burst of the limiter of a host"""
+        self.get(host, rate, burst).configure(rate, burst)
+
+    def get(self, host, rate=None, burst=None):
+        """
+        Returns the limiter of a host, created on first call
+
+        :param rate: rate used if limiter is created
+        :param burst: burst used if limiter is created
+        """
+        with self.lock:
+            bucket = self.buckets.get(host)
+            if bucket is None:
+                bucket = self.buckets[host] = TokenBucket(rate or RATE_LIMIT_RATE, burst or RATE_LIMIT_BURST)
+
+            return bucket
+
+    @property
+    def stats(self):
+        """Metrics of all limiters"""
+        with self.lock:
+            buckets = dict(self.buckets)
+
+        return {host: bucket.stats for host, bucket in sorted(buckets.items())}
+
+
+def get_retry_after_delay(response):
+    """
+    Returns delay (in seconds) requested by a `Retry-After` header of a 429 or 503 response
+
+    :return: delay or None if no delay is requested
+    """
+    if response.status_code not in (429, 503):
+        return None
+
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+
+    value = value.strip()
+    if value.isdigit():
+        return int(value)
+
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=datetime.timezone.utc)
+
+    return max(0, (date - datetime.datetime.now(datetime.timezone.utc)).total_seconds())
+
+
+rate_limiters = RateLimiters()
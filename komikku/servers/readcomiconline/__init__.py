@@ -177,9 +177,9 @@ class Readcomiconline(Server):
         results = []
 
         if orderby == 'populars':
-            r = self.session.get(self.most_populars_url)
+            r = self.session_get(self.most_populars_url)
         else:
-            r = self.session.get(self.latest_updates_url)
+            r = self.session_get(self.latest_updates_url)
         if r.status_code != 200:
             return None
 
@@ -214,7 +214,7 @@ class Readcomiconline(Server):
         return self.get_manga_list(orderby='populars')
 
     def search(self, term):
-        r = self.session.get(
+        r = self.session_get(
             self.search_url,
             params=dict(
                 comicName=term,
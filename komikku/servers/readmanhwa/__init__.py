@@ -57,7 +57,7 @@ class Readmanhwa(Server):
             self.filters[0]['default'] = Settings.get_default().nsfw_content
 
     def do_api_request(self, url):
-        resp = self.session.get(url, headers={'X-Requested-With': 'XMLHttpRequest'})
+        resp = self.session_get(url, headers={'X-Requested-With': 'XMLHttpRequest'})
         if get_buffer_mime_type(resp.content) != 'text/plain':
             raise ReadmanhwaException(resp.text)
 
@@ -0,0 +1,258 @@
+# Copyright (C) 2019-2024 Valéry Febvre
+# SPDX-License-Identifier: GPL-3.0-only or GPL-3.0-or-later
+# Author: Valéry Febvre <vfebvre@easter-eggs.com>
+
+import random
+import threading
+import time
+
+import requests
+
+from komikku.servers.exceptions import CfBypassError
+
+BREAKER_COOLDOWN = 60  # in seconds, delay before a trial request is allowed once breaker is open (doubled after each failed trial)
+BREAKER_FAILURE_THRESHOLD = 5  # number of consecutive failures which open a breaker
+BREAKER_MAX_COOLDOWN = 15 * 60  # in seconds
+
+RETRY_BASE_DELAY = 1  # in seconds, backoff delay of first retry (doubled at each retry)
+RETRY_MAX_ATTEMPTS = 3  # max number of attempts of a request
+RETRY_MAX_DELAY = 16  # in seconds, max backoff delay
+
+FAILURE_CF_CHALLENGE = 'cf-challenge'
+FAILURE_CONNECTION = 'connection'
+FAILURE_RATE_LIMITED = 'rate-limited'
+FAILURE_SERVER_ERROR = 'server-error'
+FAILURE_TIMEOUT = 'timeout'
+
+# Transient failures: a new attempt may succeed
+RETRYABLE_FAILURES = (FAILURE_CONNECTION, FAILURE_RATE_LIMITED, FAILURE_SERVER_ERROR, FAILURE_TIMEOUT)
+# Idempotent methods: requests can be safely sent again
+RETRYABLE_METHODS = ('get', 'head', 'options')
+
+# Event interrupting waits before retries of requests sent by current thread (see `set_retries_stop_event`)
+retries = threading.local()
+
+
+def classify_failure(error=None, response=None):
+    """
+    Classifies the failure of a request
+
+    :param error: raised exception
+    :param response: received response
+    :return: a FAILURE_* value or None if there is no failure (or failure isn't due to server: 404, unexpected error for ex.)
+    :rtype: str
+    """
+    if error is not None:
+        if isinstance(error, requests.exceptions.Timeout):
+            return FAILURE_TIMEOUT
+        if isinstance(error, CfBypassError):
+            return FAILURE_CF_CHALLENGE
+        if isinstance(error, requests.exceptions.RequestException):
+            return FAILURE_CONNECTION
+
+        return None
+
+    if response is not None:
+        if response.status_code == 429:
+            return FAILURE_RATE_LIMITED
+        if is_cf_challenge(response):
+            return FAILURE_CF_CHALLENGE
+        if response.status_code >= 500:
+            return FAILURE_SERVER_ERROR
+
+    return None
+
+
+def get_backoff_delay(attempt):
+    """
+    Returns delay to wait before a retry: exponential backoff with jitter
+
+    Jitter prevents retries of concurrent requests (pages of a chapter for ex.) from being sent at the same time.
+
+    :param attempt: number of the failed attempt (0 for the first one)
+    """
+    delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt)
+
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def set_retries_stop_event(event):
+    """
+    Makes waits before retries of requests sent by current thread interruptible
+
+    Once `event` is set (downloader or updater is being stopped), requests being retried are given up at once:
+    callers waiting for workers to stop (GTK main thread) are not blocked during backoff delays.
+    """
+    retries.stop_event = event
+
+
+def wait_before_retry(delay):
+    """
+    Waits before a retry
+
+    :param delay: delay in seconds
+    :return: False if wait has been interrupted (see `set_retries_stop_event`): request must not be retried
+    :rtype: bool
+    """
+    event = getattr(retries, 'stop_event', None)
+    if event is None:
+        time.sleep(delay)
+        return True
+
+    return not event.wait(delay)
+
+
+def is_cf_challenge(response):
+    """Returns True if response is a Cloudflare challenge page"""
+    if response.headers.get('cf-mitigated') == 'challenge':
+        return True
+
+    return response.status_code in (403, 503) and response.headers.get('Server', '').startswith('cloudflare')
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker of a server
+
+    After `BREAKER_FAILURE_THRESHOLD` consecutive failures, breaker opens: server is considered down and no request
+    is sent to it. Once cooldown has elapsed, breaker is half-open: a single trial request is allowed. If it succeeds,
+    breaker is closed, otherwise it's opened again with a doubled cooldown.
+    """
+
+    CLOSED = 'closed'
+    HALF_OPEN = 'half-open'
+    OPEN = 'open'
+
+    def __init__(self, name=None):
+        self.name = name
+
+        self.cooldown = BREAKER_COOLDOWN
+        self.last_failure = None
+        self.lock = threading.Lock()
+        self.nb_failures = 0
+        self.opened_until = 0
+        self.state = self.CLOSED
+
+        # Metrics
+        self.nb_rejected = 0
+        self.nb_trips = 0
+
+    def allow(self):
+        """
+        Returns True if a request can be sent
+
+        In half-open state, only the first caller is allowed (trial request).
+        """
+        with self.lock:
+            if self.state == self.OPEN and time.monotonic() >= self.opened_until:
+                self.state = self.HALF_OPEN
+                return True
+
+            if self.state == self.CLOSED:
+                return True
+
+            self.nb_rejected += 1
+            return False
+
+    @property
+    def is_open(self):
+        """True if requests are currently rejected"""
+        return self.retry_in > 0
+
+    def record_failure(self, failure):
+        with self.lock:
+            self.nb_failures += 1
+            self.last_failure = failure
+
+            if self.state == self.HALF_OPEN:
+                # Trial request failed
+                self.cooldown = min(self.cooldown * 2, BREAKER_MAX_COOLDOWN)
+            elif self.state == self.OPEN or self.nb_failures < BREAKER_FAILURE_THRESHOLD:
+                return
+            else:
+                self.cooldown = BREAKER_COOLDOWN
+
+            self.state = self.OPEN
+            self.opened_until = time.monotonic() + self.cooldown
+            self.nb_trips += 1
+
+    def release(self):
+        """Trial request ended without outcome (unexpected error): next request is a new trial"""
+        with self.lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.OPEN
+                self.opened_until = 0
+
+    def record_success(self):
+        with self.lock:
+            self.cooldown = BREAKER_COOLDOWN
+            self.nb_failures = 0
+            self.state = self.CLOSED
+
+    @property
+    def retry_in(self):
+        """Delay (in seconds) before a trial request is allowed, 0 if breaker is closed"""
+        with self.lock:
+            if self.state == self.CLOSED:
+                return 0
+            if self.state == self.HALF_OPEN:
+                # Trial request in progress
+                return 1
+
+            return max(0, self.opened_until - time.monotonic())
+
+    @property
+    def stats(self):
+        return dict(
+            state=self.state,
+            failures=self.nb_failures,
+            last_failure=self.last_failure,
+            retry_in=round(self.retry_in),
+            rejected=self.nb_rejected,
+            trips=self.nb_trips,
+        )
+
+
+class CircuitBreakers:
+    """
+    Registry of circuit breakers, keyed by server ID
+
+    Downloader, updater, reader and explorer share the breaker of a server.
+    """
+
+    def __init__(self):
+        self.breakers = {}
+        self.lock = threading.Lock()
+
+    def get(self, server_id, name=None):
+        """
+        Returns the breaker of a server, created on first call
+
+        :param name: name of server (displayed in UI)
+        """
+        with self.lock:
+            breaker = self.breakers.get(server_id)
+            if breaker is None:
+                breaker = self.breakers[server_id] = CircuitBreaker(name or server_id)
+            elif name:
+                breaker.name = name
+
+            return breaker
+
+    def get_open(self):
+        """Returns open breakers"""
+        with self.lock:
+            breakers = list(self.breakers.values())
+
+        return [breaker for breaker in breakers if breaker.is_open]
+
+    @property
+    def stats(self):
+        """Metrics of all breakers"""
+        with self.lock:
+            breakers = dict(self.breakers)
+
+        return {server_id: breaker.stats for server_id, breaker in sorted(breakers.items())}
+
+
+circuit_breakers = CircuitBreakers()
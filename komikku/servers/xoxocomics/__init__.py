@@ -176,7 +176,7 @@ class Xoxocomics(Server):
         """
         results = []
 
-        r = self.session.get(self.latest_updates_url)
+        r = self.session_get(self.latest_updates_url)
         if r.status_code != 200:
             return None
 
@@ -200,7 +200,7 @@ class Xoxocomics(Server):
         """
         results = []
 
-        r = self.session.get(self.most_populars_url)
+        r = self.session_get(self.most_populars_url)
         if r.status_code != 200:
             return None
 
@@ -225,7 +225,7 @@ class Xoxocomics(Server):
         results = []
         term = term.lower()
 
-        r = self.session.get(self.search_url, params=dict(keyword=term))
+        r = self.session_get(self.search_url, params=dict(keyword=term))
         if r.status_code != 200:
             return None
 
@@ -2,8 +2,10 @@
 # SPDX-License-Identifier: GPL-3.0-only or GPL-3.0-or-later
 # Author: Valéry Febvre <vfebvre@easter-eggs.com>
 
+import datetime
 from gettext import gettext as _
 from gettext import ngettext
+import logging
 import threading
 
 from gi.repository import Gio
@@ -11,188 +13,335 @@ from gi.repository import GLib
 from gi.repository import GObject
 
 from komikku.utils import log_error_traceback
-from komikku.models import create_db_connection
+from komikku.models import DownloadPriority
+from komikku.models import get_db_connection
 from komikku.models import Manga
 from komikku.models import Settings
+from komikku.servers.exceptions import ServerUnavailableError
+from komikku.servers.pool import connection_pools
+from komikku.servers.resilience import circuit_breakers
+from komikku.servers.resilience import set_retries_stop_event
+from komikku.servers.utils import get_server_main_id_by_id
 from komikku.utils import if_network_available
 
 
+logger = logging.getLogger(__name__)
+
+UPDATER_MAX_CONCURRENCY = 8  # max number of mangas updated concurrently (all servers)
+
+
 class Updater(GObject.GObject):
     """
     Mangas updater
+
+    Mangas are updated by a worker per server (language variants of a server share the same worker, they share the same host),
+    so that a slow server doesn't delay the others. Number of concurrent updates is capped globally by `UPDATER_MAX_CONCURRENCY`,
+    requests are further throttled per host by rate limiters (see `komikku.servers.ratelimit`).
     """
     __gsignals__ = {
         'manga-updated': (GObject.SignalFlags.RUN_FIRST, None, (GObject.TYPE_PYOBJECT, GObject.TYPE_PYOBJECT)),
     }
 
-    current_id = None
-    queue = []
     running = False
     stop_flag = False
     update_at_startup_done = False
     update_library_flag = False
 
-    def __init__(self, window):
+    def __init__(self, window, max_concurrency=UPDATER_MAX_CONCURRENCY):
         GObject.GObject.__init__(self)
 
         self.window = window
 
+        self.concurrency = threading.BoundedSemaphore(max_concurrency)
+        self.current_ids = set()
+        self.queue = {}  # mangas IDs by worker key, in FIFO order
+        self.stopped = threading.Event()
+        self.stopped.set()
+        # Interrupts requests of workers being retried (see `set_retries_stop_event`)
+        self.stop_event = threading.Event()
+        self.totals = None
+        self.workers = {}
+        self.workers_lock = threading.Lock()
+
+        # A worker per server: a single update at a time per host
+        connection_pools.reserve('updater', 1)
+
+    @staticmethod
+    def get_worker_key(server_id):
+        return get_server_main_id_by_id(server_id)
+
     def add(self, mangas):
         if not isinstance(mangas, list):
             mangas = [mangas, ]
         mangas.reverse()
 
-        for manga in mangas:
-            if manga.id not in self.queue and manga.id != self.current_id and manga.server.status == 'enabled':
-                self.queue.append(manga.id)
-
-    @if_network_available
-    def start(self):
-        def show_notification(id, title, body=None):
-            if Settings.get_default().desktop_notifications:
-                notification = Gio.Notification.new(title)
-                notification.set_priority(Gio.NotificationPriority.HIGH)
-                if body:
-                    notification.set_body(body)
-                self.window.application.send_notification(id, notification)
-            else:
-                # Use in-app notification
-                self.window.show_notification(f'{title}\n{body}' if body else title)
+        with self.workers_lock:
+            for manga in mangas:
+                if manga.id in self.current_ids or manga.server.status != 'enabled':
+                    continue
 
-        def run():
-            total_chapters = 0
-            total_errors = 0
-            total_successes = 0
+                queue = self.queue.setdefault(self.get_worker_key(manga.server_id), [])
+                if manga.id not in queue:
+                    queue.append(manga.id)
 
-            while self.queue:
-                if self.stop_flag is True:
-                    break
+    def dispatch(self):
+        """
+        Starts a worker for each server with queued mangas and no running worker
 
-                manga_id = self.queue.pop(0)
-                manga = Manga.get(manga_id)
-                if manga is None:
+        A worker stops once its server has no more queued mangas, without waiting for other servers.
+        """
+        with self.workers_lock:
+            for key in self.queue:
+                if key in self.workers:
                     continue
 
-                self.current_id = manga_id
-                try:
-                    status, recent_chapters_ids, nb_deleted_chapters, synced = manga.update_full()
-                    if status is True:
-                        total_successes += 1
-                        nb_chapters = len(recent_chapters_ids)
-                        if nb_chapters > 0:
-                            total_chapters += nb_chapters
-                        GLib.idle_add(complete, manga, recent_chapters_ids, nb_deleted_chapters, synced)
-                    else:
-                        total_errors += 1
-                        GLib.idle_add(error, manga)
-                except Exception as e:
-                    user_error_message = log_error_traceback(e)
-                    total_errors += 1
-                    GLib.idle_add(error, manga, user_error_message)
-
-            self.current_id = None
-            self.running = False
-
-            if not self.update_library_flag and total_successes + total_errors == 1:
-                # If only one comic has been updated, it's not necessary to send end notification
-                return
-
-            # End notification
-            if self.update_library_flag:
-                self.update_library_flag = False
-                if total_errors > 0:
-                    title = _('Library update completed with errors')
-                else:
-                    title = _('Library update completed')
-            else:
-                if total_errors > 0:
-                    title = _('Update completed with errors')
-                else:
-                    title = _('Update completed')
-
-            messages = []
-            if total_chapters > 0:
-                messages.append(ngettext('{0} successful update', '{0} successful updates', total_successes).format(total_successes))
-                messages.append(ngettext('{0} new chapter', '{0} new chapters', total_chapters).format(total_chapters))
-            else:
-                messages.append(_('No new chapters'))
+                thread = threading.Thread(target=self.run_worker, args=(key,))
+                thread.daemon = True
+                self.workers[key] = thread
+                thread.start()
 
-            if total_errors > 0:
-                messages.append(ngettext('{0} update failed', '{0} updates failed', total_errors).format(total_errors))
+            if not self.workers:
+                self.on_workers_ended()
 
-            GLib.timeout_add(2000, show_notification, 'updater.0', title, '\n'.join(messages))
+    def get_next_manga_id(self, key):
+        # Must be called with workers lock acquired
+        queue = self.queue.get(key)
+        if not queue:
+            self.queue.pop(key, None)
+            return None
 
-        def complete(manga, recent_chapters_ids, nb_deleted_chapters, synced):
-            nb_recent_chapters = len(recent_chapters_ids)
+        return queue.pop(0)
 
-            if nb_recent_chapters > 0:
-                show_notification(
-                    f'updater.{manga.id}',
-                    manga.name,
-                    ngettext('{0} new chapter', '{0} new chapters', nb_recent_chapters).format(nb_recent_chapters)
-                )
+    def notify_update_error(self, manga, message=None):
+        self.show_notification(
+            f'updater.{manga.id}',
+            manga.name,
+            message or _('Oops, update has failed. Please try again.')
+        )
 
-                # Auto download new chapters
-                if Settings.get_default().new_chapters_auto_download:
-                    self.window.downloader.add(recent_chapters_ids, emit_signal=True)
-                    self.window.downloader.start()
-            else:
-                show_notification(f'updater.{manga.id}', manga.name, _('No new chapters'))
-
-            self.emit(
-                'manga-updated',
-                manga,
-                dict(
-                    nb_deleted_chapters=nb_recent_chapters,
-                    nb_recent_chapters=nb_recent_chapters,
-                    synced=synced,
-                )
-            )
+        return False
 
-            return False
+    def notify_update_success(self, manga, recent_chapters_ids, nb_deleted_chapters, synced):
+        nb_recent_chapters = len(recent_chapters_ids)
 
-        def error(manga, message=None):
-            show_notification(
+        if nb_recent_chapters > 0:
+            self.show_notification(
                 f'updater.{manga.id}',
                 manga.name,
-                message or _('Oops, update has failed. Please try again.')
+                ngettext('{0} new chapter', '{0} new chapters', nb_recent_chapters).format(nb_recent_chapters)
             )
 
+            # Auto download new chapters
+            if Settings.get_default().new_chapters_auto_download:
+                self.window.downloader.add(recent_chapters_ids, emit_signal=True, priority=DownloadPriority.AUTO)
+                self.window.downloader.start()
+        else:
+            self.show_notification(f'updater.{manga.id}', manga.name, _('No new chapters'))
+
+        self.emit(
+            'manga-updated',
+            manga,
+            dict(
+                nb_deleted_chapters=nb_deleted_chapters,
+                nb_recent_chapters=nb_recent_chapters,
+                synced=synced,
+            )
+        )
+
+        return False
+
+    def notify_updates_ended(self, totals, update_library):
+        if not update_library and totals['successes'] + totals['errors'] == 1:
+            # If only one comic has been updated, it's not necessary to send end notification
             return False
 
-        if self.running or len(self.queue) == 0:
-            return
+        if update_library:
+            if totals['errors'] > 0:
+                title = _('Library update completed with errors')
+            else:
+                title = _('Library update completed')
+        else:
+            if totals['errors'] > 0:
+                title = _('Update completed with errors')
+            else:
+                title = _('Update completed')
+
+        messages = []
+        if totals['chapters'] > 0:
+            messages.append(ngettext('{0} successful update', '{0} successful updates', totals['successes']).format(totals['successes']))
+            messages.append(ngettext('{0} new chapter', '{0} new chapters', totals['chapters']).format(totals['chapters']))
+        else:
+            messages.append(_('No new chapters'))
+
+        if totals['errors'] > 0:
+            messages.append(ngettext('{0} update failed', '{0} updates failed', totals['errors']).format(totals['errors']))
+
+        GLib.timeout_add(2000, self.show_notification, 'updater.0', title, '\n'.join(messages))
 
-        if self.update_library_flag:
-            title = _('Library update started')
-            show_notification('updater.0', title)
+        return False
 
-        self.running = True
-        self.stop_flag = False
+    def on_workers_ended(self):
+        # Must be called with workers lock acquired
+        totals = self.totals
+        update_library = self.update_library_flag
 
-        thread = threading.Thread(target=run)
-        thread.daemon = True
-        thread.start()
+        # Unchanged: updates short-circuited because data didn't change since previous update (see `Manga.update_full`)
+        logger.info('{0} ended: {1} successes ({2} unchanged), {3} errors, {4} new chapters'.format(
+            'Library update' if update_library else 'Update',
+            totals['successes'], totals['unchanged'], totals['errors'], totals['chapters']
+        ))
+
+        self.update_library_flag = False
+        self.running = False
+        self.stopped.set()
+
+        GLib.idle_add(self.notify_updates_ended, totals, update_library)
 
     def remove(self, manga):
-        if manga.id in self.queue:
-            self.queue.remove(manga.id)
+        with self.workers_lock:
+            queue = self.queue.get(self.get_worker_key(manga.server_id))
+            if queue and manga.id in queue:
+                queue.remove(manga.id)
+
+    def run_worker(self, key):
+        """Updates queued mangas of a server until there are no more or updater is stopped"""
+        set_retries_stop_event(self.stop_event)
+
+        while True:
+            with self.workers_lock:
+                manga_id = self.get_next_manga_id(key) if not self.stop_flag else None
+                if manga_id is None:
+                    del self.workers[key]
+                    if not self.workers:
+                        self.on_workers_ended()
+                    return
+
+            # A slot is acquired for each manga (not for the whole queue of server),
+            # so that workers of all servers progress even when there are more servers than slots
+            with self.concurrency:
+                if self.stop_flag:
+                    continue
+
+                self.current_ids.add(manga_id)
+                try:
+                    self.update_manga(manga_id)
+                finally:
+                    self.current_ids.discard(manga_id)
+
+    def show_notification(self, id, title, body=None):
+        if Settings.get_default().desktop_notifications:
+            notification = Gio.Notification.new(title)
+            notification.set_priority(Gio.NotificationPriority.HIGH)
+            if body:
+                notification.set_body(body)
+            self.window.application.send_notification(id, notification)
+        else:
+            # Use in-app notification
+            self.window.show_notification(f'{title}\n{body}' if body else title)
+
+        return False
+
+    @if_network_available
+    def start(self):
+        """
+        Starts workers of queued mangas
+
+        :return: True if update has been started (`notify_updates_ended()` is called once it ends), False otherwise
+        """
+        with self.workers_lock:
+            if not self.running:
+                if not self.queue:
+                    return False
+
+                self.running = True
+                self.stop_flag = False
+                self.stop_event.clear()
+                self.stopped.clear()
+                self.totals = dict(chapters=0, errors=0, successes=0, unchanged=0)
+
+                if self.update_library_flag:
+                    self.show_notification('updater.0', _('Library update started'))
+
+        # When already running, mangas of new servers are picked up immediately
+        self.dispatch()
+
+        return True
 
     def stop(self):
         if self.running:
             self.stop_flag = True
+            self.stop_event.set()
+
+    def update_manga(self, manga_id):
+        manga = Manga.get(manga_id)
+        if manga is None:
+            return
+
+        if circuit_breakers.get(manga.server_id).is_open:
+            # Server is considered down (too many failures)
+            self.update_totals(errors=1)
+            GLib.idle_add(self.notify_update_error, manga, ServerUnavailableError().message)
+            return
+
+        try:
+            status, recent_chapters_ids, nb_deleted_chapters, synced, unchanged = manga.update_full()
+            if status is True:
+                self.update_totals(successes=1, chapters=len(recent_chapters_ids), unchanged=int(unchanged))
+                GLib.idle_add(self.notify_update_success, manga, recent_chapters_ids, nb_deleted_chapters, synced)
+            else:
+                self.update_totals(errors=1)
+                GLib.idle_add(self.notify_update_error, manga)
+        except Exception as e:
+            user_error_message = log_error_traceback(e)
+            self.update_totals(errors=1)
+            GLib.idle_add(self.notify_update_error, manga, user_error_message)
 
     @if_network_available
-    def update_library(self, startup=False):
-        self.update_library_flag = True
+    def update_library(self, startup=False, forced=False):
+        """
+        Updates library mangas which are due for update
+
+        Each manga is scheduled according to its release cadence (see `Manga.get_next_update()`),
+        mangas unlikely to have new chapters are deferred.
+
+        :param forced: update all mangas regardless of schedule
+        :return: True if mangas have been queued and update has been started, False otherwise
+        """
         if startup:
             self.update_at_startup_done = True
 
-        db_conn = create_db_connection()
-        rows = db_conn.execute('SELECT * FROM mangas WHERE in_library = 1 ORDER BY last_read DESC').fetchall()
-        db_conn.close()
+        db_conn = get_db_connection()
+        if forced:
+            rows = db_conn.execute('SELECT id FROM mangas WHERE in_library = 1 ORDER BY last_read DESC').fetchall()
+        else:
+            rows = db_conn.execute(
+                'SELECT id FROM mangas WHERE in_library = 1 AND (next_update IS NULL OR next_update <= ?) ORDER BY last_read DESC',
+                (datetime.datetime.utcnow(),)
+            ).fetchall()
+            nb_deferred = db_conn.execute('SELECT count(*) FROM mangas WHERE in_library = 1').fetchone()[0] - len(rows)
+            logger.info(f'Library update: {len(rows)} due, {nb_deferred} deferred')
+
+        if not rows:
+            if not startup:
+                self.show_notification('updater.0', _('Library is up to date'), _('No comics are due for update'))
+            return False
 
+        self.update_library_flag = True
         for row in rows:
             self.add(Manga.get(row['id']))
 
-        self.start()
+        # None if offline (see `if_network_available`)
+        return self.start() is True
+
+    def update_totals(self, **values):
+        with self.workers_lock:
+            for name, value in values.items():
+                self.totals[name] += value
+
+    def wait_stopped(self, timeout=None):
+        """
+        Blocks until current update is stopped
+
+        :return: False if timeout expired, True otherwise
+        """
+        return self.stopped.wait(timeout)
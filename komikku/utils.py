@@ -2,6 +2,7 @@
 # SPDX-License-Identifier: GPL-3.0-only or GPL-3.0-or-later
 # Author: Valéry Febvre <vfebvre@easter-eggs.com>
 
+import fcntl
 from functools import cache
 from functools import wraps
 from gettext import gettext as _
@@ -34,6 +35,8 @@ COVER_HEIGHT = 256
 
 logger = logging.getLogger('komikku')
 
+data_dir_lock_fd = None
+
 
 def check_cmdline_tool(cmd):
     try:
@@ -92,12 +95,21 @@ def expand_and_resize_cover(buffer):
 
 
 def folder_size(path):
+    """Returns human readable size of a folder (computed with `os.scandir`, no `du` subprocess)"""
     if not os.path.exists(path):
         return 0
 
-    res = subprocess.run(['du', '-sh', path], stdout=subprocess.PIPE, check=False)
+    def get_size(dir_path):
+        size = 0
+        for entry in os.scandir(dir_path):
+            if entry.is_dir(follow_symlinks=False):
+                size += get_size(entry.path)
+            else:
+                size += entry.stat(follow_symlinks=False).st_size
+
+        return size
 
-    return res.stdout.split()[0].decode()
+    return GLib.format_size(get_size(path))
 
 
 @cache
@@ -184,6 +196,31 @@ def is_flatpak():
     return os.path.exists(os.path.join(GLib.get_user_runtime_dir(), 'flatpak-info'))
 
 
+def lock_data_dir():
+    """
+    Takes an exclusive lock on data folder, held until process exits
+
+    Graphical and headless applications share database, downloads queue and chapters files: they must not run concurrently.
+
+    :return: True if lock is taken, False if it's held by another process
+    """
+    global data_dir_lock_fd
+
+    if data_dir_lock_fd is not None:
+        return True
+
+    fd = os.open(os.path.join(get_data_dir(), '.lock'), os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        os.close(fd)
+        return False
+
+    data_dir_lock_fd = fd
+
+    return True
+
+
 def log_error_traceback(e):
     from komikku.servers.exceptions import ServerException
 
@@ -0,0 +1,99 @@
+"""
+Database connections churn benchmark
+
+Simulates a library loading (mangas + badges counters) on a synthetic library and compares:
+- legacy: a new connection is opened and closed for every query
+- pool: queries are run on the long-lived connection of the thread (`get_db_connection`)
+
+Usage:
+
+    python3 tests/benchmarks/db_connections.py --mangas 600 --chapters 100
+"""
+
+import argparse
+import datetime
+
+from utils import temporary_database
+from utils import Timer
+
+from komikku.models import database
+
+
+def populate(nb_mangas, nb_chapters):
+    db_conn = database.create_db_connection()
+    now = datetime.datetime.utcnow()
+    today = datetime.date.today()
+
+    with db_conn:
+        for manga_index in range(nb_mangas):
+            manga_id = db_conn.execute(
+                'INSERT INTO mangas (slug, server_id, in_library, name, last_read) VALUES (?, ?, 1, ?, ?)',
+                (f'manga-{manga_index}', 'benchmark', f'Manga {manga_index}', now)
+            ).lastrowid
+            db_conn.executemany(
+                'INSERT INTO chapters (manga_id, slug, title, date, rank, downloaded, recent, read) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                [
+                    (manga_id, f'chapter-{index}', f'Chapter {index}', today, index, index % 7 == 0, index % 11 == 0, index % 2)
+                    for index in range(nb_chapters)
+                ]
+            )
+
+    db_conn.close()
+
+
+def run_legacy(manga_ids):
+    for manga_id in manga_ids:
+        for sql in (
+            'SELECT * FROM mangas WHERE id = ?',
+            'SELECT count() AS unread FROM chapters WHERE manga_id = ? AND read = 0',
+            'SELECT count() AS downloaded FROM chapters WHERE manga_id = ? AND downloaded = 1 and read = 0',
+            'SELECT count() AS recents FROM chapters WHERE manga_id = ? AND recent = 1',
+        ):
+            db_conn = database.create_db_connection()
+            db_conn.execute(sql, (manga_id,)).fetchone()
+            db_conn.close()
+
+
+def run_pool(manga_ids):
+    for manga_id in manga_ids:
+        manga = database.Manga.get(manga_id)
+        manga.nb_unread_chapters
+        manga.nb_downloaded_chapters
+        manga.nb_recent_chapters
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Database connections churn benchmark')
+    parser.add_argument('--mangas', type=int, default=600, help='number of mangas in library')
+    parser.add_argument('--chapters', type=int, default=100, help='number of chapters per manga')
+    args = parser.parse_args()
+
+    # Count connections opened by `create_db_connection`
+    counter = dict(connections=0)
+    create_db_connection = database.create_db_connection
+
+    def counting_create_db_connection(*args, **kwargs):
+        counter['connections'] += 1
+        return create_db_connection(*args, **kwargs)
+
+    with temporary_database():
+        populate(args.mangas, args.chapters)
+
+        manga_ids = [row['id'] for row in database.get_db_connection().execute('SELECT id FROM mangas').fetchall()]
+        database.close_db_connections()
+
+        database.create_db_connection = counting_create_db_connection
+        for name, func in (('legacy', run_legacy), ('pool', run_pool)):
+            counter['connections'] = 0
+            with Timer() as timer:
+                func(manga_ids)
+
+            print(f'{name:>8}: {counter["connections"]:>6} connections opened, {timer.elapsed:.3f}s')
+
+        print(f'    pool: {database.db_pool.stats}')
+
+        database.create_db_connection = create_db_connection
+
+
+if __name__ == '__main__':
+    main()
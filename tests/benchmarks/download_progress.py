@@ -0,0 +1,128 @@
+"""
+Download progress benchmark
+
+Simulates the download of a chapter (pages are completed by a worker thread) while a GLib main loop runs, and compares:
+- legacy: progress is persisted and notified for every page
+- batched: progress is kept in memory, persisted by batches and notifications are coalesced (`DownloadProgress`)
+
+Main loop latency is measured by a probe timeout: lateness of each of its ticks is recorded.
+
+Usage:
+
+    python3 tests/benchmarks/download_progress.py --pages 200 --page-delay 0.005 --ui-cost 0.004
+"""
+
+import argparse
+import datetime
+import statistics
+import threading
+import time
+
+from gi.repository import GLib
+
+from utils import StatementsCounter
+from utils import temporary_database
+from utils import Timer
+
+from komikku.downloader import DownloadProgress
+from komikku.models import database
+
+PROBE_INTERVAL = 5  # in milliseconds
+
+
+def populate():
+    db_conn = database.get_db_connection()
+    with db_conn:
+        manga_id = db_conn.execute(
+            'INSERT INTO mangas (slug, server_id, in_library, name) VALUES (?, ?, 1, ?)', ('manga', 'benchmark', 'Manga')
+        ).lastrowid
+        chapter_id = db_conn.execute(
+            'INSERT INTO chapters (manga_id, slug, title, rank, downloaded, recent, read) VALUES (?, ?, ?, 0, 0, 0, 0)',
+            (manga_id, 'chapter', 'Chapter')
+        ).lastrowid
+        download_id = db_conn.execute(
+            'INSERT INTO downloads (chapter_id, status, percent, errors, date) VALUES (?, ?, ?, ?, ?)',
+            (chapter_id, 'downloading', 0, 0, datetime.datetime.utcnow())
+        ).lastrowid
+
+    return download_id
+
+
+def run(name, download_id, nb_pages, page_delay, ui_cost):
+    loop = GLib.MainLoop()
+    latencies = []
+    results = dict(notifications=0, statements=0)
+
+    def notify(_download, _success_counter, _error_counter):
+        # Simulates the work done by UI on `download-changed` signal (rows and progress bars updates)
+        results['notifications'] += 1
+        end = time.perf_counter() + ui_cost
+        while time.perf_counter() < end:
+            pass
+
+        return False
+
+    def probe(expected):
+        now = time.perf_counter()
+        latencies.append(max(0, now - expected))
+        GLib.timeout_add(PROBE_INTERVAL, probe, now + PROBE_INTERVAL / 1000)
+
+        return False
+
+    def worker():
+        download = database.Download.get(download_id)
+
+        with StatementsCounter(database.get_db_connection()) as counter:
+            if name == 'legacy':
+                for index in range(nb_pages):
+                    time.sleep(page_delay)
+                    download.update(dict(percent=(index + 1) * 100 / nb_pages))
+                    GLib.idle_add(notify, download, index + 1, 0)
+            else:
+                progress = DownloadProgress(download, nb_pages, notify)
+                for _index in range(nb_pages):
+                    time.sleep(page_delay)
+                    progress.add(True)
+                progress.cancel_notification()
+                progress.flush(status='pending')
+
+        results['statements'] = counter.count
+        database.close_db_connections()
+
+        # Queued notifications are processed before loop is stopped
+        GLib.idle_add(loop.quit)
+
+    GLib.timeout_add(PROBE_INTERVAL, probe, time.perf_counter() + PROBE_INTERVAL / 1000)
+
+    with Timer() as timer:
+        thread = threading.Thread(target=worker)
+        thread.start()
+        loop.run()
+        thread.join()
+
+    latencies.sort()
+    print(
+        f'{name:>8}: {nb_pages / timer.elapsed:7.1f} pages/s, {results["statements"]:>5} statements, '
+        f'{results["notifications"]:>4} notifications, main loop latency '
+        f'{statistics.mean(latencies) * 1000:.2f}ms (mean) {latencies[int(len(latencies) * 0.95)] * 1000:.2f}ms (p95) '
+        f'{latencies[-1] * 1000:.2f}ms (max)'
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Download progress benchmark')
+    parser.add_argument('--pages', type=int, default=200, help='number of pages of chapter')
+    parser.add_argument('--page-delay', type=float, default=0.005, help='delay between two pages completions (in seconds)')
+    parser.add_argument('--ui-cost', type=float, default=0.004, help='duration of UI work of a notification (in seconds)')
+    args = parser.parse_args()
+
+    with temporary_database():
+        download_id = populate()
+        database.close_db_connections()
+
+        for name in ('legacy', 'batched'):
+            run(name, download_id, args.pages, args.page_delay, args.ui_cost)
+
+
+if __name__ == '__main__':
+    main()
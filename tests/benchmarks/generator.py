@@ -0,0 +1,145 @@
+"""
+Synthetic library generator
+
+Fills a database (created by `init_db`) with a large synthetic library: mangas spread over several servers, their
+chapters (a mix of read, downloaded and recent ones), categories and a downloads backlog.
+
+Usage (generates a standalone komikku.db):
+
+    python3 tests/benchmarks/generator.py --mangas 2000 --chapters 500 --output /tmp/komikku.db
+"""
+
+import argparse
+import datetime
+import os
+import random
+import sqlite3
+import sys
+
+from utils import temporary_database
+from utils import Timer
+
+from komikku.models import database
+
+SERVERS_IDS = [f'server{index}' for index in range(30)]
+
+
+def generate_library(db_conn, nb_mangas=1000, nb_chapters=200, nb_categories=10, nb_downloads=1000, seed=0):
+    """
+    Generates a synthetic library
+
+    :param db_conn: connection to a database initialized by `init_db`
+    :param nb_mangas: number of mangas (3/4 are in library)
+    :param nb_chapters: number of chapters per manga (mean value)
+    :param nb_categories: number of categories
+    :param nb_downloads: number of pending downloads
+    :param seed: random seed, same seed and sizes produce same library
+    :return: number of rows inserted per table
+    :rtype: dict
+    """
+    rand = random.Random(seed)
+    now = datetime.datetime.utcnow()
+    today = datetime.date.today()
+
+    def get_chapters_rows(manga_id):
+        nb = max(1, int(rand.gauss(nb_chapters, nb_chapters / 4)))
+        nb_read = rand.randint(0, nb)
+        nb_recent = rand.choice((0, 0, 0, 1, 2, 5))
+
+        for rank in range(nb):
+            title = f'Chapter {rank + 1}' if rank % 25 else f'Vol. {rank // 25 + 1} Extra'
+            read = rank < nb_read
+            yield (
+                manga_id,
+                f'manga-{manga_id}-chapter-{rank}',
+                title,
+                ['Team A', 'Team B'] if rank % 3 == 0 else None,
+                today - datetime.timedelta(days=7 * (nb - rank)),
+                rank,
+                int(rank % 9 == 0),
+                int(rank >= nb - nb_recent),
+                int(read),
+                now - datetime.timedelta(days=rand.randint(0, 365), seconds=rand.randint(0, 86400)) if read else None,
+                database.get_natsort_key(title),
+            )
+
+    def get_chapters_rows_all():
+        for manga_id in range(1, nb_mangas + 1):
+            yield from get_chapters_rows(manga_id)
+
+    with db_conn:
+        db_conn.executemany(
+            """INSERT INTO mangas (id, slug, url, server_id, in_library, name, authors, genres, synopsis, status, last_read, last_update)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            (
+                (
+                    manga_id, f'manga-{manga_id}', f'/manga/{manga_id}', rand.choice(SERVERS_IDS), int(manga_id % 4 != 0),
+                    f'Manga {manga_id}', ['Author'], rand.sample(['Action', 'Comedy', 'Drama', 'Fantasy', 'Romance'], 2),
+                    'Synopsis ' * 50, rand.choice(['ongoing', 'complete', None]),
+                    now - datetime.timedelta(hours=rand.randint(0, 24 * 365)), now - datetime.timedelta(days=rand.randint(0, 365)),
+                )
+                for manga_id in range(1, nb_mangas + 1)
+            )
+        )
+
+        db_conn.executemany(
+            """INSERT INTO chapters (manga_id, slug, title, scanlators, date, rank, downloaded, recent, read, last_read, natsort_key)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            get_chapters_rows_all()
+        )
+
+        db_conn.executemany(
+            'INSERT INTO categories (id, label) VALUES (?, ?)',
+            ((category_id, f'Category {category_id}') for category_id in range(1, nb_categories + 1))
+        )
+        if nb_categories:
+            db_conn.executemany(
+                'INSERT INTO categories_mangas_association (category_id, manga_id) VALUES (?, ?)',
+                ((rand.randint(1, nb_categories), manga_id) for manga_id in range(1, nb_mangas + 1) if manga_id % 3 == 0)
+            )
+
+        # Backlog of pending downloads: not downloaded chapters of a few mangas
+        rows = db_conn.execute('SELECT id FROM chapters WHERE downloaded = 0 ORDER BY manga_id DESC, rank ASC LIMIT ?', (nb_downloads,))
+        db_conn.executemany(
+            'INSERT INTO downloads (chapter_id, status, percent, errors, date) VALUES (?, ?, ?, ?, ?)',
+            (
+                (row[0], 'error' if index % 50 == 49 else 'pending', 0, 0, now + datetime.timedelta(seconds=index))
+                for index, row in enumerate(rows.fetchall())
+            )
+        )
+
+    return {
+        table: db_conn.execute(f'SELECT count(*) FROM {table}').fetchone()[0]
+        for table in ('mangas', 'chapters', 'categories', 'downloads')
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Synthetic library generator')
+    parser.add_argument('--mangas', type=int, default=1000, help='number of mangas')
+    parser.add_argument('--chapters', type=int, default=200, help='mean number of chapters per manga')
+    parser.add_argument('--categories', type=int, default=10, help='number of categories')
+    parser.add_argument('--downloads', type=int, default=1000, help='number of pending downloads')
+    parser.add_argument('--seed', type=int, default=0, help='random seed')
+    parser.add_argument('--output', required=True, help='path of generated database')
+    args = parser.parse_args()
+
+    if os.path.exists(args.output):
+        sys.exit(f'{args.output} already exists')
+
+    with temporary_database():
+        db_conn = database.get_db_connection()
+
+        with Timer() as timer:
+            counts = generate_library(db_conn, args.mangas, args.chapters, args.categories, args.downloads, args.seed)
+
+        # Copy generated database (tables, indexes and user version) to output path
+        output_conn = sqlite3.connect(args.output)
+        db_conn.backup(output_conn)
+        output_conn.close()
+
+    print(', '.join(f'{count} {table}' for table, count in counts.items()) + f' generated in {timer.elapsed:.1f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,244 @@
+"""
+Database benchmark suite
+
+Times the real code paths of `komikku.models` on a large synthetic library (see `generator.py`)
+and writes results as JSON, so that regressions can be tracked across releases.
+
+Usage:
+
+    python3 tests/benchmarks/suite.py --mangas 2000 --chapters 500 --output results.json
+
+OR on a previously generated database (it's copied, never modified):
+
+    python3 tests/benchmarks/suite.py --db /tmp/komikku.db
+"""
+
+import argparse
+import datetime
+import json
+import logging
+import platform
+import random
+import sqlite3
+import statistics
+
+from generator import generate_library
+from update_full import FakeServer
+from update_full import get_chapters
+from update_full import get_updated_chapters
+from utils import StatementsCounter
+from utils import temporary_database
+from utils import Timer
+
+from komikku.models import database
+
+BENCHMARKS = []
+
+
+def benchmark(func):
+    """Registers a benchmark: a generator which yields once setup is done and returns when timed part is done"""
+    BENCHMARKS.append(func)
+    return func
+
+
+@benchmark
+def manga_get(context):
+    ids = context['mangas_ids']
+    yield
+    for id_ in ids:
+        database.Manga.get(id_)
+
+
+@benchmark
+def manga_chapters(context):
+    mangas = [database.Manga.get(id_) for id_ in context['mangas_ids']]
+    yield
+    for manga in mangas:
+        manga.chapters
+
+
+@benchmark
+def manga_update_full(context):
+    chapters = get_chapters(context['update_chapters'])
+    manga = database.Manga.new(
+        dict(slug=f'manga-update-{random.random()}', server_id='benchmark', name='Manga update', chapters=chapters, cover=None),
+        FakeServer(chapters), False
+    )
+    manga = database.Manga.get(manga.id, FakeServer(get_updated_chapters(chapters)))
+    yield
+    manga.update_full()
+
+
+@benchmark
+def history(context):
+    # Same queries as `HistoryPage.populate()`
+    start = (datetime.date.today() - datetime.timedelta(days=90)).strftime('%Y-%m-%d')
+    yield
+    cursor = database.get_db_connection().execute(
+        database.Chapter.get_select_sql(database.Chapter.LIST_COLUMNS) + ' WHERE last_read >= ? ORDER BY last_read DESC', (start,)
+    )
+    keys = database.Chapter.get_row_keys(cursor)
+    current_manga_id = None
+    for row in cursor.fetchall():
+        chapter = database.Chapter(row, keys=keys)
+        if current_manga_id and chapter.manga_id == current_manga_id:
+            continue
+
+        current_manga_id = chapter.manga.id
+
+
+@benchmark
+def library_badges(context):
+    # Same queries as `LibraryPage.populate()`
+    database.chapters_counters.invalidate()
+    yield
+    database.chapters_counters.load()
+    cursor = database.get_db_connection().execute(
+        database.Manga.get_select_sql(database.Manga.LIST_COLUMNS) + ' WHERE in_library = 1 ORDER BY last_read DESC'
+    )
+    keys = database.Manga.get_row_keys(cursor)
+    for row in cursor.fetchall():
+        manga = database.Manga(row=row, keys=keys)
+        manga.nb_unread_chapters
+        manga.nb_downloaded_chapters
+        manga.nb_recent_chapters
+
+
+@benchmark
+def downloader_queue(context):
+    # Same queries as `Downloader.dispatch()` and `Downloader.get_next_download()`
+    yield
+    db_conn = database.get_db_connection()
+    rows = db_conn.execute(
+        """
+        SELECT DISTINCT m.server_id FROM downloads d
+        JOIN chapters c ON d.chapter_id = c.id
+        JOIN mangas m ON c.manga_id = m.id
+        WHERE d.status = 'pending'
+        """
+    ).fetchall()
+    for row in rows:
+        row = db_conn.execute(
+            """
+            SELECT d.id FROM downloads d
+            JOIN chapters c ON d.chapter_id = c.id
+            JOIN mangas m ON c.manga_id = m.id
+            WHERE m.server_id = ? AND d.status = 'pending'
+            ORDER BY d.priority DESC, d.id ASC LIMIT 1
+            """,
+            (row['server_id'],)
+        ).fetchone()
+        download = database.Download.get(row['id'])
+        download.chapter.manga.server_id
+
+
+@benchmark
+def downloads_new_many(context):
+    # Same queries as `Downloader.add()` (bulk enqueue of many series, some chapters are already queued)
+    with database.db_transaction() as db_conn:
+        db_conn.execute('DELETE FROM downloads WHERE priority = ?', (database.DownloadPriority.READER,))
+    chapters_ids = [
+        row[0] for row in db_conn.execute('SELECT id FROM chapters WHERE downloaded = 0 LIMIT ?', (context['enqueue_chapters'],))
+    ]
+    yield
+    database.Download.new_many(chapters_ids, database.DownloadPriority.READER)
+
+
+@benchmark
+def chapter_clear_many(context):
+    manga_id = context['mangas_ids'][0]
+    with database.db_transaction() as db_conn:
+        db_conn.execute('UPDATE chapters SET downloaded = 1 WHERE manga_id = ?', (manga_id,))
+    chapters = database.Manga.get(manga_id).chapters
+    yield
+    database.Chapter.clear_many(chapters, reset=True)
+
+
+def run(context, repeat):
+    results = {}
+
+    for func in BENCHMARKS:
+        timings = []
+        for _index in range(repeat):
+            steps = func(context)
+            next(steps)  # setup
+
+            with StatementsCounter(database.get_db_connection()) as counter, Timer() as timer:
+                next(steps, None)
+
+            timings.append(timer.elapsed)
+
+        results[func.__name__] = dict(
+            min=min(timings),
+            median=statistics.median(timings),
+            max=max(timings),
+            statements=counter.count,
+        )
+        print(f'{func.__name__:>20}: {results[func.__name__]["median"]:.4f}s (median), {counter.count} statements', flush=True)
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Database benchmark suite')
+    parser.add_argument('--db', help='path of a generated database to use instead of generating one')
+    parser.add_argument('--mangas', type=int, default=1000, help='number of mangas')
+    parser.add_argument('--chapters', type=int, default=200, help='mean number of chapters per manga')
+    parser.add_argument('--categories', type=int, default=10, help='number of categories')
+    parser.add_argument('--downloads', type=int, default=1000, help='number of pending downloads')
+    parser.add_argument('--sample', type=int, default=100, help='number of mangas used by per-manga benchmarks')
+    parser.add_argument('--update-chapters', type=int, default=2000, help='number of chapters of updated manga')
+    parser.add_argument('--enqueue-chapters', type=int, default=20000, help='number of chapters added to downloads queue at once')
+    parser.add_argument('--repeat', type=int, default=5, help='number of runs of each benchmark')
+    parser.add_argument('--output', help='path of JSON results file (default: stdout)')
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+
+    with temporary_database():
+        db_conn = database.get_db_connection()
+
+        if args.db:
+            src_conn = sqlite3.connect(args.db)
+            src_conn.backup(db_conn)
+            src_conn.close()
+
+            # Migrate if needed
+            database.close_db_connections()
+            database.init_db()
+            db_conn = database.get_db_connection()
+        else:
+            generate_library(db_conn, args.mangas, args.chapters, args.categories, args.downloads)
+
+        sizes = {
+            table: db_conn.execute(f'SELECT count(*) FROM {table}').fetchone()[0]
+            for table in ('mangas', 'chapters', 'categories', 'downloads')
+        }
+        mangas_ids = [row[0] for row in db_conn.execute('SELECT id FROM mangas WHERE in_library = 1').fetchall()]
+
+        context = dict(
+            mangas_ids=random.Random(0).sample(mangas_ids, min(args.sample, len(mangas_ids))),
+            update_chapters=args.update_chapters,
+            enqueue_chapters=args.enqueue_chapters,
+        )
+        results = run(context, args.repeat)
+
+    report = dict(
+        date=datetime.datetime.utcnow().isoformat(),
+        db_version=database.VERSION,
+        sqlite_version=sqlite3.sqlite_version,
+        python_version=platform.python_version(),
+        sizes=sizes,
+        repeat=args.repeat,
+        results=results,
+    )
+
+    if args.output:
+        with open(args.output, 'w') as fp:
+            json.dump(report, fp, indent=4)
+    else:
+        print(json.dumps(report, indent=4))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+Manga update (chapters reconciliation) benchmark
+
+Updates a synthetic manga against a fake server which returns a modified chapters list:
+some chapters are added, removed, renamed and moved.
+
+Usage:
+
+    python3 tests/benchmarks/update_full.py --chapters 5000
+"""
+
+import argparse
+import datetime
+import logging
+
+from utils import StatementsCounter
+from utils import temporary_database
+from utils import Timer
+
+from komikku.models import database
+
+
+class FakeServer:
+    id = 'benchmark'
+    name = 'Benchmark'
+    sync = False
+
+    def __init__(self, chapters):
+        self.chapters = chapters
+
+    def get_manga_data(self, initial_data):
+        return dict(
+            name=initial_data['name'],
+            cover=None,
+            chapters=[chapter.copy() for chapter in self.chapters],
+        )
+
+
+def get_chapters(nb_chapters):
+    date = datetime.date(2020, 1, 1)
+
+    return [
+        dict(slug=f'chapter-{index}', url=None, title=f'Chapter {index}', date=date, scanlators=None)
+        for index in range(nb_chapters)
+    ]
+
+
+def get_updated_chapters(chapters):
+    """
+    Returns server side changes of a chapters list:
+    1% removed, 1% renamed, 2% added at the end, 1 chapter inserted at the beginning (all ranks move)
+    """
+    nb_chapters = len(chapters)
+    step = 100
+
+    new_chapters = [chapter.copy() for index, chapter in enumerate(chapters) if index % step != 1]
+    for chapter in new_chapters[::step]:
+        chapter['title'] += ' (renamed)'
+    new_chapters.insert(0, dict(slug='chapter-prologue', title='Prologue'))
+    new_chapters += get_chapters(nb_chapters + nb_chapters // 50)[nb_chapters:]
+
+    return new_chapters
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Manga update benchmark')
+    parser.add_argument('--chapters', type=int, default=5000, help='number of chapters')
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+
+    chapters = get_chapters(args.chapters)
+    new_chapters = get_updated_chapters(chapters)
+
+    with temporary_database():
+        manga = database.Manga.new(
+            dict(slug='manga', server_id='benchmark', name='Manga', chapters=chapters, cover=None),
+            FakeServer(chapters), False
+        )
+        manga = database.Manga.get(manga.id, FakeServer(new_chapters))
+
+        with StatementsCounter(database.get_db_connection()) as counter, Timer() as timer:
+            _status, recent_chapters_ids, nb_deleted_chapters, _synced, _unchanged = manga.update_full()
+
+        print(f'{args.chapters} chapters: {counter.count} statements, {timer.elapsed:.3f}s')
+        print(f'{len(recent_chapters_ids)} added, {nb_deleted_chapters} deleted')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+Adaptive update scheduling benchmark
+
+Simulates daily library updates of a synthetic library over a period and compares:
+- all: every manga is updated at each library update (`update_library(forced=True)`)
+- scheduled: only mangas due for update according to their release cadence (`get_update_interval()`)
+
+Reports number of manga updates (requests sent to servers) and delay before new chapters are found.
+No database or network is used: releases and updates are simulated in memory.
+
+Usage:
+
+    python3 tests/benchmarks/update_schedule.py --mangas 1000 --days 90
+"""
+
+import argparse
+import datetime
+import random
+import statistics
+
+import utils  # noqa: F401 (adds project root to path)
+
+from komikku.models.database import get_update_interval
+
+# Profiles of mangas: (weight, status, gap between releases in days (None: no more releases), days since last release)
+PROFILES = {
+    'complete': (35, 'complete', None, (365, 3650)),
+    'suspended': (5, 'suspended', None, (90, 1500)),
+    'hiatus': (5, 'hiatus', None, (60, 700)),
+    'stale': (15, 'ongoing', None, (120, 1000)),  # ongoing status never updated by server
+    'weekly': (25, 'ongoing', 7, (0, 7)),
+    'monthly': (15, 'ongoing', 30, (0, 30)),
+}
+
+
+def generate_library(nb_mangas, start, rand):
+    mangas = []
+    names = list(PROFILES)
+    weights = [PROFILES[name][0] for name in names]
+
+    for _index in range(nb_mangas):
+        profile = rand.choices(names, weights)[0]
+        _weight, status, gap, elapsed = PROFILES[profile]
+
+        last_release = start - datetime.timedelta(days=rand.randint(*elapsed))
+        history_gap = gap or rand.choice((7, 14, 30))
+        releases = [last_release - datetime.timedelta(days=history_gap * index) for index in range(20)]
+
+        future = []
+        if gap:
+            date = last_release + datetime.timedelta(days=gap)
+            while date < start + datetime.timedelta(days=3650):
+                # Releases are a bit irregular
+                future.append(date + datetime.timedelta(days=rand.randint(-1, 1)))
+                date += datetime.timedelta(days=gap)
+
+        mangas.append(dict(profile=profile, status=status, releases=releases, future=future, next_update=None))
+
+    return mangas
+
+
+def simulate(mangas, start, nb_days, scheduled):
+    nb_updates = 0
+    delays = []
+
+    for day in range(nb_days):
+        now = datetime.datetime.combine(start + datetime.timedelta(days=day), datetime.time(12))
+        today = now.date()
+
+        for manga in mangas:
+            if scheduled and manga['next_update'] is not None and manga['next_update'] > now:
+                continue
+
+            nb_updates += 1
+            while manga['future'] and manga['future'][0] <= today:
+                date = manga['future'].pop(0)
+                manga['releases'].insert(0, date)
+                delays.append((today - date).days)
+
+            if scheduled:
+                manga['next_update'] = now + get_update_interval(manga['status'], manga['releases'][:11], today)
+
+    return nb_updates, delays
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Adaptive update scheduling benchmark')
+    parser.add_argument('--mangas', type=int, default=1000, help='number of mangas of library')
+    parser.add_argument('--days', type=int, default=90, help='number of simulated days (one library update per day)')
+    args = parser.parse_args()
+
+    start = datetime.date(2024, 1, 1)
+
+    for name in ('all', 'scheduled'):
+        mangas = generate_library(args.mangas, start, random.Random(0))
+        nb_updates, delays = simulate(mangas, start, args.days, name == 'scheduled')
+        print(
+            f'{name:>9}: {nb_updates:>7} updates ({nb_updates / args.days:.0f} per library update), {len(delays)} releases found, '
+            f'delay {statistics.mean(delays):.2f} days (mean) {max(delays)} days (max)'
+        )
+
+
+if __name__ == '__main__':
+    main()
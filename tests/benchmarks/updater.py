@@ -0,0 +1,157 @@
+"""
+Library update benchmark
+
+Updates a synthetic library spread across several fake servers with different latencies (one of them is very slow,
+like a Cloudflare-protected server) while a GLib main loop runs, and compares:
+- serial: a single update at a time (`max_concurrency=1`), as a single FIFO queue does
+- parallel: a worker per server, with the default global concurrency cap (`UPDATER_MAX_CONCURRENCY`)
+
+Total duration of a parallel update should be close to the duration of the slowest server,
+not to the sum of the durations of all servers.
+
+Usage:
+
+    python3 tests/benchmarks/updater.py --servers 10 --mangas 100 --latency 0.01 --slow-latency 0.1
+"""
+
+import argparse
+import logging
+import threading
+import time
+from types import SimpleNamespace
+
+from gi.repository import GLib
+
+from update_full import get_chapters
+from utils import temporary_database
+from utils import Timer
+
+from komikku import updater
+from komikku.models import database
+
+
+class FakeServer:
+    name = 'Benchmark'
+    status = 'enabled'
+    sync = False
+
+    def __init__(self, id, latency, chapters):
+        self.id = id
+        self.chapters = chapters
+        self.latency = latency
+
+    def get_manga_data(self, initial_data):
+        time.sleep(self.latency)
+
+        return dict(
+            name=initial_data['name'],
+            cover=None,
+            chapters=[chapter.copy() for chapter in self.chapters],
+        )
+
+
+class FakeManga(database.Manga):
+    """Manga whose server is a fake one, selected by server ID"""
+
+    servers = {}
+
+    @classmethod
+    def get(cls, id_, server=None, db_conn=None, columns=None):
+        row = database.get_db_connection().execute('SELECT server_id FROM mangas WHERE id = ?', (id_,)).fetchone()
+
+        return database.Manga.get(id_, cls.servers[row['server_id']], db_conn=db_conn, columns=columns)
+
+
+class FakeUpdater(updater.Updater):
+    """Updater without notifications"""
+
+    def __init__(self, max_concurrency):
+        super().__init__(SimpleNamespace(network_available=True), max_concurrency)
+
+    def notify_update_error(self, manga, message=None):
+        return False
+
+    def notify_update_success(self, manga, recent_chapters_ids, nb_deleted_chapters, synced):
+        return False
+
+    def notify_updates_ended(self, totals, update_library):
+        return False
+
+    def show_notification(self, id, title, body=None):
+        return False
+
+
+def populate(nb_servers, nb_mangas, latency, slow_latency, nb_chapters):
+    chapters = get_chapters(nb_chapters)
+    mangas_ids = []
+
+    for index in range(nb_servers):
+        server_id = f'benchmark{index}'
+        FakeManga.servers[server_id] = FakeServer(server_id, slow_latency if index == 0 else latency * (1 + index % 3), chapters)
+
+    for index in range(nb_mangas):
+        server = FakeManga.servers[f'benchmark{index % nb_servers}']
+        manga = database.Manga.new(
+            dict(slug=f'manga-{index}', server_id=server.id, name=f'Manga {index}', chapters=chapters, cover=None),
+            server, False
+        )
+        mangas_ids.append(manga.id)
+
+    return mangas_ids
+
+
+def run(name, mangas_ids, max_concurrency):
+    loop = GLib.MainLoop()
+    fake_updater = FakeUpdater(max_concurrency)
+
+    # Forget previous run: updates must not be short-circuited
+    with database.db_transaction() as db_conn:
+        db_conn.execute('UPDATE mangas SET update_validators = NULL')
+
+    def wait():
+        fake_updater.wait_stopped()
+        GLib.idle_add(loop.quit)
+
+    with Timer() as timer:
+        fake_updater.add([FakeManga.get(id_) for id_ in mangas_ids])
+        fake_updater.start()
+        threading.Thread(target=wait, daemon=True).start()
+        loop.run()
+
+    totals = fake_updater.totals
+    print(
+        f'{name:>8}: {timer.elapsed:.3f}s, {totals["successes"]} successes ({totals["unchanged"]} unchanged), '
+        f'{totals["errors"]} errors'
+    )
+
+    return timer.elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Library update benchmark')
+    parser.add_argument('--servers', type=int, default=10, help='number of servers')
+    parser.add_argument('--mangas', type=int, default=100, help='number of mangas (spread evenly across servers)')
+    parser.add_argument('--chapters', type=int, default=50, help='number of chapters per manga')
+    parser.add_argument('--latency', type=float, default=0.01, help='base latency of a server (in seconds)')
+    parser.add_argument('--slow-latency', type=float, default=0.1, help='latency of the slow server (in seconds)')
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+
+    updater.Manga = FakeManga
+
+    with temporary_database():
+        mangas_ids = populate(args.servers, args.mangas, args.latency, args.slow_latency, args.chapters)
+
+        durations = {}
+        for server in FakeManga.servers.values():
+            nb_mangas = len([index for index in range(args.mangas) if f'benchmark{index % args.servers}' == server.id])
+            durations[server.id] = nb_mangas * server.latency
+        print(f'servers latencies: {sum(durations.values()):.3f}s (sum), {max(durations.values()):.3f}s (slowest server)')
+
+        run('serial', mangas_ids, 1)
+        run('parallel', mangas_ids, updater.UPDATER_MAX_CONCURRENCY)
+
+
+if __name__ == '__main__':
+    main()
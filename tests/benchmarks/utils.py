@@ -0,0 +1,77 @@
+"""
+Benchmarks helpers
+"""
+
+from contextlib import contextmanager
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from komikku.models import database  # noqa: E402
+
+
+class StatementsCounter:
+    """Counts SQL statements executed on a connection"""
+
+    def __init__(self, db_conn):
+        self.db_conn = db_conn
+        self.count = 0
+
+    def __enter__(self):
+        self.count = 0
+        self.db_conn.set_trace_callback(self.on_statement)
+        return self
+
+    def __exit__(self, *args):
+        self.db_conn.set_trace_callback(None)
+
+    def on_statement(self, _statement):
+        self.count += 1
+
+
+class Timer:
+    def __enter__(self):
+        self.start = time.perf_counter()
+        self.elapsed = None
+        return self
+
+    def __exit__(self, *args):
+        self.elapsed = time.perf_counter() - self.start
+
+
+@contextmanager
+def temporary_database():
+    """
+    Initializes an empty database (and data folders) in a temporary folder
+
+    Paths functions used by `komikku.models.database` are overridden for the duration of the context.
+    """
+    saved = {
+        name: getattr(database, name)
+        for name in ('get_cached_data_dir', 'get_data_dir', 'get_db_backup_path', 'get_db_path')
+    }
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        database.get_cached_data_dir = lambda: os.path.join(tmp_dir, 'cache')
+        database.get_data_dir = lambda: os.path.join(tmp_dir, 'data')
+        database.get_db_backup_path = lambda: os.path.join(tmp_dir, 'komikku_backup.db')
+        database.get_db_path = lambda: os.path.join(tmp_dir, 'komikku.db')
+
+        os.mkdir(database.get_cached_data_dir())
+        os.mkdir(database.get_data_dir())
+
+        database.close_db_connections()
+        database.chapters_counters.invalidate()
+        database.init_db()
+
+        try:
+            yield tmp_dir
+        finally:
+            database.close_db_connections()
+            database.chapters_counters.invalidate()
+
+            for name, func in saved.items():
+                setattr(database, name, func)
@@ -0,0 +1,192 @@
+"""
+Fixtures shared by models tests
+"""
+
+from io import BytesIO
+import os
+import sqlite3
+
+import pytest
+
+
+class FakeServer:
+    """
+    Server returning mangas data, covers and pages images without network
+
+    :param chapters: chapters returned with manga data
+    :param cover: URL of cover returned with manga data
+    """
+
+    id = 'test'
+    name = 'Test'
+    sync = False
+
+    def __init__(self, chapters=None, cover=None):
+        self.chapters = chapters or []
+        self.cover = cover
+        self.covers_etags = []
+
+    def get_manga_chapter_page_image(self, manga_slug, manga_name, chapter_slug, page):
+        from PIL import Image
+
+        buffer = BytesIO()
+        Image.new('RGB', (8, 8), page['color']).save(buffer, page['format'])
+
+        return dict(
+            buffer=buffer.getvalue(),
+            mime_type=f'image/{page["format"].lower()}',
+            name=f'{page["slug"]}.{page["format"].lower()}',
+        )
+
+    def get_manga_cover_image(self, url, etag=None):
+        self.covers_etags.append(etag)
+        if etag == '"cover"':
+            # Not modified
+            return None, None
+
+        return b'cover', '"cover"'
+
+    def get_manga_data(self, initial_data):
+        data = initial_data.copy()
+        data.update(dict(
+            cover=self.cover,
+            chapters=[chapter.copy() for chapter in self.chapters],
+        ))
+
+        return data
+
+
+def create_legacy_database(path, version, chapters):
+    """
+    Creates a database at a former version (12 or 13), with a manga and its chapters
+
+    :param path: path of database file
+    :param version: 12 (pages reading status stored as text) or 13 (stored as bitset, no natural sort key)
+    :param chapters: chapters data (`slug`, `title` and `read_progress` keys)
+    """
+    db_conn = sqlite3.connect(path)
+    db_conn.executescript(f"""
+        CREATE TABLE mangas (
+            id integer PRIMARY KEY,
+            slug text NOT NULL,
+            url text,
+            server_id text NOT NULL,
+            in_library integer,
+            name text NOT NULL,
+            authors json,
+            scanlators json,
+            genres json,
+            synopsis text,
+            status text,
+            background_color text,
+            borders_crop integer,
+            landscape_zoom integer,
+            page_numbering integer,
+            reading_mode text,
+            scaling text,
+            sort_order text,
+            last_read timestamp,
+            last_update timestamp,
+            UNIQUE (slug, server_id)
+        );
+        CREATE TABLE chapters (
+            id integer PRIMARY KEY,
+            manga_id integer REFERENCES mangas(id) ON DELETE CASCADE,
+            slug text NOT NULL,
+            url text,
+            title text NOT NULL,
+            scanlators json,
+            pages json,
+            date date,
+            rank integer NOT NULL,
+            downloaded integer NOT NULL,
+            recent integer NOT NULL,
+            read_progress {'text' if version <= 12 else 'bitset'},
+            read integer NOT NULL,
+            last_page_read_index integer,
+            last_read timestamp,
+            UNIQUE (slug, manga_id)
+        );
+        CREATE TABLE downloads (
+            id integer PRIMARY KEY,
+            chapter_id integer REFERENCES chapters(id) ON DELETE CASCADE,
+            status text NOT NULL,
+            percent float NOT NULL,
+            errors integer DEFAULT 0,
+            date timestamp NOT NULL,
+            UNIQUE (chapter_id)
+        );
+        INSERT INTO mangas (id, slug, server_id, in_library, name) VALUES (1, 'manga', 'test', 1, 'Manga');
+        PRAGMA user_version = {version};
+    """)
+    with db_conn:
+        db_conn.executemany(
+            'INSERT INTO chapters (manga_id, slug, title, rank, downloaded, recent, read_progress, read) VALUES (1, ?, ?, ?, 0, 0, ?, 0)',
+            [(chapter['slug'], chapter['title'], rank, chapter['read_progress']) for rank, chapter in enumerate(chapters)]
+        )
+    db_conn.close()
+
+
+def setup_database(tmp_path):
+    """Initializes a database in a temporary folder, yields `komikku.models.database` module"""
+    from komikku.models import database
+
+    saved = {
+        name: getattr(database, name)
+        for name in ('get_cached_data_dir', 'get_data_dir', 'get_db_backup_path', 'get_db_path')
+    }
+    database.get_cached_data_dir = lambda: str(tmp_path / 'cache')
+    database.get_data_dir = lambda: str(tmp_path / 'data')
+    database.get_db_backup_path = lambda: str(tmp_path / 'komikku_backup.db')
+    database.get_db_path = lambda: str(tmp_path / 'komikku.db')
+    os.mkdir(database.get_cached_data_dir())
+    os.mkdir(database.get_data_dir())
+
+    database.close_db_connections()
+    database.init_db()
+
+    yield database
+
+    database.close_db_connections()
+    for name, func in saved.items():
+        setattr(database, name, func)
+
+
+@pytest.fixture
+def database(tmp_path):
+    yield from setup_database(tmp_path)
+
+
+@pytest.fixture(scope='module')
+def module_database(tmp_path_factory):
+    """Database shared by the tests of a module (a large generated library for ex.)"""
+    yield from setup_database(tmp_path_factory.mktemp('db'))
+
+
+@pytest.fixture
+def legacy_database(database):
+    """
+    Returns a function which replaces database by a database at a former version (see `create_legacy_database`)
+
+    Database is migrated (`init_db`) and `komikku.models.database` module is returned.
+    """
+    def migrate(version, chapters):
+        db_path = database.get_db_path()
+
+        database.close_db_connections()
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+
+        create_legacy_database(db_path, version, chapters)
+        database.init_db()
+
+        return database
+
+    return migrate
+
+
+@pytest.fixture
+def fake_server():
+    """Returns `FakeServer` class"""
+    return FakeServer
@@ -0,0 +1,93 @@
+"""
+Downloaded pages are recorded in chapter manifest with their size and checksum, and in storage usage
+"""
+
+import hashlib
+import os
+
+
+def test_get_page(database, fake_server):
+    server = fake_server()
+    chapters = [dict(slug='chapter-1', title='Chapter 1')]
+    manga = database.Manga.new(dict(slug='manga', server_id='test', name='Manga', chapters=chapters, cover=None), server, False)
+
+    chapter = database.Chapter.get(manga.chapters[0].id)
+    chapter._manga = database.Manga.get(manga.id, server)
+    chapter.update(dict(pages=[
+        dict(slug='1', color='red', format='PNG'),
+        dict(slug='2', color='blue', format='WEBP'),
+    ]))
+
+    paths = [chapter.get_page(index) for index in range(2)]
+    # WebP page is converted to JPEG
+    assert [os.path.basename(path) for path in paths] == ['1.png', '2.jpg']
+    assert not [name for name in os.listdir(chapter.path) if name.startswith('.part-')]
+
+    manifest = chapter.get_manifest()
+    for index, path in enumerate(paths):
+        with open(path, 'rb') as fp:
+            content = fp.read()
+        page = manifest['pages'][str(index)]
+        assert page['size'] == len(content)
+        assert page['sha256'] == hashlib.sha256(content).hexdigest()
+
+    assert database.Chapter.get(chapter.id).downloaded
+
+
+def test_get_page_again(database, fake_server):
+    server = fake_server()
+    chapters = [dict(slug='chapter-1', title='Chapter 1')]
+    manga = database.Manga.new(dict(slug='manga', server_id='test', name='Manga', chapters=chapters, cover=None), server, False)
+
+    chapter = database.Chapter.get(manga.chapters[0].id)
+    chapter._manga = database.Manga.get(manga.id, server)
+    chapter.update(dict(pages=[dict(slug='1', color='red', format='PNG')]))
+
+    path = chapter.get_page(0)
+
+    # Page file is corrupted (a truncated copy for ex.): page is downloaded again
+    with open(path, 'wb') as fp:
+        fp.write(b'\0' * 1000)
+    assert chapter.get_page_path(0) is None
+
+    database.storage_usage.invalidate(chapter.manga.path)
+    assert database.storage_usage.get(chapter.manga.path)['pages_size'] == 1000
+    assert chapter.get_page(0) == path
+
+    usage = database.storage_usage.get(chapter.manga.path)
+    database.storage_usage.invalidate(chapter.manga.path)
+    disk_usage = database.storage_usage.get(chapter.manga.path)
+    assert usage['pages_size'] == disk_usage['pages_size'] == os.path.getsize(path)
+    assert usage['nb_pages'] == disk_usage['nb_pages'] == 1
+    assert usage['nb_chapters'] == disk_usage['nb_chapters'] == 1
+
+
+def test_get_page_legacy(database, fake_server):
+    server = fake_server()
+    chapters = [dict(slug='chapter-1', title='Chapter 1')]
+    manga = database.Manga.new(dict(slug='manga', server_id='test', name='Manga', chapters=chapters, cover=None), server, False)
+
+    chapter = database.Chapter.get(manga.chapters[0].id)
+    chapter._manga = database.Manga.get(manga.id, server)
+    chapter.update(dict(pages=[dict(slug=str(index), color='red', format='PNG') for index in range(1, 4)]))
+
+    # Chapter partly downloaded before manifests existed
+    paths = [chapter.get_page(index) for index in range(2)]
+    os.remove(chapter.manifest_path)
+
+    # Reader reads last page (a missing one) first: legacy pages are checked and added to manifest
+    manifest = chapter.get_manifest()
+    assert chapter.get_page(2, manifest=manifest)
+    assert database.Chapter.get(chapter.id).downloaded
+
+    manifest = chapter.get_manifest()
+    for index, path in enumerate(paths):
+        page = manifest['pages'][str(index)]
+        assert page['size'] == os.path.getsize(path) and page['sha256'] is None
+    assert manifest['pages']['2']['sha256'] is not None
+
+    # A legacy page is verified against its size only
+    assert chapter.get_page_path(0, verify=True) == paths[0]
+    with open(paths[0], 'ab') as fp:
+        fp.write(b'\0')
+    assert chapter.get_page_path(0, verify=True) is None
@@ -0,0 +1,36 @@
+"""
+Chapters counters cache and its invalidation from another thread
+"""
+
+
+def test_invalidate_during_get(database, monkeypatch):
+    db_conn = database.get_db_connection()
+    with db_conn:
+        manga_id = db_conn.execute(
+            "INSERT INTO mangas (slug, server_id, name, in_library) VALUES ('manga', 'test', 'Manga', 1)"
+        ).lastrowid
+        db_conn.execute(
+            "INSERT INTO chapters (manga_id, slug, title, rank, downloaded, read, recent) VALUES (?, 'chapter', 'Chapter', 0, 0, 0, 1)",
+            (manga_id,)
+        )
+
+    counters = database.ChaptersCounters()
+
+    class Connection:
+        """Chapter is read and counters invalidated while they are recomputed"""
+
+        def execute(self, *args):
+            cursor = db_conn.execute(*args)
+            with db_conn:
+                db_conn.execute('UPDATE chapters SET read = 1, recent = 0 WHERE manga_id = ?', (manga_id,))
+            counters.invalidate(manga_id)
+            return cursor
+
+    monkeypatch.setattr(database, 'get_db_connection', lambda: Connection())
+    assert counters.get(manga_id) == dict(unread=1, downloaded=0, recent=1)
+    monkeypatch.undo()
+
+    # Outdated counters have not been stored
+    assert manga_id not in counters.counters
+    assert counters.get(manga_id) == dict(unread=0, downloaded=0, recent=0)
+    assert manga_id in counters.counters
@@ -0,0 +1,117 @@
+"""
+Connections pool: one long-lived connection per thread and nested units of work
+"""
+
+import threading
+
+import pytest
+
+
+def insert_manga(db_conn, slug):
+    return db_conn.execute("INSERT INTO mangas (slug, server_id, name) VALUES (?, 'test', ?)", (slug, slug)).lastrowid
+
+
+def nb_committed_mangas(database):
+    # Changes not yet committed are not visible from another connection
+    db_conn = database.create_db_connection()
+    try:
+        return db_conn.execute('SELECT count(*) FROM mangas').fetchone()[0]
+    finally:
+        db_conn.close()
+
+
+def test_connection_per_thread(database):
+    db_conn = database.get_db_connection()
+    assert database.get_db_connection() is db_conn
+
+    threads_conns = []
+
+    def run():
+        threads_conns.append(database.get_db_connection())
+        threads_conns.append(database.get_db_connection())
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    thread.join()
+
+    assert threads_conns[0] is threads_conns[1]
+    assert threads_conns[0] is not db_conn
+    assert database.db_pool.stats['alive'] == 2
+
+    # Connection of terminated thread is closed when a new connection is opened
+    thread = threading.Thread(target=database.get_db_connection)
+    thread.start()
+    thread.join()
+
+    assert database.db_pool.stats['alive'] == 2
+    assert db_conn in database.db_pool.connections.values()
+    assert threads_conns[0] not in database.db_pool.connections.values()
+
+
+def test_connection_of_terminated_thread(database):
+    threads_conns = []
+
+    def run_unfinished_transaction():
+        db_conn = database.get_db_connection()
+        insert_manga(db_conn, 'manga')
+        threads_conns.append(db_conn)
+
+    def run():
+        threads_conns.append(database.get_db_connection())
+
+    # Thread identifiers are reused: a new thread must not inherit the connection (and the transaction) of a terminated one
+    for target in (run_unfinished_transaction, run):
+        thread = threading.Thread(target=target)
+        thread.start()
+        thread.join()
+
+    assert threads_conns[1] is not threads_conns[0]
+    assert not threads_conns[1].in_transaction
+    assert nb_committed_mangas(database) == 0
+
+
+def test_close_all(database):
+    db_conn = database.get_db_connection()
+    database.close_db_connections()
+
+    # A new connection is opened
+    assert database.get_db_connection() is not db_conn
+    assert database.db_pool.stats['alive'] == 1
+
+
+def test_nested_transactions(database):
+    with database.db_transaction() as db_conn:
+        insert_manga(db_conn, 'outer')
+
+        with database.db_transaction() as nested_db_conn:
+            assert nested_db_conn is db_conn
+            assert database.db_pool.local.depth == 2
+            insert_manga(nested_db_conn, 'inner')
+
+        # Nested unit of work doesn't commit
+        assert db_conn.in_transaction
+        assert nb_committed_mangas(database) == 0
+
+    assert database.db_pool.local.depth == 0
+    assert not db_conn.in_transaction
+    assert nb_committed_mangas(database) == 2
+
+
+def test_nested_transaction_rollback(database):
+    with pytest.raises(ValueError):
+        with database.db_transaction() as db_conn:
+            insert_manga(db_conn, 'outer')
+
+            with database.db_transaction() as nested_db_conn:
+                insert_manga(nested_db_conn, 'inner')
+                raise ValueError
+
+    # Whole unit of work is rollbacked
+    assert database.db_pool.local.depth == 0
+    assert not db_conn.in_transaction
+    assert nb_committed_mangas(database) == 0
+
+    # Next unit of work is not affected
+    with database.db_transaction() as db_conn:
+        insert_manga(db_conn, 'manga')
+    assert nb_committed_mangas(database) == 1
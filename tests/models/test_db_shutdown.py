@@ -0,0 +1,31 @@
+"""
+Database shutdown: WAL file is checkpointed and truncated
+"""
+
+import os
+import threading
+
+
+def test_close_db_connections_checkpoint(database):
+    def write():
+        with database.db_transaction() as db_conn:
+            for index in range(100):
+                db_conn.execute('INSERT INTO categories (label) VALUES (?)', (f'Category {index}',))
+
+    thread = threading.Thread(target=write)
+    thread.start()
+    thread.join()
+
+    # A connection left open elsewhere prevents SQLite from removing WAL file on close
+    db_conn = database.create_db_connection()
+    try:
+        wal_path = database.get_db_path() + '-wal'
+        assert os.path.getsize(wal_path) > 0
+
+        database.backup_db()
+        database.close_db_connections(checkpoint=True)
+
+        assert os.path.getsize(wal_path) == 0
+        assert db_conn.execute('SELECT count(*) FROM categories').fetchone()[0] == 100
+    finally:
+        db_conn.close()
@@ -0,0 +1,172 @@
+"""
+Downloads queue
+"""
+
+from types import SimpleNamespace
+
+
+def add_chapters(database, nb_chapters):
+    with database.db_transaction() as db_conn:
+        manga_id = db_conn.execute(
+            "INSERT INTO mangas (slug, server_id, name) VALUES (?, ?, ?)", ('manga', 'test', 'Manga')
+        ).lastrowid
+        db_conn.executemany(
+            "INSERT INTO chapters (manga_id, slug, title, rank, downloaded, read, recent) VALUES (?, ?, ?, ?, 0, 0, 0)",
+            [(manga_id, f'chapter-{rank}', f'Chapter {rank}', rank) for rank in range(nb_chapters)]
+        )
+
+    return database.Manga.get(manga_id).chapters
+
+
+def test_prioritize(database):
+    from komikku.downloader import Downloader
+    from komikku.models import Download
+    from komikku.models import DownloadPriority
+
+    chapters = add_chapters(database, 3)
+    downloader = Downloader(SimpleNamespace())
+    downloader.add(chapters[:1], priority=DownloadPriority.AUTO)
+    downloader.add(chapters[1:])
+
+    def get_priorities():
+        return [Download.get_by_chapter_id(chapter.id).priority for chapter in chapters]
+
+    # Reader shows a chapter, then moves to another one: only the chapter being read is prioritized
+    downloader.prioritize(chapters[0])
+    assert get_priorities() == [DownloadPriority.READER, DownloadPriority.USER, DownloadPriority.USER]
+    downloader.prioritize(chapters[1])
+    assert get_priorities() == [DownloadPriority.AUTO, DownloadPriority.READER, DownloadPriority.USER]
+
+    # Reader is closed
+    downloader.deprioritize()
+    assert get_priorities() == [DownloadPriority.AUTO, DownloadPriority.USER, DownloadPriority.USER]
+
+    # Prioritized chapter's download has ended in the meantime
+    downloader.prioritize(chapters[2])
+    Download.get_by_chapter_id(chapters[2].id).delete()
+    downloader.deprioritize()
+    assert downloader.prioritized is None
+
+
+def test_new_many_partial(database, monkeypatch):
+    from komikku.models import Download
+    from komikku.models import database as models_database
+
+    chapters = add_chapters(database, 4)
+    insert_rows = models_database.insert_rows
+
+    def insert_rows_concurrently(db_conn, table, data, ignore=False):
+        # A concurrent thread queues 2nd chapter in the meantime
+        db_conn.execute(
+            "INSERT INTO downloads (chapter_id, status, percent, date, priority) VALUES (?, 'pending', 0, '2020-01-01', 1)",
+            (chapters[1].id,)
+        )
+        return insert_rows(db_conn, table, data, ignore=ignore)
+
+    monkeypatch.setattr(models_database, 'insert_rows', insert_rows_concurrently)
+
+    # Unknown chapter (foreign key) is skipped, other chapters are queued
+    queued_ids = Download.new_many([chapter.id for chapter in chapters] + [999])
+    assert queued_ids == [chapters[0].id, chapters[2].id, chapters[3].id]
+    assert Download.get_by_chapter_id(999) is None
+
+
+def test_worker_pages_executor(monkeypatch):
+    import threading
+    import time
+
+    from komikku.downloader import Downloader
+    from komikku.downloader import DownloadProgress
+
+    downloader = Downloader(SimpleNamespace())
+    server = SimpleNamespace(id='test', download_concurrency=2)
+
+    lock = threading.Lock()
+    fetches = []  # thread of each page fetch
+    in_progress = [0, 0]  # current and max number of pages fetched concurrently
+
+    def download_page(chapter, index):
+        with lock:
+            fetches.append(threading.get_ident())
+            in_progress[0] += 1
+            in_progress[1] = max(in_progress)
+        time.sleep(0.01)
+        with lock:
+            in_progress[0] -= 1
+
+        return f'{index}.jpg'
+
+    def get_download():
+        chapter = SimpleNamespace(
+            manga=SimpleNamespace(server=server),
+            pages=[{}] * 6,
+            get_manifest=lambda: None,
+            get_page_path=lambda index, manifest=None, verify=False: None,
+            update=lambda data: None,
+            update_full=lambda: True,
+        )
+        return SimpleNamespace(chapter=chapter, delete=lambda: downloads_done.append(chapter), update=lambda data: None)
+
+    downloads = [get_download(), get_download()]
+    downloads_done = []
+    monkeypatch.setattr(downloader, 'download_page', download_page)
+    monkeypatch.setattr(downloader, 'get_next_download', lambda server_id: downloads.pop(0) if downloads else None)
+    monkeypatch.setattr(downloader, 'get_server_concurrency', lambda server: server.download_concurrency)
+    monkeypatch.setattr(downloader, 'get_storage_shortage', lambda chapter: None)
+    monkeypatch.setattr(DownloadProgress, 'schedule_notification', lambda progress: None)
+
+    downloader.workers['test'] = threading.current_thread()
+    downloader.run_worker('test')
+
+    assert len(downloads_done) == 2 and len(fetches) == 12
+    # Pages of both chapters are fetched by the same threads, at most `concurrency` at a time
+    assert in_progress[1] == 2
+    assert len(set(fetches)) <= 2
+    assert 'test' not in downloader.workers
+
+
+def test_stopped_download_errors(monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+    import threading
+
+    from komikku.downloader import Downloader
+    from komikku.downloader import DownloadProgress
+
+    downloader = Downloader(SimpleNamespace())
+    server = SimpleNamespace(id='test', download_concurrency=4)
+
+    barrier = threading.Barrier(4)
+    stopped = threading.Event()
+
+    def download_page(chapter, index):
+        # All pages are in progress when downloader is stopped by first one
+        barrier.wait()
+        if index == 0:
+            downloader.stop_flag = True
+            stopped.set()
+            return f'{index}.jpg'
+
+        stopped.wait()
+        return None
+
+    updates = []
+    chapter = SimpleNamespace(
+        manga=SimpleNamespace(server=server),
+        pages=[{}] * 4,
+        get_manifest=lambda: None,
+        get_page_path=lambda index, manifest=None, verify=False: None,
+        update_full=lambda: True,
+    )
+    download = SimpleNamespace(chapter=chapter, errors=0, percent=0, update=updates.append)
+
+    monkeypatch.setattr(downloader, 'download_page', download_page)
+    monkeypatch.setattr(downloader, 'get_server_concurrency', lambda server: server.download_concurrency)
+    monkeypatch.setattr(downloader, 'get_storage_shortage', lambda chapter: None)
+    monkeypatch.setattr(DownloadProgress, 'schedule_notification', lambda progress: None)
+
+    downloader.stop_flag = False
+    with ThreadPoolExecutor(max_workers=4) as pages_executor:
+        downloader.process_download(download, pages_executor)
+
+    # Skipped pages are not counted as errors
+    assert updates[-1] == dict(percent=25, errors=0, status='pending')
@@ -0,0 +1,79 @@
+"""
+Headless mode: JSON lines output and exit codes
+"""
+
+import json
+from types import SimpleNamespace
+
+import pytest
+
+
+@pytest.fixture
+def headless(database, monkeypatch):
+    """Returns `komikku.headless` module, with an available network and no running application"""
+    from komikku import headless
+
+    monkeypatch.setattr(headless.HeadlessApplication, 'application_id', 'info.febvre.Komikku.Tests')
+    monkeypatch.setattr(headless.HeadlessApplication, 'is_application_running', lambda app: False)
+    monkeypatch.setattr(headless.HeadlessWindow, 'network_available', True)
+    # Network checks of decorated methods are bypassed explicitly: `if_network_available` looks for window
+    # in a `parent` attribute first, whose presence on a GObject depends on bindings
+    for cls, name in ((headless.Updater, 'start'), (headless.Updater, 'update_library'), (headless.Downloader, 'start')):
+        monkeypatch.setattr(cls, name, getattr(cls, name).__wrapped__)
+    monkeypatch.setattr(headless, 'lock_data_dir', lambda: True)
+    # No storage quota: library folders are not preloaded
+    monkeypatch.setattr(headless.Settings, 'get_default', lambda: SimpleNamespace(storage_quota=0))
+
+    return headless
+
+
+def get_events(capsys):
+    return [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+
+def test_headless_already_running(headless, monkeypatch, capsys):
+    monkeypatch.setattr(headless.HeadlessApplication, 'is_application_running', lambda app: True)
+
+    assert headless.main(['komikku-headless', '--update']) == headless.EXIT_ERROR
+
+    events = get_events(capsys)
+    assert [event['event'] for event in events] == ['error']
+    assert events[0]['message'] == 'Komikku is already running'
+
+
+def test_headless_nothing_to_update(headless, capsys):
+    assert headless.main(['komikku-headless', '--update']) == headless.EXIT_SUCCESS
+
+    events = get_events(capsys)
+    assert [event['event'] for event in events] == ['update-started', 'notification', 'ended']
+    assert events[-1]['failures'] == 0 and events[-1]['exit_code'] == headless.EXIT_SUCCESS
+
+
+def test_headless_update_ended_once(headless, monkeypatch, capsys):
+    from gi.repository import GLib
+
+    def update_library(updater, forced=False):
+        # Update fails and ends before `update_library()` returns
+        manga = SimpleNamespace(id=1, name='Manga', server_id='test')
+        GLib.idle_add(updater.notify_update_error, manga)
+        GLib.idle_add(updater.notify_updates_ended, dict(chapters=0, errors=1, successes=0, unchanged=0), True)
+        return True
+
+    nb_starts = []
+
+    def start_downloads(app):
+        nb_starts.append(1)
+        GLib.idle_add(app.loop.quit)
+        return GLib.SOURCE_REMOVE
+
+    monkeypatch.setattr(headless.HeadlessUpdater, 'update_library', update_library)
+    monkeypatch.setattr(headless.HeadlessApplication, 'start_downloads', start_downloads)
+
+    assert headless.main(['komikku-headless']) == headless.EXIT_FAILURES
+
+    # Downloads are started once, when update is ended
+    assert len(nb_starts) == 1
+
+    events = get_events(capsys)
+    assert [event['event'] for event in events] == ['update-started', 'manga-update-failed', 'update-ended', 'ended']
+    assert events[-1]['failures'] == 1 and events[-1]['exit_code'] == headless.EXIT_FAILURES
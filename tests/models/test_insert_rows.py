@@ -0,0 +1,28 @@
+"""
+Rows inserted in bulk: a bad row doesn't prevent others from being inserted
+"""
+
+
+def test_insert_rows_fallback(database, caplog):
+    with database.db_transaction() as db_conn:
+        manga_id = db_conn.execute(
+            "INSERT INTO mangas (slug, server_id, name) VALUES (?, ?, ?)", ('manga', 'test', 'Manga')
+        ).lastrowid
+
+        rows_data = [
+            dict(manga_id=manga_id, slug=f'chapter-{rank}', title=f'Chapter {rank}', rank=rank, downloaded=0, recent=1, read=0)
+            for rank in range(5)
+        ]
+        # NOT NULL constraint failure
+        rows_data[2]['downloaded'] = None
+
+        assert database.insert_rows(db_conn, 'chapters', rows_data) is False
+
+    slugs = [row['slug'] for row in db_conn.execute('SELECT slug FROM chapters WHERE manga_id = ? ORDER BY rank', (manga_id,))]
+    assert slugs == ['chapter-0', 'chapter-1', 'chapter-3', 'chapter-4']
+    assert "Row skipped" in caplog.text and "'chapter-2'" in caplog.text
+
+    # All rows are valid: inserted with a single statement
+    with database.db_transaction() as db_conn:
+        assert database.insert_rows(db_conn, 'chapters', [dict(rows_data[2], downloaded=0)]) is True
+    assert db_conn.execute('SELECT count(*) FROM chapters WHERE manga_id = ?', (manga_id,)).fetchone()[0] == 5
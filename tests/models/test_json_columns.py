@@ -0,0 +1,71 @@
+"""
+JSON columns are decoded lazily (whether they are stored as BLOB or TEXT) and loaded on demand only once
+"""
+
+
+def test_json_columns_stored_as_text(database):
+    db_conn = database.get_db_connection()
+
+    with db_conn:
+        manga_id = db_conn.execute(
+            "INSERT INTO mangas (slug, server_id, name, genres, update_validators) VALUES (?, ?, ?, ?, ?)",
+            ('manga', 'test', 'Manga', database.adapt_json(['Action', 'Drama']), '{"data_hash": "hash"}')
+        ).lastrowid
+        # Stored as TEXT by a code path bypassing adapter (a migration for ex.)
+        db_conn.execute("UPDATE mangas SET authors = ? WHERE id = ?", ('["Author"]', manga_id))
+        chapter_id = db_conn.execute(
+            "INSERT INTO chapters (manga_id, slug, title, scanlators, rank, downloaded, read, recent) VALUES (?, ?, ?, ?, ?, 0, 0, 0)",
+            (manga_id, 'chapter', 'Chapter', '["Team"]', 0)
+        ).lastrowid
+
+    assert db_conn.execute('SELECT typeof(authors) FROM mangas WHERE id = ?', (manga_id,)).fetchone()[0] == 'text'
+
+    manga = database.Manga.get(manga_id)
+    assert manga.authors == ['Author']
+    assert manga.genres == ['Action', 'Drama']
+    assert manga.update_validators == {'data_hash': 'hash'}
+
+    chapter = database.Chapter.get(chapter_id)
+    assert chapter.scanlators == ['Team']
+    # Decoded value is kept
+    assert chapter._scanlators_json == ['Team']
+
+
+def test_chapters_list_columns(database):
+    db_conn = database.get_db_connection()
+
+    with db_conn:
+        manga_id = db_conn.execute(
+            "INSERT INTO mangas (slug, server_id, name) VALUES (?, ?, ?)", ('manga', 'test', 'Manga')
+        ).lastrowid
+        db_conn.executemany(
+            """INSERT INTO chapters (manga_id, slug, title, pages, rank, downloaded, read, recent, last_page_read_index)
+            VALUES (?, ?, ?, ?, ?, 0, 0, 0, ?)""",
+            [
+                (manga_id, 'chapter-1', 'Chapter 1', database.adapt_json([{'slug': '1'}, {'slug': '2'}]), 0, 0),
+                (manga_id, 'chapter-2', 'Chapter 2', None, 1, None),
+            ]
+        )
+
+    manga = database.Manga.get(manga_id)
+
+    statements = []
+    db_conn.set_trace_callback(statements.append)
+    try:
+        chapters = manga.chapters
+        assert len(statements) == 1
+
+        # Attributes used by chapters list rows (see `ChaptersListRow.populate`): no per-row queries
+        for _index in range(2):
+            for chapter in chapters:
+                chapter.title, chapter.scanlators, chapter.date, chapter.read, chapter.last_page_read_index
+                chapter.downloaded, chapter.recent, chapter.nb_pages
+        assert len(statements) == 1
+        assert [chapter.nb_pages for chapter in chapters] == [None, 2]
+
+        # A NULL JSON column loaded on demand is only queried once
+        assert chapters[0].pages is None
+        assert chapters[0].pages is None
+        assert len(statements) == 2
+    finally:
+        db_conn.set_trace_callback(None)
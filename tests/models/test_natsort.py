@@ -0,0 +1,54 @@
+"""
+Natural sort keys of chapters titles
+"""
+
+
+def sort_titles(database, titles):
+    return sorted(titles, key=database.get_natsort_key)
+
+
+def test_natsort_key(database):
+    assert sort_titles(database, ['10', '2', '1']) == ['1', '2', '10']
+    assert sort_titles(database, ['Chapter 10', 'Chapter A', 'Chapter 2.5', 'Chapter 2']) == [
+        'Chapter 2', 'Chapter 2.5', 'Chapter 10', 'Chapter A'
+    ]
+    # Leading zeros are ignored
+    assert sort_titles(database, ['Vol.02 Ch.010', 'Vol.2 Ch.9', 'Vol.1 Ch.100']) == ['Vol.1 Ch.100', 'Vol.2 Ch.9', 'Vol.02 Ch.010']
+
+    # Case insensitive
+    assert database.get_natsort_key('CHAPTER 1') == database.get_natsort_key('chapter 1')
+    assert sort_titles(database, ['chapter B', 'Chapter a']) == ['Chapter a', 'chapter B']
+
+    assert database.get_natsort_key('') == ''
+    assert database.get_natsort_key(None) == ''
+
+
+def test_natsort_ordering(database):
+    titles = ['Chapter 10', 'Chapter 1', 'chapter 2', 'Chapter 2.5', 'Extra']
+
+    db_conn = database.get_db_connection()
+    with db_conn:
+        manga_id = db_conn.execute(
+            "INSERT INTO mangas (slug, server_id, name) VALUES (?, ?, ?)", ('manga', 'test', 'Manga')
+        ).lastrowid
+        db_conn.executemany(
+            """INSERT INTO chapters (manga_id, slug, title, rank, downloaded, read, recent, natsort_key)
+            VALUES (?, ?, ?, ?, 0, 0, 0, ?)""",
+            [(manga_id, f'chapter-{rank}', title, rank, database.get_natsort_key(title)) for rank, title in enumerate(titles)]
+        )
+
+    rows = db_conn.execute('SELECT title FROM chapters WHERE manga_id = ? ORDER BY natsort_key', (manga_id,))
+    assert [row['title'] for row in rows] == ['Chapter 1', 'chapter 2', 'Chapter 2.5', 'Chapter 10', 'Extra']
+
+
+def test_natsort_key_migration(legacy_database):
+    titles = ['Chapter 10', 'Chapter 2', 'Chapter 1']
+    chapters = [dict(slug=f'chapter-{rank}', title=title, read_progress=None) for rank, title in enumerate(titles)]
+    database = legacy_database(13, chapters)
+
+    db_conn = database.get_db_connection()
+    assert db_conn.execute('PRAGMA user_version').fetchone()[0] == database.VERSION
+
+    rows = db_conn.execute('SELECT title, natsort_key FROM chapters ORDER BY natsort_key').fetchall()
+    assert [row['title'] for row in rows] == ['Chapter 1', 'Chapter 2', 'Chapter 10']
+    assert all(row['natsort_key'] == database.get_natsort_key(row['title']) for row in rows)
@@ -0,0 +1,192 @@
+"""
+Query plans of hot queries
+
+Each query is explained against a generated large database and must not fall back on a full table scan.
+"""
+
+import datetime
+
+import pytest
+
+NB_MANGAS = 500
+NB_CHAPTERS = 100  # per manga
+NB_DOWNLOADS = 2000
+
+
+@pytest.fixture(scope='module')
+def db_conn(module_database):
+    database = module_database
+
+    now = datetime.datetime.utcnow()
+    today = datetime.date.today()
+    with database.db_transaction() as db_conn:
+        db_conn.executemany(
+            'INSERT INTO mangas (id, slug, server_id, name, in_library, last_read) VALUES (?, ?, ?, ?, ?, ?)',
+            [
+                (manga_id, f'manga-{manga_id}', f'server{manga_id % 20}', f'Manga {manga_id}', int(manga_id % 4 != 0),
+                    now - datetime.timedelta(hours=manga_id))
+                for manga_id in range(1, NB_MANGAS + 1)
+            ]
+        )
+        db_conn.executemany(
+            """INSERT INTO chapters (manga_id, slug, title, date, rank, downloaded, recent, read, last_read, natsort_key)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            [
+                (
+                    manga_id, f'chapter-{rank}', f'Chapter {rank}', today - datetime.timedelta(days=NB_CHAPTERS - rank), rank,
+                    int(rank % 10 == 0), 0, int(rank < 50), now - datetime.timedelta(days=rank) if rank < 50 else None,
+                    database.get_natsort_key(f'Chapter {rank}'),
+                )
+                for manga_id in range(1, NB_MANGAS + 1)
+                for rank in range(NB_CHAPTERS)
+            ]
+        )
+        db_conn.executemany(
+            'INSERT INTO downloads (chapter_id, status, percent, date) VALUES (?, ?, ?, ?)',
+            [(chapter_id, 'pending', 0, now) for chapter_id in range(1, NB_DOWNLOADS * 10, 10)]
+        )
+
+    return database.get_db_connection()
+
+
+def get_query_plan(db_conn, sql, params=()):
+    return [row['detail'] for row in db_conn.execute('EXPLAIN QUERY PLAN ' + sql, params)]
+
+
+def assert_no_full_scan(plan, allowed_tables=()):
+    for detail in plan:
+        if not detail.startswith('SCAN '):
+            continue
+
+        table = detail.split()[1]
+        # Covering index scans don't read whole table
+        assert table in allowed_tables or 'COVERING INDEX' in detail, f'Full table scan: {plan}'
+
+
+@pytest.mark.parametrize('sort_order', ['asc', 'date-asc', 'natural-asc', 'desc', 'date-desc', 'natural-desc'])
+def test_get_next_chapter(db_conn, sort_order):
+    from komikku.models import Chapter
+    from komikku.models import Manga
+
+    manga = Manga.get(1)
+    manga.sort_order = sort_order
+    chapter = Chapter.get(db_conn.execute('SELECT id FROM chapters WHERE manga_id = 1 AND rank = 50').fetchone()[0], manga)
+
+    statements = []
+    db_conn.set_trace_callback(statements.append)
+    try:
+        next_chapter = manga.get_next_chapter(chapter, 1)
+    finally:
+        db_conn.set_trace_callback(None)
+
+    assert next_chapter is not None
+
+    sql = [statement for statement in statements if 'FROM chapters' in statement][0]
+    plan = get_query_plan(db_conn, sql)
+    assert_no_full_scan(plan)
+    assert not any('TEMP B-TREE' in detail for detail in plan), plan
+
+
+def test_manga_chapters(db_conn):
+    from komikku.models import Chapter
+
+    plan = get_query_plan(db_conn, Chapter.get_select_sql(Chapter.LIST_COLUMNS) + ' WHERE manga_id = ? ORDER BY rank DESC', (1,))
+    assert_no_full_scan(plan)
+    assert not any('TEMP B-TREE' in detail for detail in plan), plan
+
+
+def test_history(db_conn):
+    from komikku.models import Chapter
+
+    start = (datetime.date.today() - datetime.timedelta(days=7)).strftime('%Y-%m-%d')
+    plan = get_query_plan(
+        db_conn, Chapter.get_select_sql(Chapter.LIST_COLUMNS) + ' WHERE last_read >= ? ORDER BY last_read DESC', (start,)
+    )
+    assert_no_full_scan(plan)
+
+
+def test_library(db_conn):
+    from komikku.models import Manga
+
+    plan = get_query_plan(db_conn, Manga.get_select_sql(Manga.LIST_COLUMNS) + ' WHERE in_library = 1 ORDER BY last_read DESC')
+    assert_no_full_scan(plan)
+    assert not any('TEMP B-TREE' in detail for detail in plan), plan
+
+
+def test_update_library(db_conn):
+    # Same queries as `Updater.update_library()` and `Manga.get_next_update()`
+    from komikku.models.database import UPDATE_CADENCE_NB_RELEASES
+
+    plan = get_query_plan(
+        db_conn,
+        'SELECT id FROM mangas WHERE in_library = 1 AND (next_update IS NULL OR next_update <= ?) ORDER BY last_read DESC',
+        (datetime.datetime.utcnow(),)
+    )
+    assert_no_full_scan(plan)
+    assert not any('TEMP B-TREE' in detail for detail in plan), plan
+
+    plan = get_query_plan(
+        db_conn,
+        'SELECT DISTINCT date FROM chapters WHERE manga_id = ? AND date IS NOT NULL ORDER BY date DESC LIMIT ?',
+        (1, UPDATE_CADENCE_NB_RELEASES + 1)
+    )
+    assert_no_full_scan(plan)
+    assert not any('TEMP B-TREE' in detail for detail in plan), plan
+
+
+def test_downloader_queue(db_conn):
+    # Same queries as `Downloader.dispatch()` and `Downloader.get_next_download()`
+    for sql, params in (
+        (
+            """
+            SELECT DISTINCT m.server_id FROM downloads d
+            JOIN chapters c ON d.chapter_id = c.id
+            JOIN mangas m ON c.manga_id = m.id
+            WHERE d.status = 'pending'
+            """,
+            (),
+        ),
+        (
+            """
+            SELECT d.id FROM downloads d
+            JOIN chapters c ON d.chapter_id = c.id
+            JOIN mangas m ON c.manga_id = m.id
+            WHERE m.server_id = ? AND d.status = 'pending'
+            ORDER BY d.priority DESC, d.id ASC LIMIT 1
+            """,
+            ('server1',),
+        ),
+    ):
+        plan = get_query_plan(db_conn, sql, params)
+        # Whole queue is read: downloads table is the only one allowed to be scanned
+        assert_no_full_scan(plan, allowed_tables=('d', 'downloads'))
+
+
+def test_download_by_chapter_id(db_conn):
+    from komikku.models import Download
+
+    plan = get_query_plan(db_conn, Download.get_select_sql() + ' WHERE chapter_id = ?', (11,))
+    assert_no_full_scan(plan)
+
+
+def test_download_new_many(db_conn):
+    from komikku.models import Download
+
+    # Chapters 1, 11, 21… are already queued
+    chapters_ids = list(range(1, 101))
+
+    statements = []
+    db_conn.set_trace_callback(statements.append)
+    try:
+        queued_ids = Download.new_many(chapters_ids + chapters_ids[:10])
+    finally:
+        db_conn.set_trace_callback(None)
+
+    assert queued_ids == [chapter_id for chapter_id in chapters_ids if chapter_id % 10 != 1]
+    assert Download.new_many(chapters_ids) == []
+    assert len(Download.get_by_chapters_ids(chapters_ids)) == len(chapters_ids)
+
+    sql = [statement for statement in statements if statement.startswith('SELECT chapter_id FROM downloads')][0]
+    plan = get_query_plan(db_conn, sql)
+    # List of chapters IDs is passed as a JSON array
+    assert_no_full_scan(plan, allowed_tables=('json_each',))
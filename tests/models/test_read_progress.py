@@ -0,0 +1,80 @@
+"""
+Reading status of chapters pages stored as a bitset
+"""
+
+import pytest
+
+
+def test_read_progress(database):
+    read_progress = database.ReadProgress(10)
+    assert len(read_progress) == 10
+    assert read_progress.count() == 0 and not read_progress.all_read
+
+    read_progress.set(0)
+    read_progress.set(9)
+    # Already read
+    read_progress.set(9)
+    assert read_progress.count() == 2
+    assert [index for index in range(10) if read_progress.test(index)] == [0, 9]
+
+    with pytest.raises(IndexError):
+        read_progress.set(10)
+    with pytest.raises(IndexError):
+        read_progress.test(-1)
+
+    for index in range(10):
+        read_progress.set(index)
+    assert read_progress.count() == 10 and read_progress.all_read
+
+    # Empty chapter
+    assert database.ReadProgress(0).all_read
+
+
+def test_read_progress_serialization(database):
+    read_progress = database.ReadProgress.from_string('0110000001')
+    assert read_progress.count() == 3
+    assert ''.join(str(int(read_progress.test(index))) for index in range(len(read_progress))) == '0110000001'
+
+    blob = read_progress.to_bytes()
+    assert len(blob) == 4 + 2
+
+    read_progress = database.ReadProgress.from_bytes(blob)
+    assert len(read_progress) == 10 and read_progress.count() == 3
+    assert [index for index in range(10) if read_progress.test(index)] == [1, 2, 9]
+
+
+def test_read_progress_stored(database):
+    db_conn = database.get_db_connection()
+
+    with db_conn:
+        manga_id = db_conn.execute(
+            "INSERT INTO mangas (slug, server_id, name) VALUES (?, ?, ?)", ('manga', 'test', 'Manga')
+        ).lastrowid
+        chapter_id = db_conn.execute(
+            "INSERT INTO chapters (manga_id, slug, title, rank, downloaded, read, recent, read_progress) VALUES (?, ?, ?, 0, 0, 0, 0, ?)",
+            (manga_id, 'chapter', 'Chapter', database.ReadProgress.from_string('101'))
+        ).lastrowid
+
+    read_progress = database.Chapter.get(chapter_id).read_progress
+    assert isinstance(read_progress, database.ReadProgress)
+    assert [read_progress.test(index) for index in range(3)] == [True, False, True]
+
+
+def test_read_progress_migration(legacy_database):
+    chapters = [
+        dict(slug='chapter-1', title='Chapter 1', read_progress='0110000001'),
+        dict(slug='chapter-2', title='Chapter 2', read_progress='111'),
+        dict(slug='chapter-3', title='Chapter 3', read_progress=None),
+    ]
+    database = legacy_database(12, chapters)
+
+    db_conn = database.get_db_connection()
+    assert db_conn.execute('PRAGMA user_version').fetchone()[0] == database.VERSION
+
+    rows = db_conn.execute('SELECT read_progress FROM chapters ORDER BY rank').fetchall()
+    assert [index for index in range(10) if rows[0]['read_progress'].test(index)] == [1, 2, 9]
+    assert rows[1]['read_progress'].all_read and len(rows[1]['read_progress']) == 3
+    assert rows[2]['read_progress'] is None
+
+    columns = [row['name'] for row in db_conn.execute('PRAGMA table_info(chapters)')]
+    assert 'read_progress_text' not in columns
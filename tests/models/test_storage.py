@@ -0,0 +1,77 @@
+"""
+Storage usage of downloaded chapters
+"""
+
+import os
+from types import SimpleNamespace
+
+
+def write_file(path, size):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as fp:
+        fp.write(b'\0' * size)
+
+
+def test_storage_usage(tmp_path):
+    from komikku.models.database import StorageUsage
+
+    manga_path = str(tmp_path / 'server' / 'Manga')
+    write_file(os.path.join(manga_path, 'cover.jpg'), 100)
+    for chapter in range(2):
+        for index in range(3):
+            write_file(os.path.join(manga_path, f'chapter-{chapter}', f'{index + 1:03d}.jpg'), 1000)
+        write_file(os.path.join(manga_path, f'chapter-{chapter}', '.manifest.json'), 10)
+
+    storage_usage = StorageUsage()
+
+    usage = storage_usage.get(manga_path)
+    assert usage == dict(size=6120, pages_size=6000, nb_pages=6, nb_chapters=2)
+
+    # Incremental updates
+    storage_usage.add(manga_path, 2000, new_chapter=True)
+    assert storage_usage.get(manga_path) == dict(size=8120, pages_size=8000, nb_pages=7, nb_chapters=3)
+
+    manga = SimpleNamespace(path=manga_path)
+    assert storage_usage.estimate_chapter_size(SimpleNamespace(manga=manga, pages=None)) == int(8000 / 7 * 7 / 3)
+    assert storage_usage.estimate_chapter_size(SimpleNamespace(manga=manga, pages=[{}] * 10)) == int(8000 / 7 * 10)
+
+    # Usage is recomputed from disk once invalidated
+    storage_usage.invalidate(manga_path)
+    assert storage_usage.get(manga_path) == usage
+
+
+def test_storage_usage_preload(database, monkeypatch):
+    import threading
+
+    from komikku.models.database import StorageUsage
+
+    data_dir = database.get_data_dir()
+    write_file(os.path.join(data_dir, 'server', 'Manga', 'chapter-1', '001.jpg'), 1000)
+    write_file(os.path.join(data_dir, 'local', 'Manga', 'chapter-1', '001.jpg'), 500)
+
+    storage_usage = StorageUsage()
+    preloaded = threading.Event()
+    scanned_paths = []
+    scan = storage_usage._StorageUsage__scan
+
+    def slow_scan(path):
+        preloaded.wait(5)
+        scanned_paths.append(path)
+        return scan(path)
+
+    monkeypatch.setattr(storage_usage, '_StorageUsage__scan', slow_scan)
+
+    storage_usage.preload()
+    thread = storage_usage.preload_thread
+    assert thread is not None and thread.is_alive()
+
+    # A quota check waits for preload instead of walking folders too
+    preloaded.set()
+    assert storage_usage.get_total() == 1000
+    assert scanned_paths == [os.path.join(data_dir, 'server', 'Manga')]
+    thread.join()
+    assert storage_usage.preload_thread is None
+
+    # Already loaded
+    storage_usage.preload()
+    assert storage_usage.preload_thread is None
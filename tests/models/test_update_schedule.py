@@ -0,0 +1,48 @@
+"""
+Adaptive update scheduling: delay before next update of a manga, learned from its release cadence
+"""
+
+import datetime
+
+TODAY = datetime.date(2024, 6, 1)
+
+
+def get_dates(gap, elapsed, nb=10):
+    return [TODAY - datetime.timedelta(days=elapsed + gap * index) for index in range(nb)]
+
+
+def test_update_interval_unknown_cadence():
+    from komikku.models.database import get_update_interval
+    from komikku.models.database import UPDATE_INTERVAL_DEFAULT
+    from komikku.models.database import UPDATE_INTERVAL_MIN
+
+    assert get_update_interval('ongoing', [], TODAY) == UPDATE_INTERVAL_DEFAULT
+    # A single release
+    assert get_update_interval(None, [TODAY, None], TODAY) == UPDATE_INTERVAL_MIN
+    assert get_update_interval(None, [TODAY - datetime.timedelta(days=10)], TODAY) == datetime.timedelta(days=5)
+
+
+def test_update_interval_ongoing():
+    from komikku.models.database import get_update_interval
+    from komikku.models.database import UPDATE_INTERVAL_MAX
+    from komikku.models.database import UPDATE_INTERVAL_MIN
+
+    # Weekly: next check when next release is expected
+    assert get_update_interval('ongoing', get_dates(7, 2), TODAY) == datetime.timedelta(days=5)
+
+    # Next release is late: checked again soon
+    assert get_update_interval('ongoing', get_dates(7, 7), TODAY) == UPDATE_INTERVAL_MIN
+    assert get_update_interval('ongoing', get_dates(7, 11), TODAY) == datetime.timedelta(days=2)
+
+    # No releases for a long time (status not updated by server)
+    assert get_update_interval('ongoing', get_dates(7, 300), TODAY) == UPDATE_INTERVAL_MAX
+
+
+def test_update_interval_inactive():
+    from komikku.models.database import get_update_interval
+    from komikku.models.database import UPDATE_INTERVAL_INACTIVE_MAX
+    from komikku.models.database import UPDATE_INTERVAL_INACTIVE_MIN
+
+    assert get_update_interval('complete', get_dates(7, 1), TODAY) == UPDATE_INTERVAL_INACTIVE_MIN
+    assert get_update_interval('suspended', get_dates(7, 100), TODAY) == datetime.timedelta(days=50)
+    assert get_update_interval('complete', get_dates(7, 2000), TODAY) == UPDATE_INTERVAL_INACTIVE_MAX
@@ -0,0 +1,114 @@
+"""
+Short-circuit of mangas updates when data is unchanged since previous update
+"""
+
+import datetime
+
+
+def test_update_full_unchanged(database, fake_server):
+    date = datetime.date(2020, 1, 1)
+    chapters = [dict(slug=f'chapter-{index}', title=f'Chapter {index}', date=date) for index in range(10)]
+    server = fake_server(chapters)
+
+    manga = database.Manga.new(dict(slug='manga', server_id='test', name='Manga', chapters=chapters, cover=None), server, False)
+
+    # First update: validators are saved
+    status, recent_chapters_ids, _nb_deleted_chapters, _synced, unchanged = manga.update_full()
+    assert status is True and not unchanged
+    assert database.Manga.get(manga.id).update_validators['data_hash']
+    # Next update is scheduled (no chapters since 2020: overdue for years)
+    assert database.Manga.get(manga.id).next_update - datetime.datetime.utcnow() > datetime.timedelta(days=13)
+
+    # Read progress changes don't invalidate validators
+    manga.update(dict(last_read=datetime.datetime.utcnow()))
+
+    status, recent_chapters_ids, _nb_deleted_chapters, _synced, unchanged = database.Manga.get(manga.id, server).update_full()
+    assert status is True and unchanged and recent_chapters_ids == []
+
+    # A new chapter
+    server.chapters.append(dict(slug='chapter-10', title='Chapter 10', date=date))
+    status, recent_chapters_ids, _nb_deleted_chapters, _synced, unchanged = database.Manga.get(manga.id, server).update_full()
+    assert status is True and not unchanged and len(recent_chapters_ids) == 1
+
+
+def test_update_full_unchanged_cover(database, fake_server):
+    chapters = [dict(slug='chapter-1', title='Chapter 1', date=datetime.date(2020, 1, 1))]
+    server = fake_server(chapters, cover='https://example.com/cover.jpg')
+
+    manga = database.Manga.new(dict(slug='manga', server_id='test', name='Manga', chapters=chapters, cover=None), server, False)
+    manga.update_full()
+    assert server.covers_etags == [None]
+
+    # Data is unchanged but cover is checked (conditional request)
+    status, _recent_chapters_ids, _nb_deleted_chapters, _synced, unchanged = database.Manga.get(manga.id, server).update_full()
+    assert status is True and unchanged
+    assert server.covers_etags == [None, '"cover"']
+    assert database.Manga.get(manga.id).update_validators['cover'] == server.cover
+
+
+def test_update_full_failure(database, fake_server):
+    chapters = [dict(slug='chapter-1', title='Chapter 1', date=datetime.date(2020, 1, 1))]
+    server = fake_server(chapters)
+
+    manga = database.Manga.new(dict(slug='manga', server_id='test', name='Manga', chapters=chapters, cover=None), server, False)
+
+    # Server fails to return data: result has the same shape as on success
+    server.get_manga_data = lambda initial_data: None
+    status, recent_chapters_ids, nb_deleted_chapters, _synced, unchanged = database.Manga.get(manga.id, server).update_full()
+    assert status is False and not unchanged
+    assert recent_chapters_ids == [] and nb_deleted_chapters == 0
+
+
+def test_update_full_not_cached(database, fake_server, tmp_path, monkeypatch):
+    import json
+
+    import requests
+
+    import komikku.servers
+    from komikku.servers import Server
+    from komikku.servers.cache import HTTPCache
+
+    monkeypatch.setattr(komikku.servers, 'http_cache', HTTPCache(str(tmp_path / 'http')))
+
+    class CachedServer(fake_server):
+        """Server whose chapters list endpoint is cached"""
+
+        http_cache_images = False
+        http_cache_ttls = {r'^/manga/': 600}
+        rate_limit_burst = 100
+        rate_limit_rate = 100
+
+        def __init__(self, chapters):
+            super().__init__(chapters)
+            self.nb_requests = 0
+
+        def get_manga_data(self, initial_data):
+            r = Server.session_get(self, 'https://example.com/manga/1')
+            data = initial_data.copy()
+            data.update(dict(cover=None, chapters=json.loads(r.content)))
+
+            return data
+
+        def session_request(self, method, url, headers=None, **kwargs):
+            self.nb_requests += 1
+
+            r = requests.Response()
+            r.status_code = 200
+            r._content = json.dumps(self.chapters).encode()
+            r.headers = requests.structures.CaseInsensitiveDict({'Content-Type': 'application/json'})
+            r.url = url
+
+            return r
+
+    server = CachedServer([dict(slug='chapter-1', title='Chapter 1')])
+    manga = database.Manga.new(dict(slug='manga', server_id='test', name='Manga', chapters=[dict(server.chapters[0])], cover=None), server, False)
+
+    # Response is cached, a search→card navigation would use it
+    Server.session_get(server, 'https://example.com/manga/1')
+    assert server.nb_requests == 1
+
+    # A new chapter: update reaches network despite a fresh cached response
+    server.chapters.append(dict(slug='chapter-2', title='Chapter 2'))
+    status, recent_chapters_ids, _nb_deleted_chapters, _synced, _unchanged = database.Manga.get(manga.id, server).update_full()
+    assert status is True and len(recent_chapters_ids) == 1
+    assert server.nb_requests == 2
@@ -0,0 +1,19 @@
+"""
+Mangas updater
+"""
+
+from types import SimpleNamespace
+
+
+def test_notify_update_success(monkeypatch):
+    from komikku.updater import Updater
+
+    updater = Updater(SimpleNamespace())
+    signals = []
+    monkeypatch.setattr(updater, 'emit', lambda *args: signals.append(args))
+    monkeypatch.setattr(updater, 'show_notification', lambda *args: None)
+
+    manga = SimpleNamespace(id=1, name='Manga')
+    updater.notify_update_success(manga, [], 3, False)
+
+    assert signals == [('manga-updated', manga, dict(nb_deleted_chapters=3, nb_recent_chapters=0, synced=False))]
@@ -0,0 +1,59 @@
+"""
+Fixtures shared by servers tests
+"""
+
+from functools import partial
+from types import SimpleNamespace
+
+import pytest
+
+
+class FakeServer:
+    """
+    Stand-in of a server: `Server` methods are called unbound with it (ex. `Server.session_get(server, url)`)
+
+    Requests are answered without network and recorded in `requests` (method, URL, headers),
+    whatever the layer they are sent from: session, `session_request()` or `session_get()`.
+
+    :param responses: responses (or exceptions to raise) returned in order, or a function called with method and URL
+    """
+
+    id = 'test'
+    name = 'Test'
+    http_cache_images = False
+    http_cache_ttls = {}
+    rate_limit_burst = 100
+    rate_limit_rate = 100
+    retry_max_attempts = 3  # Default value
+
+    def __init__(self, responses, **attrs):
+        self.responses = responses
+        self.requests = []
+        self.session = SimpleNamespace(**{method: partial(self.send, method) for method in ('get', 'head', 'patch', 'post')})
+
+        for name, value in attrs.items():
+            setattr(self, name, value)
+
+    def send(self, method, url, headers=None, **kwargs):
+        self.requests.append((method, url, headers))
+
+        if callable(self.responses):
+            response = self.responses(method, url)
+        else:
+            response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+
+        return response
+
+    def session_get(self, url, headers=None, **kwargs):
+        return self.send('get', url, headers=headers, **kwargs)
+
+    def session_request(self, method, url, headers=None, **kwargs):
+        return self.send(method, url, headers=headers, **kwargs)
+
+
+@pytest.fixture
+def fake_server():
+    """Returns `FakeServer` class"""
+    return FakeServer
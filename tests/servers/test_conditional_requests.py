@@ -0,0 +1,34 @@
+"""
+Conditional requests of mangas updates: validators (ETag, hash of data) are kept per manga (no network needed)
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+
+def test_session_get_if_modified(fake_server):
+    from komikku.servers import Server
+    from komikku.servers.exceptions import NotModifiedError
+
+    server = fake_server([
+        SimpleNamespace(status_code=200, content=b'data', headers={'ETag': '"v1"'}),
+        SimpleNamespace(status_code=304, content=b'', headers={}),
+        SimpleNamespace(status_code=200, content=b'data', headers={'ETag': '"v2"'}),
+    ])
+    initial_data = dict(slug='manga', update_validators=dict(data_hash='hash'))
+
+    r = Server.session_get_if_modified(server, 'https://example.com', initial_data)
+    assert r.status_code == 200 and server.requests[0][2] == {}
+    validators = initial_data['update_validators']
+    assert validators['etag'] == '"v1"' and validators['data_hash'] == 'hash'
+
+    # 304 response
+    with pytest.raises(NotModifiedError):
+        Server.session_get_if_modified(server, 'https://example.com', initial_data)
+    assert server.requests[1][2] == {'If-None-Match': '"v1"'}
+
+    # Same content, new ETag
+    with pytest.raises(NotModifiedError):
+        Server.session_get_if_modified(server, 'https://example.com', initial_data)
+    assert initial_data['update_validators']['etag'] == '"v2"'
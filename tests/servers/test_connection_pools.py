@@ -0,0 +1,121 @@
+"""
+Connections pools shared by sessions of all servers (local HTTP server, no network needed)
+"""
+
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+import threading
+
+import pytest
+import requests
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'ok')
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def http_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    yield f'http://127.0.0.1:{server.server_port}'
+
+    server.shutdown()
+    server.server_close()
+
+
+def test_connection_pools(http_server):
+    from komikku.servers.pool import ConnectionPools
+    from komikku.servers.pool import POOL_BASE_SIZE
+
+    pools = ConnectionPools()
+    pools.reserve('downloader', 8)
+    pools.reserve('downloader', 8)
+    pools.reserve('updater', 1)
+    assert pools.maxsize == POOL_BASE_SIZE + 9
+
+    # Sessions of two servers of a same host (a multi-languages server for ex.)
+    sessions = [requests.Session(), requests.Session()]
+    for session in sessions:
+        pools.mount(session)
+        session.headers.update({'User-Agent': 'test'})
+
+    for _index in range(3):
+        for session in sessions:
+            assert session.get(http_server + '/manga').status_code == 200
+
+    # A single connection is opened and reused by both sessions
+    stats = pools.stats[http_server]
+    assert stats == dict(hits=5, misses=1)
+
+    # Closing a session doesn't close connections used by other sessions
+    sessions[0].close()
+    assert sessions[1].get(http_server + '/manga').status_code == 200
+    assert pools.stats[http_server] == dict(hits=6, misses=1)
+
+    # Stats of closed pools are kept
+    pools.adapter.poolmanager.clear()
+    assert pools.stats[http_server] == dict(hits=6, misses=1)
+
+
+def test_connection_pools_resize(http_server):
+    from komikku.servers.pool import ConnectionPools
+    from komikku.servers.pool import POOL_BASE_SIZE
+
+    pools = ConnectionPools()
+    session = requests.Session()
+    pools.mount(session)
+    assert session.get(http_server + '/manga').status_code == 200
+
+    # Adapter is replaced by an adapter with larger pools, on sessions too
+    adapter = pools.adapter
+    pools.reserve('downloader', 8)
+    assert pools.adapter is not adapter
+    assert pools.adapter.poolmanager.connection_pool_kw['maxsize'] == pools.maxsize == POOL_BASE_SIZE + 8
+    assert session.get_adapter(http_server) is pools.adapter
+
+    # Stats of replaced adapter are kept
+    assert session.get(http_server + '/manga').status_code == 200
+    assert pools.stats[http_server] == dict(hits=0, misses=2)
+
+
+def test_connection_pools_mount():
+    from requests.adapters import HTTPAdapter
+
+    from komikku.servers.pool import ConnectionPools
+    from komikku.servers.pool import PooledAdapter
+
+    pools = ConnectionPools()
+
+    # Custom adapter of a server is left untouched
+    session = requests.Session()
+    custom_adapter = HTTPAdapter(max_retries=5)
+    session.mount('https://', custom_adapter)
+    pools.mount(session)
+    assert session.get_adapter('https://example.com') is custom_adapter
+    assert session.get_adapter('http://example.com') is pools.adapter
+
+    class CustomAdapter(HTTPAdapter):
+        pass
+
+    session = requests.Session()
+    custom_adapter = CustomAdapter()
+    session.mount('https://', custom_adapter)
+    pools.mount(session)
+    assert session.get_adapter('https://example.com') is custom_adapter
+
+    # Copy of shared adapter in a session loaded from disk is replaced
+    session = requests.Session()
+    session.mount('https://', PooledAdapter())
+    pools.mount(session)
+    assert session.get_adapter('https://example.com') is pools.adapter
@@ -0,0 +1,121 @@
+"""
+HTTP cache of server responses (no network needed)
+"""
+
+import pytest
+import requests
+
+
+def response(status_code=200, content=b'data', headers=None):
+    r = requests.Response()
+    r.status_code = status_code
+    r._content = content
+    r.headers = requests.structures.CaseInsensitiveDict(headers or {'Content-Type': 'application/json'})
+    r.url = 'https://example.com/manga/1'
+
+    return r
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    import komikku.servers
+    from komikku.servers.cache import HTTPCache
+
+    cache = HTTPCache(str(tmp_path), max_size=1024)
+    monkeypatch.setattr(komikku.servers, 'http_cache', cache)
+
+    return cache
+
+
+def test_session_get_cached(cache, fake_server, monkeypatch):
+    import komikku.servers
+    from komikku.servers import Server
+
+    now = [1000]
+    monkeypatch.setattr(komikku.servers.time, 'time', lambda: now[0])
+
+    server = fake_server([
+        response(content=b'search'),
+        response(headers={'ETag': '"v1"', 'Cache-Control': 'max-age=30'}),
+        response(304, b''),
+        response(content=b'new', headers={'ETag': '"v2"'}),
+    ], http_cache_ttls={r'^/manga/': 60})
+
+    # Not a cached endpoint
+    assert Server.session_get(server, 'https://example.com/search').content == b'search'
+    assert cache.stats['misses'] == 0
+
+    assert Server.session_get(server, 'https://example.com/manga/1').content == b'data'
+    assert len(server.requests) == 2
+
+    # Fresh (TTL capped by max-age)
+    now[0] += 29
+    assert Server.session_get(server, 'https://example.com/manga/1').content == b'data'
+    assert len(server.requests) == 2
+
+    # Stale: revalidated with a conditional request, 304 response
+    now[0] += 2
+    r = Server.session_get(server, 'https://example.com/manga/1')
+    assert r.status_code == 200 and r.content == b'data'
+    assert server.requests[2][2] == {'If-None-Match': '"v1"'}
+
+    # Forced revalidation, new content
+    r = Server.session_get(server, 'https://example.com/manga/1', headers={'Cache-Control': 'no-cache'})
+    assert r.content == b'new'
+    assert Server.session_get(server, 'https://example.com/manga/1').content == b'new'
+
+    stats = cache.stats
+    assert stats['hits'] == 3 and stats['revalidations'] == 1 and stats['misses'] == 2
+
+
+def test_session_get_not_cached(cache, fake_server):
+    from komikku.servers import Server
+
+    server = fake_server([
+        response(headers={'Content-Type': 'image/jpeg'}),
+        response(headers={'Cache-Control': 'no-store'}),
+        response(headers={'Cache-Control': 'no-cache'}),
+        response(404),
+    ] * 2, http_cache_ttls={r'^/manga/': 60})
+
+    for _index in range(8):
+        Server.session_get(server, 'https://example.com/manga/1')
+    assert len(server.requests) == 8 and cache.stats['entries'] == 0
+
+
+def test_lru_eviction(cache):
+    from komikku.servers.cache import get_response_entry
+
+    keys = [cache.get_key('test', f'https://example.com/manga/{index}') for index in range(3)]
+    for key in keys:
+        cache.set(key, get_response_entry(response(content=b'x' * 300), 60))
+    assert cache.stats['entries'] == 2 and cache.stats['evictions'] == 1
+    assert cache.get(keys[0]) is None
+
+    # Most recently used is kept
+    assert cache.get(keys[1]) is not None
+    cache.set(keys[0], get_response_entry(response(content=b'x' * 300), 60))
+    assert cache.get(keys[1]) is not None and cache.get(keys[2]) is None
+
+
+def test_forced_revalidation(cache, fake_server):
+    from komikku.servers import Server
+    from komikku.servers.cache import forced_revalidation
+
+    server = fake_server([
+        response(headers={'ETag': '"v1"'}),
+        response(304, b''),
+        response(content=b'new'),
+    ], http_cache_ttls={r'^/manga/': 60})
+
+    assert Server.session_get(server, 'https://example.com/manga/1').content == b'data'
+
+    # Fresh cached response is revalidated (manga update for ex.)
+    with forced_revalidation():
+        assert Server.session_get(server, 'https://example.com/manga/1').content == b'data'
+        assert server.requests[1][2] == {'If-None-Match': '"v1"'}
+
+        assert Server.session_get(server, 'https://example.com/manga/1').content == b'new'
+
+    assert Server.session_get(server, 'https://example.com/manga/1').content == b'new'
+    assert len(server.requests) == 3
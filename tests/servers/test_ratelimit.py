@@ -0,0 +1,104 @@
+"""
+Rate limiters shared by servers hitting a same host (no network needed)
+"""
+
+import datetime
+from email.utils import format_datetime
+from types import SimpleNamespace
+
+import pytest
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Fake monotonic clock, sleeps advance it"""
+    from komikku.servers import ratelimit
+
+    clock = SimpleNamespace(now=0, sleeps=[])
+
+    def sleep(delay):
+        clock.sleeps.append(delay)
+        clock.now += delay
+
+    monkeypatch.setattr(ratelimit.time, 'monotonic', lambda: clock.now)
+    monkeypatch.setattr(ratelimit.time, 'sleep', sleep)
+
+    return clock
+
+
+def response(status_code, headers=None):
+    return SimpleNamespace(status_code=status_code, headers=headers or {})
+
+
+def test_token_bucket_burst_refill(clock):
+    from komikku.servers.ratelimit import TokenBucket
+
+    bucket = TokenBucket(rate=2, burst=4)
+
+    # Burst: requests are sent at once
+    for _index in range(4):
+        assert bucket.acquire() == 0
+    assert clock.sleeps == []
+
+    # Bucket is empty: requests are spaced out at rate
+    assert bucket.acquire() == pytest.approx(0.5)
+    assert bucket.acquire() == pytest.approx(0.5)
+    assert clock.now == pytest.approx(1)
+
+    # Refill (capped to burst)
+    clock.now += 10
+    for _index in range(4):
+        assert bucket.acquire() == 0
+    assert bucket.acquire() == pytest.approx(0.5)
+
+    stats = bucket.stats
+    assert stats['requests'] == 11 and stats['throttled'] == 3
+    assert stats['wait_time'] == pytest.approx(1.5)
+
+
+def test_token_bucket_block(clock):
+    from komikku.servers.ratelimit import TokenBucket
+
+    bucket = TokenBucket(rate=2, burst=4)
+    assert bucket.acquire() == 0
+
+    # Retry-After: next request waits for delay, even if tokens were left
+    bucket.block(5)
+    assert bucket.acquire() == pytest.approx(5)
+    assert bucket.stats['retry_after'] == 1
+
+    # Bucket has been refilled meanwhile
+    assert bucket.acquire() == 0
+
+
+def test_rate_limiters_shared_by_host():
+    from komikku.servers.ratelimit import RateLimiters
+
+    limiters = RateLimiters()
+    bucket = limiters.get('example.com', rate=1, burst=2)
+    # Existing limiter is returned, rate and burst of creation are kept
+    assert limiters.get('example.com', rate=5, burst=10) is bucket
+    assert (bucket.rate, bucket.burst) == (1, 2)
+    assert limiters.get('example.org') is not bucket
+
+    limiters.configure('example.com', rate=3)
+    assert (bucket.rate, bucket.burst) == (3, 2)
+    assert list(limiters.stats) == ['example.com', 'example.org']
+
+
+def test_retry_after_delay():
+    from komikku.servers.ratelimit import get_retry_after_delay
+
+    assert get_retry_after_delay(response(429, {'Retry-After': '7'})) == 7
+    assert get_retry_after_delay(response(503, {'Retry-After': ' 3 '})) == 3
+
+    date = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=60)
+    assert 55 < get_retry_after_delay(response(429, {'Retry-After': format_datetime(date, usegmt=True)})) <= 60
+    # A past date
+    date = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(seconds=60)
+    assert get_retry_after_delay(response(429, {'Retry-After': format_datetime(date, usegmt=True)})) == 0
+
+    assert get_retry_after_delay(response(429)) is None
+    assert get_retry_after_delay(response(429, {'Retry-After': 'soon'})) is None
+    # Only honored on 429 and 503 responses
+    assert get_retry_after_delay(response(500, {'Retry-After': '7'})) is None
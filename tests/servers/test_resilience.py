@@ -0,0 +1,157 @@
+"""
+Failures classification and circuit breaker shared by servers (no network needed)
+"""
+
+from types import SimpleNamespace
+
+import requests
+
+
+def response(status_code, headers=None):
+    return SimpleNamespace(status_code=status_code, headers=headers or {})
+
+
+def test_classify_failure():
+    from komikku.servers.exceptions import NotFoundError
+    from komikku.servers.resilience import classify_failure
+    from komikku.servers.resilience import FAILURE_CF_CHALLENGE
+    from komikku.servers.resilience import FAILURE_CONNECTION
+    from komikku.servers.resilience import FAILURE_RATE_LIMITED
+    from komikku.servers.resilience import FAILURE_SERVER_ERROR
+    from komikku.servers.resilience import FAILURE_TIMEOUT
+
+    assert classify_failure(error=requests.exceptions.ReadTimeout()) == FAILURE_TIMEOUT
+    assert classify_failure(error=requests.exceptions.ConnectionError()) == FAILURE_CONNECTION
+    assert classify_failure(error=AttributeError()) is None
+    assert classify_failure(error=NotFoundError()) is None
+
+    assert classify_failure(response=response(200)) is None
+    assert classify_failure(response=response(404)) is None
+    assert classify_failure(response=response(429)) == FAILURE_RATE_LIMITED
+    assert classify_failure(response=response(502)) == FAILURE_SERVER_ERROR
+    assert classify_failure(response=response(403, {'Server': 'cloudflare'})) == FAILURE_CF_CHALLENGE
+
+
+def test_backoff_delay():
+    from komikku.servers.resilience import get_backoff_delay
+    from komikku.servers.resilience import RETRY_BASE_DELAY
+    from komikku.servers.resilience import RETRY_MAX_DELAY
+
+    for attempt in range(10):
+        delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt)
+        assert delay / 2 <= get_backoff_delay(attempt) <= delay
+
+
+def test_circuit_breaker(monkeypatch):
+    from komikku.servers import resilience
+
+    now = [0]
+    monkeypatch.setattr(resilience.time, 'monotonic', lambda: now[0])
+
+    breaker = resilience.CircuitBreaker('Server')
+    for _index in range(resilience.BREAKER_FAILURE_THRESHOLD - 1):
+        breaker.record_failure(resilience.FAILURE_TIMEOUT)
+    assert breaker.allow() and not breaker.is_open
+
+    # Threshold is reached: breaker opens
+    breaker.record_failure(resilience.FAILURE_TIMEOUT)
+    assert breaker.is_open and not breaker.allow()
+    assert breaker.retry_in == resilience.BREAKER_COOLDOWN
+
+    # Cooldown elapsed: a single trial request is allowed
+    now[0] += resilience.BREAKER_COOLDOWN
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    # Trial request failed: cooldown is doubled
+    breaker.record_failure(resilience.FAILURE_SERVER_ERROR)
+    assert breaker.retry_in == resilience.BREAKER_COOLDOWN * 2
+
+    now[0] += resilience.BREAKER_COOLDOWN * 2
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.allow() and breaker.retry_in == 0
+    assert breaker.stats['trips'] == 2
+
+    # Trial request ended without outcome: a new trial is allowed
+    for _index in range(resilience.BREAKER_FAILURE_THRESHOLD):
+        breaker.record_failure(resilience.FAILURE_TIMEOUT)
+    now[0] += resilience.BREAKER_COOLDOWN
+    assert breaker.allow() and not breaker.allow()
+    breaker.release()
+    assert breaker.allow()
+
+
+def test_session_request_retry(fake_server, monkeypatch):
+    import komikku.servers
+    from komikku.servers import resilience
+    from komikku.servers import Server
+
+    monkeypatch.setattr(resilience.time, 'sleep', lambda delay: None)
+    monkeypatch.setattr(resilience, 'circuit_breakers', resilience.CircuitBreakers())
+    monkeypatch.setattr(komikku.servers, 'circuit_breakers', resilience.circuit_breakers)
+
+    def respond(method, url):
+        if method == 'patch':
+            return ValueError()
+        return response(502)
+
+    server = fake_server(respond)
+
+    # Idempotent request: retried
+    assert Server.session_request(server, 'get', 'https://example.com/get').status_code == 502
+    assert len(server.requests) == resilience.RETRY_MAX_ATTEMPTS
+
+    # Not idempotent request: retried only on demand
+    server.requests.clear()
+    Server.session_request(server, 'post', 'https://example.com/post')
+    assert len(server.requests) == 1
+    server.requests.clear()
+    Server.session_request(server, 'post', 'https://example.com/post', retry=True)
+    assert len(server.requests) == resilience.RETRY_MAX_ATTEMPTS
+
+    # Number of attempts can be raised per server
+    server.requests.clear()
+    server.retry_max_attempts = 6
+    Server.session_request(server, 'get', 'https://example.com/get')
+    assert len(server.requests) == 6
+
+    # Unexpected errors aren't server failures, nor successes
+    breaker = resilience.circuit_breakers.get('test')
+    assert breaker.nb_failures == 4
+    try:
+        Server.session_request(server, 'patch', 'https://example.com/patch')
+    except ValueError:
+        pass
+    assert breaker.nb_failures == 4
+
+
+def test_session_request_retry_interrupted(fake_server, monkeypatch):
+    import threading
+
+    import komikku.servers
+    from komikku.servers import resilience
+    from komikku.servers import Server
+
+    monkeypatch.setattr(resilience, 'circuit_breakers', resilience.CircuitBreakers())
+    monkeypatch.setattr(komikku.servers, 'circuit_breakers', resilience.circuit_breakers)
+    monkeypatch.setattr(resilience, 'get_backoff_delay', lambda attempt: 60)
+
+    server = fake_server(lambda method, url: response(502))
+    stop_event = threading.Event()
+    results = []
+
+    def run():
+        resilience.set_retries_stop_event(stop_event)
+        results.append(Server.session_request(server, 'get', 'https://example.com/get'))
+
+    thread = threading.Thread(target=run)
+    thread.start()
+
+    # Requester is stopped during backoff: request is given up at once
+    stop_event.set()
+    thread.join(5)
+    assert not thread.is_alive()
+    assert results[0].status_code == 502
+    assert len(server.requests) == 1
+    assert resilience.circuit_breakers.get('test').nb_failures == 1